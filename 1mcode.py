@@ -1,123 +1,146 @@
 import numpy as np
 import cv2
 import pyOptris as optris
+import os
+import shutil
 import time
 import threading
 import tkinter as tk
-from PIL import Image, ImageTk
 from tkinter import filedialog
 
-recording = False
-frame_buffer_1m = []  # Buffer for 1M camera frames
-times_computer_1m = []  # Timestamps for 1M camera frames
+recorder = None  # optris.Recorder while recording
+last_recording = None  # path of the last finished recording, until it is saved
+recording_lock = threading.Lock()
 running = True
 toggled = False  # Whether reduced mode is active
 click_x, click_y = None, None  
 
-# Configuration files for the 1M camera
+# Configurations of the 1M camera: the full frame config is parsed once and the reduced
+# frame mode (what 17092037.xml holds) is derived from it
 full_frame_xml = "17092037f.xml"  # Full frame configuration
-reduced_frame_xml = "17092037.xml"  # Reduced frame configuration
+full_frame_config = optris.load_config(full_frame_xml)
+reduced_frame_config = full_frame_config.replace(videoformatindex=3, framerate=1000, temperature=(600, 1800))
 crop_size = 100  # Crop area size
+cameras = optris.CameraManager()
 
 
-def initialize_camera(config_file):
-    print(f"Initializing 1M camera with {config_file}...")
-    result = optris.usb_init(config_file)
-    if result != 0:
-        print(f"Failed to initialize 1M camera with {config_file}.")
+def initialize_camera(config):
+    print(f"Initializing 1M camera with {config.file()}...")
+    try:
+        cameras.add(config, name="1m").start()
+    except optris.IRImagerError as e:
+        print(f"Failed to initialize 1M camera with {config.file()}: {e}")
         return False
-    print(f"1M camera initialized successfully with {config_file}.")
+    print(f"1M camera initialized successfully with {config.file()}.")
     return True
 
 def close_camera():
-    optris.terminate()
+    stop_recording()
+    cameras.close()
     print("Camera terminated successfully.")
 
 def process_1m_camera():
-    global running, recording, frame_buffer_1m, times_computer_1m, click_x, click_y, toggled
+    global running, click_x, click_y, toggled
 
-    w, h = optris.get_palette_image_size()  # Image size
+    camera = cameras["1m"]
     while running:
-        frame = optris.get_palette_image(w, h)  # RGB image
-        timestamp = time.time()  # Capture timestamp
-
-        if recording:  # If recording is active, save frame and time
-            frame_buffer_1m.append(frame)
-            times_computer_1m.append(timestamp)
-            status_label.config(text=f"Saving frame at {timestamp:.2f}s")
-            label_img_1m.update_idletasks()  # Update the GUI
-
-        # Update GUI with the current frame
-        if toggled and click_x is not None and click_y is not None:
-            # Calculate cropping area based on the click position
-            start_x = click_x - crop_size // 2
-            start_y = click_y - crop_size // 2
-            end_x = click_x + crop_size // 2
-            end_y = click_y + crop_size // 2
-
-            # Ensure the cropping area is within bounds
-            start_x = max(0, start_x)
-            start_y = max(0, start_y)
-            end_x = min(w, end_x)
-            end_y = min(h, end_y)
-
-            # Ensure the cropping area is valid
-            if start_x < end_x and start_y < end_y:
-                cropped_frame = frame[start_y:end_y, start_x:end_x]
-                img = Image.fromarray(cropped_frame)
-            else:
-                img = Image.fromarray(frame)  # Fallback to full frame if cropping fails
-        else:
-            img = Image.fromarray(frame)
-
-        imgtk = ImageTk.PhotoImage(image=img)
-        label_img_1m.imgtk = imgtk
-        label_img_1m.configure(image=imgtk)
+        # newest thermal frame of the active mode, the acquisition survives mode switches
+        index, frame, _ = camera.latest()
+        if frame is None:
+            time.sleep(0.01)
+            continue
+
+        # the GUI is only touched from the Tk main loop, which shows the newest posted frame;
+        # recording does not depend on this loop, the recorder takes every frame from the ring
+        active = recorder
+        viewer.post((frame, active.frames_written if active is not None else None))
 
         time.sleep(0.1)
 
+def render(item):
+    # runs on the Tk main loop, only for frames actually shown
+    thermal_image, frames_written = item
+    normalized_image = cv2.normalize(thermal_image, None, 0, 255, cv2.NORM_MINMAX)
+    frame = cv2.applyColorMap(np.uint8(normalized_image), cv2.COLORMAP_JET)
+    h, w = frame.shape[:2]
+    if frames_written is not None:
+        status_label.config(text=f"Recording... {frames_written} frames written")
+
+    if toggled and click_x is not None and click_y is not None:
+        # Calculate cropping area based on the click position
+        start_x = click_x - crop_size // 2
+        start_y = click_y - crop_size // 2
+        end_x = click_x + crop_size // 2
+        end_y = click_y + crop_size // 2
+
+        # Ensure the cropping area is within bounds
+        start_x = max(0, start_x)
+        start_y = max(0, start_y)
+        end_x = min(w, end_x)
+        end_y = min(h, end_y)
+
+        # Ensure the cropping area is valid
+        if start_x < end_x and start_y < end_y:
+            return frame[start_y:end_y, start_x:end_x]
+    return frame  # Full frame, also the fallback if cropping fails
+
 def toggle_frame_mode(event):
-    global toggled, running
+    global toggled
 
     # Switch the frame mode (toggle between full and reduced)
     toggled = not toggled
 
-    # Close the camera to reinitialize it with new configuration
-    running = False
-    close_camera()
-
-    # Reinitialize camera with the respective configuration
-    config_file = reduced_frame_xml if toggled else full_frame_xml
-    if initialize_camera(config_file):
-        # Restart processing with new camera settings
-        running = True
-        threading.Thread(target=process_1m_camera, daemon=True).start()
+    # Reinitialize the camera with the respective configuration; the processing thread
+    # and the ring buffers of both modes stay alive
+    config = reduced_frame_config if toggled else full_frame_config
+    # a recording has the frame size of the mode it was started in
+    stop_recording()
+    try:
+        switch = cameras.switch("1m", config)
+    except optris.IRImagerError as e:
+        print(f"Failed to switch frame mode: {e}")
+        return
 
-    print(f"Switched to {'reduced' if toggled else 'full'} frame mode.")
+    print(f"Switched to {'reduced' if toggled else 'full'} frame mode "
+          f"({switch.width}x{switch.height}, {switch.downtime * 1000:.1f} ms without frames).")
 
 def start_camera():
     threading.Thread(target=process_1m_camera, daemon=True).start()
 
 def start_recording():
-    global recording
-    recording = True
+    global recorder
+    with recording_lock:
+        if recorder is not None:
+            return
+        # frames are streamed to disk in chunks by the recorder's writer thread, straight from the ring buffer
+        recorder = cameras["1m"].record(f"frame_buffer_1m_{int(time.time())}.bin")
     status_label.config(text="Recording started...")
 
 def stop_recording():
-    global recording
-    recording = False
-    status_label.config(text="Recording stopped.")
+    global recorder, last_recording
+    with recording_lock:
+        if recorder is None:
+            return
+        active, recorder = recorder, None
+        active.stop()
+        last_recording = active.path
+    message = f"Recording stopped, {active.frames_written} frames written."
+    if active.dropped:
+        message += f" {active.dropped} frames dropped."
+    status_label.config(text=message)
 
 def save_recording():
-    if not frame_buffer_1m:
+    global last_recording
+    stop_recording()
+    if last_recording is None or not os.path.exists(last_recording):
         status_label.config(text="No frames recorded.")
         return
-    
+
     file_path = filedialog.asksaveasfilename(defaultextension=".bin", 
                                              filetypes=[("Binary files", "*.bin")])
     if file_path:
-        with open(file_path, 'wb') as f:
-            np.save(f, {'frame_buffer': frame_buffer_1m, 'times_computer': times_computer_1m})
+        shutil.move(last_recording, file_path)
+        last_recording = None
         status_label.config(text="Recording saved successfully!")
 
 def capture_click(event):
@@ -126,7 +149,7 @@ def capture_click(event):
     print(f"Click coordinates: ({click_x}, {click_y})")
 
 def create_gui():
-    global label_img_1m, status_label
+    global label_img_1m, status_label, viewer
 
     window = tk.Tk()
     window.title("Thermal Camera Control")
@@ -162,12 +185,14 @@ def create_gui():
     status_label = tk.Label(window, text="Ready")
     status_label.pack(side=tk.BOTTOM, padx=5, pady=5)
 
+    viewer = optris.TkViewer(label_img_1m, rate=10, render=render).start()
+    start_camera()
+
     window.protocol("WM_DELETE_WINDOW", lambda: close_camera() or window.quit())
     window.mainloop()
 
 if __name__ == "__main__":
-    if not initialize_camera(full_frame_xml):
+    if not initialize_camera(full_frame_config):
         print("Camera initialization failed. Exiting...")
     else:
-        start_camera()
         create_gui()  # Start the GUI
@@ -4,7 +4,6 @@ import pyOptris as optris
 import time
 import threading
 import tkinter as tk
-from PIL import Image, ImageTk
 from tkinter import filedialog
 
 recording = False
@@ -43,38 +42,36 @@ def process_pi_640i():
         if recording:  # If recording is active, save frame and time
             frame_buffer_640i.append(frame)
             times_computer_640i.append(timestamp)
-            status_label.config(text=f"Saving frame at {timestamp:.2f}s")
-            label_img_640i.update_idletasks()  # Update the GUI
-
-        # Update GUI with the current frame
-        if toggled and click_x is not None and click_y is not None:
-            # Calculate cropping area based on the click position
-            start_x = click_x - crop_size // 2
-            start_y = click_y - crop_size // 2
-            end_x = click_x + crop_size // 2
-            end_y = click_y + crop_size // 2
-
-            # Ensure the cropping area is within bounds
-            start_x = max(0, start_x)
-            start_y = max(0, start_y)
-            end_x = min(w, end_x)
-            end_y = min(h, end_y)
-
-            # Ensure the cropping area is valid
-            if start_x < end_x and start_y < end_y:
-                cropped_frame = frame[start_y:end_y, start_x:end_x]
-                img = Image.fromarray(cropped_frame)
-            else:
-                img = Image.fromarray(frame)  # Fallback to full frame if cropping fails
-        else:
-            img = Image.fromarray(frame)
-
-        imgtk = ImageTk.PhotoImage(image=img)
-        label_img_640i.imgtk = imgtk
-        label_img_640i.configure(image=imgtk)
+        # the GUI is only touched from the Tk main loop, which shows the newest posted frame
+        viewer.post((frame, timestamp if recording else None))
 
         time.sleep(0.1)
 
+def render(item):
+    # runs on the Tk main loop, only for frames actually shown
+    frame, saved_at = item
+    h, w = frame.shape[:2]
+    if saved_at is not None:
+        status_label.config(text=f"Saving frame at {saved_at:.2f}s")
+
+    if toggled and click_x is not None and click_y is not None:
+        # Calculate cropping area based on the click position
+        start_x = click_x - crop_size // 2
+        start_y = click_y - crop_size // 2
+        end_x = click_x + crop_size // 2
+        end_y = click_y + crop_size // 2
+
+        # Ensure the cropping area is within bounds
+        start_x = max(0, start_x)
+        start_y = max(0, start_y)
+        end_x = min(w, end_x)
+        end_y = min(h, end_y)
+
+        # Ensure the cropping area is valid
+        if start_x < end_x and start_y < end_y:
+            return frame[start_y:end_y, start_x:end_x]
+    return frame  # Full frame, also the fallback if cropping fails
+
 def toggle_frame_mode(event):
     global toggled, running
 
@@ -125,7 +122,7 @@ def capture_click(event):
     print(f"Click coordinates: ({click_x}, {click_y})")
 
 def create_gui():
-    global label_img_640i, status_label
+    global label_img_640i, status_label, viewer
 
     window = tk.Tk()
     window.title("Thermal Camera Control")
@@ -161,6 +158,9 @@ def create_gui():
     status_label = tk.Label(window, text="Ready")
     status_label.pack(side=tk.BOTTOM, padx=5, pady=5)
 
+    viewer = optris.TkViewer(label_img_640i, rate=10, render=render).start()
+    start_camera()
+
     window.protocol("WM_DELETE_WINDOW", lambda: close_camera() or window.quit())
     window.mainloop()
 
@@ -168,5 +168,4 @@ if __name__ == "__main__":
     if not initialize_camera(full_frame_xml):
         print("Camera initialization failed. Exiting...")
     else:
-        start_camera()
         create_gui()  # Start the GUI
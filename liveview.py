@@ -4,7 +4,6 @@ import pyOptris as optris
 import time
 import threading
 import tkinter as tk
-from PIL import Image, ImageTk
 
 # Global variables
 recording = False
@@ -34,21 +33,12 @@ def process_pi_1m():
     global frame_buffer_1m, times_computer_1m, running
 
     try:
-        w, h = 72, 56  # Adjust according to the PI 1M specs
+        w, h = optris.load_formats().find("PI1M 72x56 @ 1000Hz").size
 
         while running:
             thermal_image = optris.get_thermal_image(w, h)[0]
-            normalized_image = cv2.normalize(thermal_image, None, 0, 255, cv2.NORM_MINMAX)
-            color_image = cv2.applyColorMap(np.uint8(normalized_image), cv2.COLORMAP_JET)
-            cv2.putText(color_image, "Camera: PI 1M", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-
-            # Convert to a format suitable for Tkinter
-            img = Image.fromarray(color_image)
-            imgtk = ImageTk.PhotoImage(image=img)
-
-            # Update the Tkinter label with the new image
-            label_img_1m.imgtk = imgtk
-            label_img_1m.configure(image=imgtk)
+            # rendered on the Tk main loop, only if it gets shown
+            viewer_1m.post(thermal_image)
 
             if recording:
                 frame_buffer_1m.append(thermal_image)
@@ -63,21 +53,12 @@ def process_pi_640i():
     global frame_buffer_640i, times_computer_640i, running
 
     try:
-        w, h = 764, 480  # Adjust according to the PI 640i specs
+        w, h = optris.load_formats().find("PI600 640x480 @ 32Hz").size
 
         while running:
             thermal_image = optris.get_thermal_image(w, h)[0]
-            normalized_image = cv2.normalize(thermal_image, None, 0, 255, cv2.NORM_MINMAX)
-            color_image = cv2.applyColorMap(np.uint8(normalized_image), cv2.COLORMAP_JET)
-            cv2.putText(color_image, "Camera: PI 640i", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-
-            # Convert to a format suitable for Tkinter
-            img = Image.fromarray(color_image)
-            imgtk = ImageTk.PhotoImage(image=img)
-
-            # Update the Tkinter label with the new image
-            label_img_640i.imgtk = imgtk
-            label_img_640i.configure(image=imgtk)
+            # rendered on the Tk main loop, only if it gets shown
+            viewer_640i.post(thermal_image)
 
             if recording:
                 frame_buffer_640i.append(thermal_image)
@@ -88,7 +69,20 @@ def process_pi_640i():
     except Exception as e:
         print(f"Error capturing frame from PI 640i: {e}")
 
+def render(name):
+    def render_frame(thermal_image):
+        normalized_image = cv2.normalize(thermal_image, None, 0, 255, cv2.NORM_MINMAX)
+        color_image = cv2.applyColorMap(np.uint8(normalized_image), cv2.COLORMAP_JET)
+        cv2.putText(color_image, f"Camera: {name}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        return color_image
+    return render_frame
+
 def start_cameras():
+    global viewer_1m, viewer_640i
+
+    # the capture threads only post frames, Tk is only touched from the main loop
+    viewer_1m = optris.TkViewer(label_img_1m, rate=10, render=render("PI 1M")).start()
+    viewer_640i = optris.TkViewer(label_img_640i, rate=10, render=render("PI 640i")).start()
     threading.Thread(target=process_pi_1m, daemon=True).start()
     threading.Thread(target=process_pi_640i, daemon=True).start()
 
@@ -115,11 +109,11 @@ def create_gui():
     quit_button.pack(side=tk.BOTTOM, padx=5, pady=5)
 
     window.protocol("WM_DELETE_WINDOW", lambda: close_camera() or window.quit())
+    start_cameras()
     window.mainloop()
 
 if __name__ == "__main__":
     if not initialize_cameras():
         print("Camera initialization failed. Exiting...")
     else:
-        start_cameras()
         create_gui()  # Start the GUI
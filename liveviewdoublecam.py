@@ -1,5 +1,6 @@
 import threading
 import pyOptris as optris
+from pyOptris.processing import ProcessingPool, render_grayscale
 import time
 import numpy as np
 import cv2
@@ -125,6 +126,7 @@ def on_closing(window):
 def live_view():
     scale_factor = 8  # change to get a bigger screen
     global recording, frame_buffer, times_computer, running, current_camera, w, h
+    pool = None  # 8-bit normalisation runs in worker processes, recreated when the size changes
 
     while running:
         try:
@@ -136,15 +138,28 @@ def live_view():
             # Capture the thermal image
             thermal_image = optris.get_thermal_image(w, h)[0]
 
-            # Convert the image to an 8-bit format for OpenCV display
-            normalized_image = cv2.normalize(thermal_image, None, 0, 255, cv2.NORM_MINMAX)
-            display_image = np.uint8(normalized_image)
-
-            # Resize the image for larger display
-            resized_image = cv2.resize(display_image, (w * scale_factor, h * scale_factor), interpolation=cv2.INTER_LINEAR)
-
-            # Display the frame
-            cv2.imshow('Live Thermal View', resized_image)
+            # Hand the frame to the pool for the 8-bit conversion; it is skipped while every slot is busy
+            if pool is None or pool.inputs.array.shape[1:] != thermal_image.shape:
+                if pool is not None:
+                    pool.close()
+                pool = ProcessingPool(render_grayscale, thermal_image.shape, result_shape=thermal_image.shape)
+            pool.submit(thermal_image)
+
+            # Show the newest converted frame, older ones are released unseen
+            done = pool.results()
+            for result in done[:-1]:
+                pool.release(result.slot)
+            if done:
+                result = done[-1]
+                if result.error is None:
+                    display_image = pool.result_array(result.slot)
+                    # Resize the image for larger display
+                    height, width = display_image.shape
+                    resized_image = cv2.resize(display_image, (width * scale_factor, height * scale_factor),
+                                               interpolation=cv2.INTER_LINEAR)
+                    # Display the frame
+                    cv2.imshow('Live Thermal View', resized_image)
+                pool.release(result.slot)
 
             # Record frames if recording is active
             if recording:
@@ -159,11 +174,14 @@ def live_view():
             break
 
     # Clean up
+    if pool is not None:
+        pool.close()
     cv2.destroyAllWindows()
 
-# Start the GUI in a separate thread
-gui_thread = threading.Thread(target=create_gui)
-gui_thread.start()
+if __name__ == "__main__":
+    # Start the GUI in a separate thread
+    gui_thread = threading.Thread(target=create_gui)
+    gui_thread.start()
 
-# Start the live view
-live_view()
+    # Start the live view
+    live_view()
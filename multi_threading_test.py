@@ -1,20 +1,19 @@
 import numpy as np
 import cv2
 import pyOptris as optris
+from pyOptris.processing import ProcessingPool, ProcessingStage, render_colormap
 import time
 import threading
 import tkinter as tk
-from PIL import Image, ImageTk
 import ctypes
 from threading import Lock
 import os
 
 # Global variables
-recording = False
-frame_buffer_1m = []
-frame_buffer_640i = []
-times_computer_1m = []
-times_computer_640i = []
+manager = optris.CameraManager()
+recorders = {}  # camera name -> optris.Recorder while recording
+renderers = {}  # camera name -> (ProcessingPool, ProcessingStage) rendering in worker processes
+viewers = {}  # camera name -> optris.TkViewer showing it on the Tk main loop
 running = True
 frame_mode = 'full'  # for initialization
 recording_lock = Lock()
@@ -41,148 +40,105 @@ def initialize_cameras():
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
 
-    # Load XML file 
-    xml_files = [
-        camera_frames['PI 1M'][frame_mode],
-        camera_frames['PI 640i'][frame_mode]
-    ]
-
-    # PI 1M
-    err,ID1 = optris.multi_usb_init(xml_files[0],None, os.path.join(log_dir, f'log_1m_{int(time.time())}.log'))
-    if err != 0:
-        print(f"Failed to initialize PI 1M: {err}")
-        return False, None, None, None, None
-    print(f"PI 1M ID: {ID1} Serial: {optris.get_multi_get_serial(ID1)}")
-
-    # PI 640i
-    err,ID2 = optris.multi_usb_init(xml_files[1],None, os.path.join(log_dir, f'log_640i_{int(time.time())}.log'))
-    if err != 0:
-        print(f"Failed to initialize PI 640i: {err}")
-        return False, None, None, None, None
-    print(f"PI 640i ID: {ID2} Serial: {optris.get_multi_get_serial(ID2)}")
+    # one camera per XML file, the image size and serial are read from the device
+    for name, log_name in (('PI 1M', 'log_1m'), ('PI 640i', 'log_640i')):
+        log_file = os.path.join(log_dir, f'{log_name}_{int(time.time())}.log')
+        try:
+            camera = manager.add(camera_frames[name][frame_mode], name, log_file=log_file)
+        except RuntimeError as e:
+            print(e)
+            return False, 0, 0
+        print(f"{name} ID: {camera.id} Serial: {camera.serial} Size: {camera.width}x{camera.height}")
 
     print("Cameras initialized successfully.")
 
-    #dimesions for the GUI (test) 
-    width_1m, height_1m = 764, 480
-    width_640i, height_640i = 640, 480
- 
-    return True,ID1,ID2, width_1m + width_640i, max(height_1m, height_640i)
+    total_width = sum(camera.width for camera in manager)
+    total_height = max(camera.height for camera in manager)
+    return True, total_width, total_height
 
 def close_camera():
+    for viewer in viewers.values():
+        viewer.stop()
+    viewers.clear()
+    for pool, stage in renderers.values():
+        stage.stop()
+        pool.close()
+    renderers.clear()
     try:
-        optris.terminate()
+        manager.close()
         print("Cameras terminated successfully")
     except Exception as e:
         print(f"Failed to terminate cameras: {e}")
 
-def toggle_recording(ID):
-    global recording
+def toggle_recording(name):
     with recording_lock:
-        recording = not recording
-    if recording:
-        print(f"Recording started on {ID}")
+        recorder = recorders.pop(name, None)
+        if recorder is None:
+            recorders[name] = start_recording(name)
+    if recorder is None:
+        print(f"Recording started on {name}")
     else:
-        stop_recording(ID)
-
-def stop_recording(ID):
-    global frame_buffer_1m, frame_buffer_640i, times_computer_1m, times_computer_640i
-    with recording_lock:
-        if ID == ID1 and frame_buffer_1m:
-            save_recording(ID, frame_buffer_1m, times_computer_1m)
-            frame_buffer_1m=[]
-            times_computer_1m = []
-        elif ID == ID2 and frame_buffer_640i:
-            save_recording(ID, frame_buffer_640i, times_computer_640i)
-            frame_buffer_640i = []
-            times_computer_640i = []
-        else:
-            print(f"No data to save for {ID}")
+        stop_recording(name, recorder)
 
 if not os.path.exists(frame_data_dir):
     os.makedirs(frame_data_dir)
 
-def save_recording(camera_name, frame_buffer, timestamps):       
+def start_recording(name):
+    # frames are streamed to disk by the recorder's writer thread straight from the ring buffer
     timestamp = int(time.time())
-    filename_prefix = f'{frame_data_dir}/frame_buffer_{camera_name}_{timestamp}'
-    with open(f'{filename_prefix}.bin', 'wb') as f:
-        np.save(f, np.array(frame_buffer))
-    with open(f'{filename_prefix}_times.bin', 'wb') as f:
-        np.save(f, np.array(timestamps))
-    print(f'Recording stopped and files saved for {camera_name}: {filename_prefix}')
+    return manager[name].record(f'{frame_data_dir}/frame_buffer_{name}_{timestamp}.bin')
+
+def stop_recording(name, recorder):
+    recorder.stop()
+    print(f'Recording stopped and {recorder.frames_written} frames saved for {name}: {recorder.path}')
+    if recorder.dropped:
+        print(f'Recording on {name} dropped {recorder.dropped} frames')
 
 def switch_frame():
     global frame_mode
     frame_mode = 'reduced' if frame_mode == 'full' else 'full'
     print(f"Switch requested to {frame_mode} frame")
 
-def process_pi_1m(ID):
-    global frame_buffer_1m, times_computer_1m, running
-
-    try:
-        w, h = 764, 480  # PI 1M resolution
-
-        while running:
-            thermal_image = optris.get_multi_thermal_image(ID,w, h)[0]
-
-            temperatureData = (thermal_image - 1000.0) / 10.0
-
-            normalized_image = cv2.normalize(temperatureData, None, 0, 255, cv2.NORM_MINMAX)
-            color_image = cv2.applyColorMap(np.uint8(normalized_image), cv2.COLORMAP_JET)
-            cv2.putText(color_image, f"Camera: PI 1M ({frame_mode} frame)", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+def process_camera(camera, viewer):
+    global running
 
-            # Convert to a format suitable for Tkinter
-            img = Image.fromarray(color_image)
-            imgtk = ImageTk.PhotoImage(image=img)
-
-            # Update the Tkinter label with the new image
-            label_img_1m.imgtk = imgtk
-            label_img_1m.configure(image=imgtk)
-            with recording_lock:
-                if recording:
-                    frame_buffer_1m.append(thermal_image)
-                    times_computer_1m.append(time.time())
-
-            time.sleep(0.1)
-
-    except Exception as e:
-        print(f"Error capturing frame from PI 1M: {e}")
-
-def process_pi_640i(ID):
-    global frame_buffer_640i, times_computer_640i, running
+    # colormap rendering runs in worker processes, this thread only hands finished images to the GUI
+    pool = ProcessingPool(render_colormap, (camera.height, camera.width),
+                          result_shape=(camera.height, camera.width, 3))
+    stage = ProcessingStage(camera.acquisition, pool).start()
+    renderers[camera.name] = (pool, stage)
+    shown = -1
 
     try:
-        w, h = 640, 480  # PI 640i resolution
-
         while running:
-            thermal_image = optris.get_multi_thermal_image(ID,w, h)[0]
-            temperatureData = (thermal_image - 1000.0) / 10.0
-            normalized_image = cv2.normalize(temperatureData, None, 0, 255, cv2.NORM_MINMAX)
-            color_image = cv2.applyColorMap(np.uint8(normalized_image), cv2.COLORMAP_JET)
-            cv2.putText(color_image, f"Camera: PI 640i ({frame_mode} frame)", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-
-            # Convert to a format suitable for Tkinter
-            img = Image.fromarray(color_image)
-            imgtk = ImageTk.PhotoImage(image=img)
-
-            # Update the Tkinter label with the new image
-            label_img_640i.imgtk = imgtk
-            label_img_640i.configure(image=imgtk)
-            with recording_lock:
-                if recording:
-                    frame_buffer_640i.append(thermal_image)
-                    times_computer_640i.append(time.time())
-
-            time.sleep(0.1)
+            # post the newest rendered frame, the acquisition thread keeps capturing at full rate
+            index, color_image, _ = stage.latest()
+            if index <= shown:
+                time.sleep(0.01)
+                continue
+            shown = index
+            # the viewer shows it on the Tk main loop; a frame it had no time for is replaced
+            viewer.post(color_image)
 
     except Exception as e:
-        print(f"Error capturing frame from PI 640i: {e}")
-
-def start_cameras(ID1,ID2):
-    threading.Thread(target=process_pi_1m, daemon=True,args=(ID1,)).start()
-    threading.Thread(target=process_pi_640i, daemon=True,args=(ID2,)).start()
+        print(f"Error capturing frame from {camera.name}: {e}")
+
+def overlay(camera):
+    # runs on the Tk main loop, only for frames actually shown
+    def render(color_image):
+        cv2.putText(color_image, f"Camera: {camera.name} ({frame_mode} frame)", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        return color_image
+    return render
+
+def start_cameras():
+    # one acquisition thread per camera grabs frames as fast as the device delivers them
+    manager.start()
+    for name, label in (('PI 1M', label_img_1m), ('PI 640i', label_img_640i)):
+        camera = manager[name]
+        viewer = optris.TkViewer(label, rate=10, render=overlay(camera)).start()
+        viewers[name] = viewer
+        threading.Thread(target=process_camera, daemon=True, args=(camera, viewer)).start()
 
 def create_gui(total_width, total_height):
     global label_img_1m, label_img_640i
@@ -208,11 +164,11 @@ def create_gui(total_width, total_height):
     frame_controls.pack(side=tk.BOTTOM, fill=tk.X)
 
     record_button_1m = tk.Button(frame_controls, text="Start/Stop Recording (PI 1M)",
-                                  command=lambda: toggle_recording(ID1))
+                                  command=lambda: toggle_recording('PI 1M'))
     record_button_1m.pack(side=tk.LEFT, padx=5, pady=5)
 
     record_button_640i = tk.Button(frame_controls, text="Start/Stop Recording (PI 640i)",
-                                    command=lambda: toggle_recording(ID2))
+                                    command=lambda: toggle_recording('PI 640i'))
     record_button_640i.pack(side=tk.LEFT, padx=5, pady=5)
 
     switch_frame_button = tk.Button(frame_controls, text="Switch Full/Reduced Frame", command=switch_frame)
@@ -222,21 +178,24 @@ def create_gui(total_width, total_height):
     quit_button.pack(side=tk.LEFT, padx=5, pady=5)
 
     window.protocol("WM_DELETE_WINDOW", lambda: on_closing(window))
+    start_cameras()
     window.mainloop()
 
 def on_closing(window):
     global running_event
     running_event.clear()
+    with recording_lock:
+        for name, recorder in list(recorders.items()):
+            stop_recording(name, recorder)
+        recorders.clear()
     close_camera()
     window.quit()
     window.destroy()
 
 if __name__ == "__main__":
     # Initialize both cameras using multi_usb_init
-    success, ID1, ID2, total_width, total_height = initialize_cameras()
+    success, total_width, total_height = initialize_cameras()
     if not success:
         print("Cameras failed to initialize...")
     else: 
-        start_cameras(ID1, ID2)
-
         create_gui(total_width, total_height)
\ No newline at end of file
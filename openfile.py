@@ -3,11 +3,17 @@ import cv2
 from tkinter import filedialog
 from PIL import Image, ImageTk
 import tkinter as tk
+import pyOptris as optris
 
 def open_file():
     file_path = filedialog.askopenfilename(defaultextension=".bin",
                                            filetypes=[("Binary files", "*.bin")])
-    if file_path:
+    if file_path and optris.is_recording(file_path):
+        # native recordings are memory mapped, frames are only read when shown
+        recording = optris.open_recording(file_path)
+        status_label.config(text=f"Loaded {len(recording)} frames.")
+        display_frames(recording.frames, recording.timestamps)
+    elif file_path:
         with open(file_path, 'rb') as f:
             data = np.load(f, allow_pickle=True).item()
             frame_buffer = data['frame_buffer']
@@ -1 +1,74 @@
-from .direct_binding import *
\ No newline at end of file
+#
+# The package imports nothing up front: every name below is looked up in its module on
+# first access (PEP 562), so `import pyOptris` is instant and tools that only read
+# recordings never import the SDK binding. The SDK library itself is only loaded on the
+# first device call, see direct_binding.get_backend().
+#
+import importlib
+import importlib.util
+
+_EXPORTS = {
+    "direct_binding": (
+        "DEFAULT_TIMEOUT", "DEFAULT_FRAME_PERIOD", "TIMESTAMP_UNITS", "FRAME_METADATA_DTYPE",
+        "Backoff", "FramePool", "EvoIRFlagState", "EvoIRFrameMetadata",
+        "ColouringPalette", "PaletteScalingMethod", "ShutterMode",
+        "set_frame_period", "frame_period", "wait_for_frame",
+        "usb_init", "multi_usb_init", "tcp_init", "terminate",
+        "get_thermal_image_size", "get_palette_image_size",
+        "get_multi_palette_image_size", "get_multi_thermal_image_size",
+        "get_thermal_image", "get_multi_thermal_image", "get_thermal_image_into", "get_multi_thermal_image_into",
+        "get_multi_get_serial", "get_multi_get_thermal_image_metadata",
+        "get_thermal_image_metadata_into", "get_multi_thermal_image_metadata_into",
+        "get_palette_image", "get_palette_image_into", "get_multi_palette_image", "get_multi_palette_image_into",
+        "get_thermal_palette_image", "get_multi_thermal_palette_image",
+        "set_palette", "set_palette_scale", "set_shutter_mode", "trigger_shutter_flag",
+        "set_temperature_range", "set_radiation_parameters",
+        "set_focus_motor_position", "get_focus_motor_position",
+        "daemon_launch", "daemon_is_running", "daemon_kill",
+        "find_library", "load_library", "get_backend", "backend_loaded", "set_backend", "use_simulator",
+    ),
+    "errors": ("FatalError", "FrameError", "FrameTimeout", "IRImagerError"),
+    "conversion": ("TemperatureConverter", "raw_to_temperature", "temperature_lut", "temperature_to_raw"),
+    "acquisition": ("Acquisition", "RingBuffer", "RingReader"),
+    "sync": ("ClockModel", "FrameSynchroniser", "SyncedFrames"),
+    "drops": ("FrameCounterMonitor", "counter_stats"),
+    "recorder": ("Recorder",),
+    "streams": ("Frame", "FrameStream"),
+    "bus": ("BusReader", "FramePublisher", "bus_name"),
+    "display": ("DisplayScheduler",),
+    "roi": ("Roi", "RoiMonitor", "RoiSeries", "RoiSet"),
+    "pixelstats": ("PixelStatistics", "PixelStatisticsMonitor"),
+    "viewer": ("Mailbox", "TkViewer", "photo_image"),
+    "config": ("ImagerConfig", "ModeSwitch", "load_config", "parse_config"),
+    "formats": ("FormatIndex", "VideoFormat", "load_formats", "parse_formats"),
+    "camera": ("Camera", "CameraManager"),
+    "recording": ("RecordingReader", "RecordingWriter", "is_recording", "open_recording"),
+    "compression": ("CompressedRecordingReader", "CompressedRecordingWriter", "available_codecs"),
+    "analysis": ("RecordingAnalyzer",),
+}
+
+_LOCATIONS = {name: module for module, names in _EXPORTS.items() for name in names}
+
+
+def __getattr__(name):
+    # submodules are left to the import system, `from pyOptris import recording` must not
+    # pull in direct_binding
+    if name.startswith("_") or (name not in _LOCATIONS and importlib.util.find_spec(f".{name}", __name__)):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # any other public name of direct_binding, such as the current `lib`, is still found
+    # there as with the former `from .direct_binding import *`, but not cached
+    module = importlib.import_module(f".{_LOCATIONS.get(name, 'direct_binding')}", __name__)
+    try:
+        value = getattr(module, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    if name in _LOCATIONS:
+        globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LOCATIONS))
+
+
+__all__ = sorted(_LOCATIONS)
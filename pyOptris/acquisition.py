@@ -0,0 +1,413 @@
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from .direct_binding import DEFAULT_TIMEOUT, FRAME_METADATA_DTYPE, Backoff, FramePool, frame_period
+from .errors import error_for
+from .drops import FrameCounterMonitor
+from .sync import ClockModel
+
+
+#
+# Fixed-capacity ring of frames and timestamps shared between one producer thread
+# and any number of consumers. Frame n lives in slot n % capacity; the producer
+# fills the slot in place and then publishes it by bumping `count`, so no lock is
+# taken on either side. The slot of frame `count` may be half written at any time,
+# which leaves capacity - 1 frames readable.
+# Every frame carries three stamps: `timestamps` (wall clock, time.time()), `host_ns`
+# (time.perf_counter_ns() right after the grab returned) and `device_times` (seconds from
+# the device metadata, NaN when the frame was grabbed without metadata). The full
+# EvoIRFrameMetadata of every slot is kept in `metadata`, parallel to `frames`.
+#
+class RingBuffer:
+    def __init__(
+        self,
+        capacity: int,
+        width: int,
+        height: int,
+        channels: Optional[int] = None,
+        dtype=np.uint16,
+    ):
+        if capacity < 2:
+            raise ValueError("a ring buffer needs at least 2 slots")
+        shape = (capacity, height, width) if channels is None else (capacity, height, width, channels)
+        self.capacity = capacity
+        self.width = width
+        self.height = height
+        self.frames = np.zeros(shape, dtype=dtype)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.host_ns = np.zeros(capacity, dtype=np.int64)
+        self.device_times = np.full(capacity, np.nan, dtype=np.float64)
+        self.metadata = np.zeros(capacity, dtype=FRAME_METADATA_DTYPE)
+        self.count = 0
+
+    # slot the producer is allowed to write next
+    @property
+    def write_slot(self) -> int:
+        return self.count % self.capacity
+
+    # publish frames[write_slot], which the producer has already filled
+    def publish(self, timestamp: float, host_ns: int = 0, device_time: float = np.nan):
+        slot = self.count % self.capacity
+        self.timestamps[slot] = timestamp
+        self.host_ns[slot] = host_ns
+        self.device_times[slot] = device_time
+        self.count += 1
+
+    def push(self, frame: np.ndarray, timestamp: float, host_ns: int = 0, device_time: float = np.nan):
+        self.frames[self.count % self.capacity] = frame
+        self.publish(timestamp, host_ns, device_time)
+
+    # slots of the frames [start, stop)
+    def slots(self, start: int, stop: int) -> np.ndarray:
+        return np.arange(start, stop) % self.capacity
+
+    # oldest frame index that cannot be overwritten while it is being copied
+    def oldest(self, count: Optional[int] = None) -> int:
+        if count is None:
+            count = self.count
+        return max(0, count - self.capacity + 1)
+
+    #
+    # @brief copy of the most recently published frame
+    # @param[out] out optional destination array, reused across calls
+    # @return (frame index, frame, timestamp); index is -1 and frame None while the ring is empty
+    #
+    def latest(self, out: Optional[np.ndarray] = None) -> Tuple[int, Optional[np.ndarray], float]:
+        while True:
+            index = self.count - 1
+            if index < 0:
+                return -1, None, 0.0
+            slot = index % self.capacity
+            if out is None:
+                frame = self.frames[slot].copy()
+            else:
+                np.copyto(out, self.frames[slot])
+                frame = out
+            timestamp = float(self.timestamps[slot])
+            # retry if the producer lapped us while copying
+            if index >= self.oldest():
+                return index, frame, timestamp
+
+    def reader(self, from_start: bool = False) -> "RingReader":
+        return RingReader(self, from_start)
+
+
+#
+# Independent read cursor over a RingBuffer. Each consumer gets its own reader and
+# drains frames at its own pace; frames the producer overwrote before they were read
+# are skipped and counted in `dropped` instead of blocking acquisition.
+#
+class RingReader:
+    def __init__(self, ring: RingBuffer, from_start: bool = False):
+        self.ring = ring
+        self.position = ring.oldest() if from_start else ring.count
+        self.read_count = 0
+        self.dropped = 0
+        self.overruns = 0
+
+    def available(self) -> int:
+        return self.ring.count - self.position
+
+    #
+    # @brief copies every frame published since the last call
+    # @param[in] max_frames upper bound on the number of frames returned
+    # @return (frames, timestamps) with shapes (n, h, w) and (n,)
+    #
+    def read(self, max_frames: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        frames, timestamps, _, _, _ = self.read_stamped(max_frames)
+        return frames, timestamps
+
+    # like read(), also returning the host perf_counter_ns, the device time and the
+    # EvoIRFrameMetadata record of every frame.
+    # With `pixels`, flat pixel indices, only those pixels are gathered from the ring and
+    # frames has shape (n, len(pixels)), which spares copying whole frames for ROIs.
+    def read_stamped(self, max_frames: Optional[int] = None, pixels: Optional[np.ndarray] = None) -> Tuple[np.ndarray, ...]:
+        ring = self.ring
+        count = ring.count
+        self._skip_to(ring.oldest(count))
+        n = count - self.position
+        if max_frames is not None:
+            n = min(n, max_frames)
+        slots = ring.slots(self.position, self.position + n)
+        if pixels is None:
+            frames = ring.frames[slots]
+        else:
+            frames = ring.frames.reshape(ring.capacity, -1)[slots[:, None], pixels]
+        timestamps = ring.timestamps[slots]
+        host_ns = ring.host_ns[slots]
+        device_times = ring.device_times[slots]
+        metadata = ring.metadata[slots]
+        # frames overwritten while we were copying them are dropped as well
+        torn = min(n, max(0, ring.oldest() - self.position))
+        if torn:
+            self.dropped += torn
+            self.overruns += 1
+        self.position += n
+        self.read_count += n - torn
+        return frames[torn:], timestamps[torn:], host_ns[torn:], device_times[torn:], metadata[torn:]
+
+    #
+    # @brief copies the next unread frame into `out`, e.g. a slot of shared memory, sparing
+    #        the intermediate copy of read()
+    # @return (frame index, timestamp), or None when every published frame has been read
+    #
+    def read_into(self, out: np.ndarray) -> Optional[Tuple[int, float]]:
+        ring = self.ring
+        while True:
+            count = ring.count
+            self._skip_to(ring.oldest(count))
+            index = self.position
+            if index >= count:
+                return None
+            slot = index % ring.capacity
+            np.copyto(out, ring.frames[slot])
+            timestamp = float(ring.timestamps[slot])
+            self.position += 1
+            # overwritten while we were copying it: dropped, try the next one
+            if index >= ring.oldest():
+                self.read_count += 1
+                return index, timestamp
+            self.dropped += 1
+            self.overruns += 1
+
+    def _skip_to(self, oldest: int):
+        if self.position < oldest:
+            self.dropped += oldest - self.position
+            self.overruns += 1
+            self.position = oldest
+
+
+#
+# Acquisition thread for one camera: grabs frames straight into a RingBuffer as fast
+# as the device delivers them, independently of how fast anyone reads them.
+# While the camera delivers no frames the thread backs off (see direct_binding.Backoff)
+# instead of spinning; a fatal error (-2) ends it and is kept in `error`. The SDK returns -1
+# whenever no new frame is ready, so that is not an error: only a stall is counted, in
+# `timeouts`, once for every DEFAULT_TIMEOUT seconds without a frame. Any other failed grab
+# is counted in `errors`.
+# Listeners added with add_listener() are called from the acquisition thread after every
+# published frame and once when it exits; they must only signal, never process frames.
+# pause() parks the thread without ending it, e.g. while the device is reinitialised, and
+# start() resumes it, grabbing from whatever `id` is set by then.
+# @param[in] id camera ID from multi_usb_init, or None for the single camera opened by usb_init
+# @param[in] palette grab RGB palette images instead of raw thermal data
+# @param[in] metadata grab through evo_irimager_*get_thermal_image_metadata to record the
+#            EvoIRFrameMetadata of every frame in ring.metadata; `clock` then maps device
+#            time to host time, see sync.ClockModel, and `counters` tracks lost and
+#            duplicate frames from the device frame counter
+#
+class Acquisition:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        id=None,
+        capacity: int = 256,
+        palette: bool = False,
+        name: Optional[str] = None,
+        metadata: bool = False,
+    ):
+        if metadata and palette:
+            raise ValueError("device metadata is only available with thermal images")
+        self.id = id
+        self.metadata = metadata
+        self.clock = ClockModel()
+        self.counters = FrameCounterMonitor()
+        self.name = name or (f"camera {id}" if id is not None else "camera")
+        self.ring = RingBuffer(capacity, width, height, channels=3 if palette else None,
+                               dtype=np.uint8 if palette else np.uint16)
+        self.pool = FramePool(width, height, palette=palette, frames=self.ring.frames,
+                              metadata=self.ring.metadata)
+        self.errors = 0
+        self.timeouts = 0
+        self.error = None
+        self.started_at = 0.0
+        # frames published before the last resume(), from the device's previous session
+        self.epoch = 0
+        # frames already folded into `clock` by update_clock()
+        self._clocked = 0
+        # set by the thread once it has published its last frame, before the final listener call
+        self.finished = False
+        self._running = False
+        self._paused = False
+        self._parked = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._listeners = ()
+
+    def start(self) -> "Acquisition":
+        if self._thread is not None:
+            self.resume()
+            return self
+        self._running = True
+        self.finished = False
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name=f"acquisition {self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 1.0):
+        self._running = False
+        self._paused = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    #
+    # @brief parks the acquisition thread; returns once it no longer calls into the SDK
+    # @return False if the thread did not park within `timeout` seconds
+    #
+    def pause(self, timeout: Optional[float] = 1.0) -> bool:
+        if not self.is_running():
+            return True
+        self._wake.clear()
+        self._parked.clear()
+        self._paused = True
+        return self._parked.wait(timeout)
+
+    #
+    # @brief continues a paused acquisition in the same ring buffer. The device is assumed
+    # to have been reinitialised: frame counter and clock model start over.
+    #
+    def resume(self):
+        if self._paused:
+            self._paused = False
+            self._wake.set()
+
+    def reader(self, from_start: bool = False) -> RingReader:
+        return self.ring.reader(from_start)
+
+    # listeners are swapped as a whole tuple, so the acquisition thread never needs a lock
+    def add_listener(self, callback: Callable[[], None]):
+        self._listeners = self._listeners + (callback,)
+
+    def remove_listener(self, callback: Callable[[], None]):
+        self._listeners = tuple(listener for listener in self._listeners if listener is not callback)
+
+    def latest(self, out: Optional[np.ndarray] = None) -> Tuple[int, Optional[np.ndarray], float]:
+        return self.ring.latest(out)
+
+    # mean capture rate over the frames currently held in the ring, since the last resume()
+    def frame_rate(self) -> float:
+        ring = self.ring
+        count = ring.count
+        oldest = max(ring.oldest(count), self.epoch)
+        if count - oldest < 2:
+            return 0.0
+        first = ring.timestamps[oldest % ring.capacity]
+        last = ring.timestamps[(count - 1) % ring.capacity]
+        return float((count - 1 - oldest) / (last - first)) if last > first else 0.0
+
+    # folds the device/host timestamp pairs published since the last call into `clock`
+    def update_clock(self) -> ClockModel:
+        ring = self.ring
+        count = ring.count
+        slots = ring.slots(max(ring.oldest(count), self.epoch, self._clocked), count)
+        self._clocked = count
+        self.clock.update(ring.device_times[slots], ring.host_ns[slots] * 1e-9)
+        return self.clock
+
+    # @return host perf_counter seconds of the frames [start, stop), via the clock model when fitted
+    def aligned_times(self, start: int, stop: int) -> np.ndarray:
+        ring = self.ring
+        slots = ring.slots(start, stop)
+        host = ring.host_ns[slots] * 1e-9
+        if not self.clock.fitted:
+            return host
+        device = ring.device_times[slots]
+        return np.where(np.isnan(device), host, self.clock.to_host(device))
+
+    def stats(self) -> dict:
+        stats = {
+            "captured": self.ring.count,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "fps": self.frame_rate(),
+        }
+        if self.error is not None:
+            stats["error"] = str(self.error)
+        if self.metadata:
+            stats["frame_counters"] = self.counters.stats()
+        if self.clock.fitted:
+            stats["clock_drift_ppm"] = self.clock.drift_ppm
+            stats["clock_jitter_ms"] = self.clock.jitter * 1e3
+        return stats
+
+    def _grabber(self) -> Callable[[int], Tuple[int, int]]:
+        pool = self.pool
+        if self.id is None:
+            return pool.grab_metadata if self.metadata else pool.grab
+        id = self.id
+        grab_multi = pool.grab_multi_metadata if self.metadata else pool.grab_multi
+        return lambda slot: grab_multi(id, slot)
+
+    def _run(self):
+        ring = self.ring
+        capacity = ring.capacity
+        pool = self.pool
+        grab = self._grabber()
+        metadata = self.metadata
+        counter_hw = ring.metadata["counterHW"]
+        observe = self.counters.observe
+        perf_counter_ns = time.perf_counter_ns
+        backoff = Backoff(frame_period(self.id))
+        failing = False
+        timeout_ns = int(DEFAULT_TIMEOUT * 1e9)
+        waiting_since = None
+        try:
+            while self._running:
+                if self._paused:
+                    self._parked.set()
+                    self._wake.wait()
+                    # the device was reopened: new ID, frame period, counter and clock
+                    grab = self._grabber()
+                    backoff = Backoff(frame_period(self.id))
+                    failing = False
+                    waiting_since = None
+                    self.counters.last = None
+                    self.clock = ClockModel(self.clock.min_samples, self.clock.halflife)
+                    self.epoch = ring.count
+                    continue
+                slot, err = grab(ring.count % capacity)
+                # stamp as soon as the blocking grab returns, before anything else can delay us
+                host_ns = perf_counter_ns()
+                if err == 0:
+                    waiting_since = None
+                    if failing:
+                        failing = False
+                        backoff.reset()
+                    if metadata:
+                        observe(int(counter_hw[slot]))
+                        ring.publish(time.time(), host_ns, pool.device_time(slot))
+                    else:
+                        ring.publish(time.time(), host_ns)
+                    for listener in self._listeners:
+                        listener()
+                elif err == -2:
+                    self.error = error_for(err, f"{self.name} lost its connection")
+                    self._running = False
+                else:
+                    if err != -1:
+                        self.errors += 1
+                    elif waiting_since is None:
+                        waiting_since = host_ns
+                    elif host_ns - waiting_since >= timeout_ns:
+                        self.timeouts += 1
+                        waiting_since = host_ns
+                    failing = True
+                    backoff.sleep()
+        finally:
+            self.finished = True
+            for listener in self._listeners:
+                listener()
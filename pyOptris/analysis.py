@@ -0,0 +1,242 @@
+#
+# Batch analysis of recordings in worker processes:
+#
+#   with RecordingAnalyzer("run.bin", workers=8) as analyzer:
+#       spots = analyzer.run(hotspots)                        # per-chunk function
+#       maxima = analyzer.run(np.max, per="frame")            # per-frame function
+#       crossings = threshold_crossings(analyzer, 950.0)
+#
+#   python -m pyOptris.analysis run.bin -a hotspots -w 8 -o hotspots.npz
+#
+# The frame range is split into chunks; every worker process opens the recording itself
+# (native recordings are memory mapped, compressed ones decode only the chunks they need)
+# and reads just its own frame range, so nothing but the small per-chunk results crosses
+# process boundaries. Results come back in frame order whatever order the workers finish
+# in, which lets reductions carry state from one chunk into the next.
+#
+import argparse
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .compression import CompressedRecordingReader
+from .conversion import DEFAULT_DECIMALS, RAW_OFFSET
+from .recording import open_recording
+from .roi import RoiSet
+
+HOTSPOT_DTYPE = np.dtype([
+    ("index", "<i8"),
+    ("timestamp", "<f8"),
+    ("x", "<i4"),
+    ("y", "<i4"),
+    ("temperature", "<f4"),
+])
+
+
+# worker process side
+_recording = None
+
+
+def _open_worker(path: str):
+    global _recording
+    _recording = open_recording(path)
+
+
+def _run_range(func: Callable, per: str, start: int, stop: int) -> Any:
+    frames = _recording.frames[start:stop]
+    timestamps = np.asarray(_recording.timestamps[start:stop])
+    if per == "chunk":
+        return func(frames, timestamps, start)
+    return [func(frame) for frame in frames]
+
+
+#
+# @brief default reduction: concatenates array, dict-of-array and list results in frame order
+#
+def concatenate(results: List[Any]) -> Any:
+    if not results:
+        return results
+    first = results[0]
+    if isinstance(first, np.ndarray):
+        return np.concatenate(results)
+    if isinstance(first, dict):
+        return {key: concatenate([result[key] for result in results]) for key in first}
+    if isinstance(first, list):
+        return [item for result in results for item in result]
+    return results
+
+
+#
+# Maps functions over a recording in a process pool.
+# @param[in] workers processes, os.cpu_count() by default
+# @param[in] chunk_frames frames per task; compressed recordings use their own chunks
+# @param[in] mp_context multiprocessing start method, "spawn" like ProcessingPool
+#
+class RecordingAnalyzer:
+    def __init__(self, path: str, workers: Optional[int] = None, chunk_frames: int = 1024,
+                 mp_context: str = "spawn"):
+        self.path = os.path.abspath(path)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_frames = chunk_frames
+        recording = open_recording(self.path)
+        self.frame_count = len(recording)
+        self.attrs = recording.attrs
+        # compressed chunks decode as a whole, so tasks follow their boundaries
+        self._boundaries = None
+        if isinstance(recording, CompressedRecordingReader):
+            self._boundaries = np.append(recording.index["first"], self.frame_count).astype(np.int64)
+        recording.close()
+        self._executor = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context(mp_context),
+            initializer=_open_worker,
+            initargs=(self.path,),
+        )
+
+    def __enter__(self) -> "RecordingAnalyzer":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    # @return (start, stop) frame ranges of the tasks covering start..stop
+    def ranges(self, start: int = 0, stop: Optional[int] = None) -> List[Tuple[int, int]]:
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        if self._boundaries is not None:
+            inner = self._boundaries[(self._boundaries > start) & (self._boundaries < stop)]
+            edges = np.concatenate(([start], inner, [stop]))
+        else:
+            edges = np.append(np.arange(start, stop, self.chunk_frames), stop)
+        return [(int(lo), int(hi)) for lo, hi in zip(edges[:-1], edges[1:]) if hi > lo]
+
+    #
+    # @brief results of `func` for every task, in frame order
+    # @param[in] func module-level function (it is pickled by reference), or a
+    #            functools.partial of one; per "chunk": func(frames, timestamps, first index),
+    #            per "frame": func(frame), whose results come back as one list per task
+    #
+    def map(self, func: Callable, per: str = "chunk", start: int = 0, stop: Optional[int] = None) -> Iterator[Any]:
+        if per not in ("chunk", "frame"):
+            raise ValueError(f"per must be 'chunk' or 'frame', got {per!r}")
+        ranges = self.ranges(start, stop)
+        return self._executor.map(_run_range, *zip(*[(func, per, lo, hi) for lo, hi in ranges])) if ranges \
+            else iter(())
+
+    #
+    # @brief maps `func` and reduces the results in frame order
+    # @param[in] reduce reduce(results) of the ordered list, concatenate() by default; or with
+    #            `initial`, a fold reduce(accumulator, result) applied as results arrive
+    #
+    def run(self, func: Callable, per: str = "chunk", reduce: Optional[Callable] = None,
+            initial: Any = None, start: int = 0, stop: Optional[int] = None) -> Any:
+        results = self.map(func, per, start, stop)
+        if initial is not None:
+            return functools.reduce(reduce, results, initial)
+        return (reduce or concatenate)(list(results))
+
+
+#
+# @brief hottest pixel of every frame
+# @return HOTSPOT_DTYPE records: frame index, timestamp, position and temperature
+#
+def hotspots(frames: np.ndarray, timestamps: np.ndarray, first: int,
+             decimals: int = DEFAULT_DECIMALS, offset: float = RAW_OFFSET) -> np.ndarray:
+    flat = frames.reshape(len(frames), -1)
+    position = flat.argmax(axis=1)
+    result = np.empty(len(frames), dtype=HOTSPOT_DTYPE)
+    result["index"] = np.arange(first, first + len(frames))
+    result["timestamp"] = timestamps
+    result["y"], result["x"] = np.divmod(position, frames.shape[2])
+    result["temperature"] = (flat[np.arange(len(frames)), position] - offset) / 10.0 ** decimals
+    return result
+
+
+#
+# @brief per-ROI statistics of every frame, see RoiSet.compute; use as
+#   analyzer.run(functools.partial(roi_statistics, rois))
+#
+def roi_statistics(rois: RoiSet, frames: np.ndarray, timestamps: np.ndarray, first: int) -> dict:
+    stats = rois.compute(np.asarray(frames))
+    stats["index"] = np.arange(first, first + len(frames))
+    stats["timestamp"] = timestamps
+    return stats
+
+
+def _threshold_chunk(raw_threshold: int, frames: np.ndarray, timestamps: np.ndarray, first: int):
+    above = frames.reshape(len(frames), -1).max(axis=1) >= raw_threshold
+    return first, above
+
+
+#
+# @brief frames at which the hottest pixel crosses `threshold` degrees, upwards or downwards
+# Crossings at task boundaries are found by carrying the last state of each chunk into
+# the next one, which relies on the ordered reduction.
+# @return (indices, rising) arrays: frame index of each crossing and True for upward ones
+#
+def threshold_crossings(analyzer: RecordingAnalyzer, threshold: float, decimals: int = DEFAULT_DECIMALS,
+                        offset: float = RAW_OFFSET) -> Tuple[np.ndarray, np.ndarray]:
+    raw = int(np.ceil(threshold * 10.0 ** decimals + offset))
+
+    def fold(state, result):
+        indices, rising, previous = state
+        first, above = result
+        if len(above) == 0:
+            return state
+        changes = np.flatnonzero(above[1:] != above[:-1]) + 1
+        if previous is not None and above[0] != previous:
+            changes = np.concatenate(([0], changes))
+        indices.append(first + changes)
+        rising.append(above[changes])
+        return indices, rising, bool(above[-1])
+
+    indices, rising, _ = analyzer.run(functools.partial(_threshold_chunk, raw), reduce=fold,
+                                      initial=([], [], None))
+    if not indices:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+    return np.concatenate(indices), np.concatenate(rising)
+
+
+ANALYSES = ("hotspots", "crossings")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="pyOptris recording batch analysis")
+    parser.add_argument("recording")
+    parser.add_argument("-a", "--analysis", choices=ANALYSES, default="hotspots")
+    parser.add_argument("-t", "--threshold", type=float, default=100.0, help="crossings threshold in degrees")
+    parser.add_argument("-w", "--workers", type=int)
+    parser.add_argument("-c", "--chunk-frames", type=int, default=1024)
+    parser.add_argument("-o", "--output", help="write the result to this .npz file")
+    args = parser.parse_args(argv)
+
+    with RecordingAnalyzer(args.recording, args.workers, args.chunk_frames) as analyzer:
+        if args.analysis == "hotspots":
+            result = {"hotspots": analyzer.run(hotspots)}
+            spots = result["hotspots"]
+            if len(spots):
+                hottest = spots[spots["temperature"].argmax()]
+                print(f"{len(spots)} frames, hottest {hottest['temperature']:.1f} at frame {hottest['index']} "
+                      f"({hottest['x']}, {hottest['y']})")
+        else:
+            indices, rising = threshold_crossings(analyzer, args.threshold)
+            result = {"indices": indices, "rising": rising}
+            print(f"{len(indices)} crossings of {args.threshold} degrees, {int(rising.sum())} upwards")
+    if args.output:
+        np.savez(args.output, **result)
+    return result
+
+
+if __name__ == "__main__":
+    main()
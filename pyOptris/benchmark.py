@@ -0,0 +1,298 @@
+#
+# Throughput benchmarks for the capture and recording pipeline, run against the simulator
+# backend so they are reproducible without a camera:
+#
+#   python -m pyOptris.benchmark                                  # every scenario and format
+#   python -m pyOptris.benchmark -s dual -f "PI1M 72x56 @ 1000Hz" -o bench.json
+#   python -m pyOptris.benchmark --fast                           # no frame pacing, pipeline ceiling
+#
+# Scenarios: "single" (usb_init + one Acquisition), "dual" (two multi_usb_init cameras) and
+# "record" (one camera recorded to disk while a DisplayScheduler renders the max over each
+# 30 Hz display window). With --compression the record scenario writes a compressed
+# recording (see compression.py) and also reports the compression ratio and the MB/s of
+# raw frames recorded and actually written:
+#
+#   python -m pyOptris.benchmark -s record -f "PI1M 72x56 @ 1000Hz" -c zlib -c lzma
+#
+# Each result reports the frame interval distribution, the capture to publish latency (host
+# perf_counter stamp of each published frame minus its device timestamp mapped onto
+# perf_counter through the simulated device clock), sustained fps, frames dropped by the
+# simulated device queue and by consumers, CPU use and the process peak RSS as JSON.
+#
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from . import direct_binding
+from .acquisition import Acquisition
+from .compression import available_codecs
+from .conversion import raw_to_temperature
+from .display import DisplayScheduler
+from .recorder import Recorder
+from .simulator import SIMULATED_FORMATS, SimulatedIRImager, simulated_format
+
+SCENARIOS = ("single", "dual", "record")
+DISPLAY_RATE = 30.0
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def distribution(milliseconds: np.ndarray) -> dict:
+    if len(milliseconds) == 0:
+        return {}
+    p50, p90, p99 = np.percentile(milliseconds, (50, 90, 99))
+    return {
+        "mean": float(milliseconds.mean()),
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+        "max": float(milliseconds.max()),
+    }
+
+
+# @param[in] host perf_counter seconds of consecutive published frames
+def interval_stats(host: np.ndarray) -> dict:
+    return distribution(np.diff(host) * 1000.0)
+
+
+#
+# @brief capture to publish latency of the frames of one simulated camera
+# @param[in] host perf_counter seconds at which the frames were published
+# @param[in] device device timestamps of the same frames, seconds
+#
+def latency_stats(host: np.ndarray, device: np.ndarray, camera) -> dict:
+    captured = camera._start + device / (1.0 + camera.clock_drift_ppm * 1e-6)
+    return distribution((host - captured) * 1000.0)
+
+
+# copies the host and device stamps of every published frame without touching the frames
+class _TimestampCollector:
+    def __init__(self, ring, period: float = 0.02):
+        self.ring = ring
+        self.period = period
+        self.host: List[np.ndarray] = []
+        self.device: List[np.ndarray] = []
+        self.missed = 0
+        self._position = ring.count
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            self._collect()
+            time.sleep(self.period)
+        self._collect()
+
+    def _collect(self):
+        ring = self.ring
+        count = ring.count
+        oldest = ring.oldest(count)
+        if self._position < oldest:
+            self.missed += oldest - self._position
+            self._position = oldest
+        slots = np.arange(self._position, count) % ring.capacity
+        self.host.append(ring.host_ns[slots] * 1e-9)
+        self.device.append(ring.device_times[slots])
+        self._position = count
+
+    # @return perf_counter and device seconds of the collected frames
+    def stop(self):
+        self._running = False
+        self._thread.join()
+        return np.concatenate(self.host), np.concatenate(self.device)
+
+
+def _display_loop(scheduler: DisplayScheduler, stop: threading.Event, shown: list):
+    ring = scheduler.acquisition.ring
+    out = np.empty((ring.height, ring.width), dtype=np.uint16)
+    temperature = np.empty(out.shape, dtype=np.float32)
+    image = np.empty(out.shape, dtype=np.uint8)
+    while not stop.is_set():
+        result = scheduler.next(out, timeout=0.1)
+        if result is not None:
+            raw_to_temperature(result[1], temperature)
+            low, high = temperature.min(), temperature.max()
+            temperature -= low
+            temperature *= 255.0 / max(high - low, 1e-6)
+            image[...] = temperature
+            shown[0] += 1
+
+
+def _write_config(directory: str, serial: int) -> str:
+    path = os.path.join(directory, f"sim_{serial}.xml")
+    with open(path, "w") as f:
+        f.write(f"<imager><serial>{serial}</serial></imager>")
+    return path
+
+
+#
+# @brief runs one scenario on one simulated format
+# @param[in] realtime pace frames at the format's rate; False measures the pipeline ceiling
+# @param[in] compression codec of the record scenario, None records raw frames
+# @return JSON-serialisable result dictionary
+#
+def run_scenario(
+    scenario: str,
+    format_name: str,
+    duration: float = 2.0,
+    warmup: float = 0.5,
+    realtime: bool = True,
+    directory: Optional[str] = None,
+    compression: Optional[str] = None,
+) -> dict:
+    if scenario not in SCENARIOS:
+        raise ValueError(f"unknown scenario {scenario!r}, expected one of {SCENARIOS}")
+    width, height, rate = simulated_format(format_name)
+    simulator = SimulatedIRImager(default_format=format_name, realtime=realtime)
+    previous = direct_binding.set_backend(simulator)
+    cleanup = directory is None
+    directory = directory or tempfile.mkdtemp(prefix="pyoptris_bench_")
+    capacity = max(256, int(rate))
+    acquisitions, recorder, display, scheduler = [], None, None, None
+    stop_display = threading.Event()
+    shown = [0]
+    record_path = os.path.join(directory, f"bench_{scenario}_{width}x{height}.bin")
+    try:
+        if scenario == "dual":
+            for serial in (1, 2):
+                err, id = direct_binding.multi_usb_init(_write_config(directory, serial))
+                acquisitions.append(Acquisition(width, height, id.value, capacity=capacity, metadata=True))
+        else:
+            direct_binding.usb_init(_write_config(directory, 1))
+            acquisitions.append(Acquisition(width, height, capacity=capacity, metadata=True))
+        for acquisition in acquisitions:
+            acquisition.start()
+        if scenario == "record":
+            recorder = Recorder(record_path, width, height, fsync="never",
+                                compression=compression).start(acquisitions[0].reader())
+            scheduler = DisplayScheduler(acquisitions[0], DISPLAY_RATE, mode="max")
+            display = threading.Thread(target=_display_loop, args=(scheduler, stop_display, shown),
+                                       daemon=True)
+            display.start()
+
+        time.sleep(warmup)
+        collectors = [_TimestampCollector(acquisition.ring) for acquisition in acquisitions]
+        cameras = [simulator.devices[acquisition.id or 0] for acquisition in acquisitions]
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        device_start = [camera._index + 1 - camera.frame_count for camera in cameras]
+        captured_start = [acquisition.ring.count for acquisition in acquisitions]
+        written_start = recorder.frames_written if recorder else 0
+        shown_start = shown[0]
+
+        time.sleep(duration)
+
+        captured = [acquisition.ring.count - start for acquisition, start in zip(acquisitions, captured_start)]
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        stamps = [collector.stop() for collector in collectors]
+        device_dropped = [camera._index + 1 - camera.frame_count - start
+                          for camera, start in zip(cameras, device_start)]
+        result = {
+            "scenario": scenario,
+            "format": format_name,
+            "width": width,
+            "height": height,
+            "target_fps": rate,
+            "realtime": realtime,
+            "duration": wall,
+            "frames": captured,
+            "fps": [n / wall for n in captured],
+            "mbytes_per_s": sum(captured) * width * height * 2 / wall / 1e6,
+            "device_dropped": device_dropped,
+            "collector_missed": [collector.missed for collector in collectors],
+            "interval_ms": [interval_stats(host) for host, _ in stamps],
+            "latency_ms": [latency_stats(host, device, camera) for (host, device), camera in zip(stamps, cameras)],
+            "cpu_percent": 100.0 * cpu / wall,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        if recorder is not None:
+            result["recorded_fps"] = (recorder.frames_written - written_start) / wall
+            result["recorder_dropped"] = recorder.dropped
+            result["compression"] = compression
+            # chunks still being compressed are only counted once the recorder has flushed them
+            recorder.stop()
+            result["compression_ratio"] = recorder.compression_ratio
+            result["recorded_mbytes_per_s"] = result["recorded_fps"] * width * height * 2 / 1e6
+            result["disk_mbytes_per_s"] = result["recorded_mbytes_per_s"] / (recorder.compression_ratio or 1.0)
+            result["display_fps"] = (shown[0] - shown_start) / wall
+            result["display"] = scheduler.stats()
+        return result
+    finally:
+        stop_display.set()
+        if display is not None:
+            display.join()
+        for acquisition in acquisitions:
+            acquisition.stop()
+        if recorder is not None:
+            recorder.stop()
+        direct_binding.terminate()
+        direct_binding.set_backend(previous)
+        if cleanup:
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+
+
+def _summary(result: dict) -> str:
+    intervals = result["interval_ms"][0]
+    latency = result["latency_ms"][0]
+    line = (
+        f"{result['scenario']:<7} {result['format']:<28} "
+        f"fps {'/'.join(f'{fps:.0f}' for fps in result['fps']):>9} "
+        f"interval p99 {intervals.get('p99', 0):6.2f} ms "
+        f"latency p50 {latency.get('p50', 0):6.2f} ms p99 {latency.get('p99', 0):6.2f} ms "
+        f"drop {sum(result['device_dropped']):>5} cpu {result['cpu_percent']:5.1f}%"
+    )
+    if "recorded_fps" in result:
+        line += f" rec {result['recorded_fps']:.0f} fps disp {result['display_fps']:.0f} fps"
+        if result["compression"]:
+            line += (f" {result['compression']} x{result['compression_ratio']:.2f} "
+                     f"{result['recorded_mbytes_per_s']:.1f} -> {result['disk_mbytes_per_s']:.1f} MB/s")
+    return line
+
+
+def main(argv=None) -> List[dict]:
+    parser = argparse.ArgumentParser(description="pyOptris capture pipeline benchmarks (simulator backend)")
+    parser.add_argument("-s", "--scenario", action="append", choices=SCENARIOS)
+    parser.add_argument("-f", "--format", action="append", choices=sorted(SIMULATED_FORMATS))
+    parser.add_argument("-d", "--duration", type=float, default=2.0)
+    parser.add_argument("-w", "--warmup", type=float, default=0.5)
+    parser.add_argument("--fast", action="store_true", help="do not pace frames at the format rate")
+    parser.add_argument("-c", "--compression", action="append", choices=available_codecs(),
+                        help="codec of the record scenario, repeat to compare codecs")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scenario in args.scenario or SCENARIOS:
+        for format_name in args.format or SIMULATED_FORMATS:
+            codecs = (args.compression or [None]) if scenario == "record" else [None]
+            for codec in codecs:
+                result = run_scenario(scenario, format_name, args.duration, args.warmup, not args.fast,
+                                      compression=codec)
+                print(_summary(result), flush=True)
+                results.append(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .direct_binding import Backoff
+from .errors import FrameTimeout
+from .shared import attach_segment
+
+#
+# Shared memory frame bus
+# =======================
+# One named shared memory segment per camera, laid out like the recording container so
+# every block is a plain NumPy view:
+#
+#   offset 0                 BUS_HEADER_DTYPE, zero padded up to BUS_HEADER_SIZE
+#   sequences_offset         capacity uint64 slot sequence numbers
+#   timestamps_offset        capacity float64 wall clock timestamps
+#   host_ns_offset           capacity int64 perf_counter_ns stamps
+#   device_times_offset      capacity float64 device timestamps (NaN without metadata)
+#   frames_offset            capacity frames of height * width (* channels) `dtype`
+#
+# Frame n lives in slot n % capacity. Each slot is guarded by its own seqlock: the
+# publisher sets the slot sequence to 2n + 1 before writing frame n and to 2n + 2 after,
+# then publishes `count` = n + 1 in the header. A reader copies the slot and accepts it
+# only if the sequence read before and after the copy is 2n + 2, so a frame overwritten
+# while it was being read is detected and counted as dropped, never returned torn.
+# Readers never write to the segment, so any number of processes can follow one camera.
+#
+BUS_MAGIC = b"OPTRSBUS"
+BUS_VERSION = 1
+BUS_HEADER_SIZE = 4096
+
+BUS_HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("header_size", "<u4"),
+    ("width", "<u4"),
+    ("height", "<u4"),
+    ("channels", "<u4"),
+    ("capacity", "<u4"),
+    ("dtype", "S8"),
+    ("serial", "<u8"),
+    ("count", "<u8"),
+    ("closed", "<u4"),
+    ("pid", "<u4"),
+    ("frame_rate", "<f8"),
+    ("sequences_offset", "<u8"),
+    ("timestamps_offset", "<u8"),
+    ("host_ns_offset", "<u8"),
+    ("device_times_offset", "<u8"),
+    ("frames_offset", "<u8"),
+    ("name", "S64"),
+])
+
+
+# segment name a camera is published under by default
+def bus_name(serial: int) -> str:
+    return f"pyoptris_{serial}"
+
+
+def _align(offset: int, alignment: int = 64) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+# maps the blocks of a bus segment described by `header`
+def _views(buf, header) -> dict:
+    capacity = int(header["capacity"])
+    shape = (capacity, int(header["height"]), int(header["width"]))
+    if header["channels"]:
+        shape += (int(header["channels"]),)
+    return {
+        "sequences": np.ndarray((capacity,), np.uint64, buf, int(header["sequences_offset"])),
+        "timestamps": np.ndarray((capacity,), np.float64, buf, int(header["timestamps_offset"])),
+        "host_ns": np.ndarray((capacity,), np.int64, buf, int(header["host_ns_offset"])),
+        "device_times": np.ndarray((capacity,), np.float64, buf, int(header["device_times_offset"])),
+        "frames": np.ndarray(shape, np.dtype(header["dtype"].item().decode()), buf, int(header["frames_offset"])),
+    }
+
+
+#
+# Mirrors an Acquisition's ring buffer into a bus segment from its own thread, woken by
+# the acquisition after every frame, so other local processes can follow the camera.
+# @param[in] name segment name, bus_name(serial) by default
+# @param[in] capacity frames kept in the segment, the acquisition ring capacity by default
+#
+class FramePublisher:
+    def __init__(
+        self,
+        acquisition,
+        name: Optional[str] = None,
+        capacity: Optional[int] = None,
+        serial: int = 0,
+    ):
+        ring = acquisition.ring
+        self.acquisition = acquisition
+        self.name = name or bus_name(serial)
+        self.capacity = capacity or ring.capacity
+        self.published = 0
+
+        frame_shape = ring.frames.shape[1:]
+        header = np.zeros((), dtype=BUS_HEADER_DTYPE)
+        header["magic"] = BUS_MAGIC
+        header["version"] = BUS_VERSION
+        header["header_size"] = BUS_HEADER_SIZE
+        header["height"], header["width"] = frame_shape[:2]
+        header["channels"] = frame_shape[2] if len(frame_shape) == 3 else 0
+        header["capacity"] = self.capacity
+        header["dtype"] = ring.frames.dtype.str.encode()
+        header["serial"] = serial
+        header["pid"] = os.getpid()
+        header["name"] = acquisition.name.encode()[:64]
+        header["sequences_offset"] = BUS_HEADER_SIZE
+        header["timestamps_offset"] = _align(BUS_HEADER_SIZE + self.capacity * 8)
+        header["host_ns_offset"] = _align(int(header["timestamps_offset"]) + self.capacity * 8)
+        header["device_times_offset"] = _align(int(header["host_ns_offset"]) + self.capacity * 8)
+        header["frames_offset"] = _align(int(header["device_times_offset"]) + self.capacity * 8)
+        size = int(header["frames_offset"]) + self.capacity * ring.frames[0].nbytes
+
+        self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        self.header = np.ndarray((), BUS_HEADER_DTYPE, self.shm.buf)
+        self.header[()] = header
+        self._views = _views(self.shm.buf, self.header)
+        self._new_frame = threading.Event()
+        self._running = False
+        self._thread = None
+        self._reader = None
+
+    def start(self) -> "FramePublisher":
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._reader = self.acquisition.reader()
+        self.acquisition.add_listener(self._new_frame.set)
+        self._thread = threading.Thread(target=self._run, name=f"publisher {self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    # stops publishing and removes the segment; attached readers see `closed`
+    def stop(self):
+        self._running = False
+        self._new_frame.set()
+        self.acquisition.remove_listener(self._new_frame.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.shm is not None:
+            self.header["closed"] = 1
+            self.header = self._views = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    @property
+    def dropped(self) -> int:
+        return self._reader.dropped if self._reader is not None else 0
+
+    def _run(self):
+        views = self._views
+        sequences, frames = views["sequences"], views["frames"]
+        timestamps, host_ns, device_times = views["timestamps"], views["host_ns"], views["device_times"]
+        header = self.header
+        capacity = self.capacity
+        while self._running:
+            self._new_frame.wait(0.1)
+            self._new_frame.clear()
+            batch, stamps, hosts, devices, _ = self._reader.read_stamped(capacity)
+            for i in range(len(batch)):
+                n = self.published
+                slot = n % capacity
+                sequences[slot] = 2 * n + 1
+                frames[slot] = batch[i]
+                timestamps[slot] = stamps[i]
+                host_ns[slot] = hosts[i]
+                device_times[slot] = devices[i]
+                sequences[slot] = 2 * n + 2
+                self.published = n + 1
+                header["count"] = n + 1
+            if len(batch):
+                header["frame_rate"] = self.acquisition.frame_rate()
+
+
+#
+# Client side of the frame bus, usable from any local process:
+#
+#   with BusReader(bus_name(serial)) as bus:
+#       index, frame, timestamp = bus.latest()
+#       frames, timestamps = bus.read()
+#
+# read() follows the stream like RingReader, counting frames it was too slow for in
+# `dropped`; view() gives zero-copy access to a slot, to be confirmed with valid() after use.
+# @param[in] from_start start read() at the oldest frame still in the segment
+#
+class BusReader:
+    def __init__(self, name: str, from_start: bool = False):
+        self.name = name
+        self.shm = attach_segment(name)
+        header = np.ndarray((), BUS_HEADER_DTYPE, self.shm.buf)
+        if header["magic"].item() != BUS_MAGIC:
+            self.shm.close()
+            raise ValueError(f"{name} is not a pyOptris frame bus")
+        if header["version"] > BUS_VERSION:
+            self.shm.close()
+            raise ValueError(f"{name} has unsupported frame bus version {header['version']}")
+        self.header = header
+        views = _views(self.shm.buf, header)
+        self.sequences = views["sequences"]
+        self.frames = views["frames"]
+        self.timestamps = views["timestamps"]
+        self.host_ns = views["host_ns"]
+        self.device_times = views["device_times"]
+        self.capacity = int(header["capacity"])
+        self.position = self.oldest() if from_start else self.count
+        self.read_count = 0
+        self.dropped = 0
+
+    def __enter__(self) -> "BusReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.header = self.sequences = self.frames = None
+        self.timestamps = self.host_ns = self.device_times = None
+        self.shm.close()
+        self.shm = None
+
+    @property
+    def count(self) -> int:
+        return int(self.header["count"])
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.header["closed"])
+
+    @property
+    def width(self) -> int:
+        return int(self.header["width"])
+
+    @property
+    def height(self) -> int:
+        return int(self.header["height"])
+
+    @property
+    def serial(self) -> int:
+        return int(self.header["serial"])
+
+    @property
+    def frame_rate(self) -> float:
+        return float(self.header["frame_rate"])
+
+    def oldest(self, count: Optional[int] = None) -> int:
+        if count is None:
+            count = self.count
+        return max(0, count - self.capacity + 1)
+
+    # True while frame `index` is complete in its slot
+    def valid(self, index: int) -> bool:
+        return int(self.sequences[index % self.capacity]) == 2 * index + 2
+
+    # zero-copy view of the slot holding frame `index`; check valid(index) after using it
+    def view(self, index: int) -> np.ndarray:
+        return self.frames[index % self.capacity]
+
+    #
+    # @brief copy of the newest frame
+    # @return (frame index, frame, timestamp); index is -1 and frame None before the first frame
+    #
+    def latest(self, out: Optional[np.ndarray] = None) -> Tuple[int, Optional[np.ndarray], float]:
+        while True:
+            index = self.count - 1
+            if index < 0:
+                return -1, None, 0.0
+            frame, timestamp = self._copy(index, out)
+            if frame is not None:
+                return index, frame, timestamp
+
+    #
+    # @brief copies every frame published since the last call
+    # @return (frames, timestamps) with shapes (n, h, w) and (n,)
+    #
+    def read(self, max_frames: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        count = self.count
+        oldest = self.oldest(count)
+        if self.position < oldest:
+            self.dropped += oldest - self.position
+            self.position = oldest
+        n = count - self.position
+        if max_frames is not None:
+            n = min(n, max_frames)
+        indices = np.arange(self.position, self.position + n)
+        slots = indices % self.capacity
+        before = self.sequences[slots]
+        frames = self.frames[slots]
+        timestamps = self.timestamps[slots]
+        after = self.sequences[slots]
+        good = (before == after) & (before == 2 * indices + 2)
+        self.position += n
+        self.read_count += int(good.sum())
+        self.dropped += n - int(good.sum())
+        return frames[good], timestamps[good]
+
+    #
+    # @brief waits for a frame newer than `after`, polling with a backoff tuned to the frame rate
+    # @return the new frame count
+    # @throws FrameTimeout, or EOFError once the publisher has stopped
+    #
+    def wait(self, after: Optional[int] = None, timeout: Optional[float] = 1.0) -> int:
+        after = self.position if after is None else after
+        deadline = None if timeout is None else time.monotonic() + timeout
+        rate = self.frame_rate
+        backoff = Backoff(1.0 / rate if rate > 0 else 0.01)
+        while True:
+            count = self.count
+            if count > after:
+                return count
+            if self.closed:
+                raise EOFError(f"frame bus {self.name} was closed")
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise FrameTimeout(f"no frame on bus {self.name} within {timeout} s")
+            backoff.sleep(remaining)
+
+    def _copy(self, index: int, out: Optional[np.ndarray]):
+        slot = index % self.capacity
+        sequence = int(self.sequences[slot])
+        if sequence != 2 * index + 2:
+            return None, 0.0
+        if out is None:
+            frame = self.frames[slot].copy()
+        else:
+            np.copyto(out, self.frames[slot])
+            frame = out
+        timestamp = float(self.timestamps[slot])
+        if int(self.sequences[slot]) != sequence:
+            return None, 0.0
+        return frame, timestamp
@@ -0,0 +1,367 @@
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from . import direct_binding
+from .acquisition import Acquisition, RingReader
+from .bus import FramePublisher
+from .config import ImagerConfig, ModeSwitch, load_config
+from .errors import FrameTimeout, IRImagerError, check
+from .formats import VideoFormat, load_formats
+from .recorder import Recorder
+from .roi import RoiMonitor, RoiSet
+from .streams import FrameStream
+
+
+#
+# One camera opened with multi_usb_init. The image size and serial are queried from the
+# device rather than hardcoded, and each camera owns its acquisition thread and ring buffer,
+# so cameras never wait on each other or on a shared lock.
+# @param[in] xml_config camera XML config path or config.ImagerConfig; set <serial> when more
+#            than one camera is attached
+# @param[in] capacity ring buffer size in frames, 1024 by default
+# @param[in] video_format the format the config selects, a formats.VideoFormat or its name
+#            in Formats.def (see formats.FormatIndex.select); when known, allocate() sets up
+#            the ring buffer before the device is initialised
+# Each frame size the camera is switched to (see CameraManager.switch) gets its own
+# acquisition, kept paused while another one is active, so buffers and threads survive
+# mode switches; `acquisition` is the active one.
+#
+class Camera:
+    def __init__(
+        self,
+        xml_config,
+        name: Optional[str] = None,
+        capacity: Optional[int] = None,
+        formats_def: Optional[str] = None,
+        log_file: Optional[str] = None,
+        video_format=None,
+    ):
+        self._config = None
+        if isinstance(xml_config, ImagerConfig):
+            self._config = xml_config
+            xml_config = xml_config.file()
+        self.xml_config = xml_config
+        self.name = name or os.path.splitext(os.path.basename(xml_config))[0]
+        self.capacity = capacity
+        self.formats_def = formats_def
+        self.log_file = log_file
+        if isinstance(video_format, str):
+            video_format = load_formats(formats_def).find(video_format)
+        self.video_format: Optional[VideoFormat] = video_format
+        self.id = None
+        self.serial = None
+        self.width, self.height = video_format.size if video_format is not None else (0, 0)
+        self.acquisition: Optional[Acquisition] = None
+        self.acquisitions: Dict[Tuple[int, int], Acquisition] = {}
+        self.switches: List[ModeSwitch] = []
+
+    def __repr__(self) -> str:
+        return f"Camera({self.name!r}, id={self.id}, serial={self.serial}, {self.width}x{self.height})"
+
+    # the parsed xml_config, see config.load_config
+    @property
+    def config(self) -> ImagerConfig:
+        if self._config is None:
+            self._config = load_config(self.xml_config)
+        return self._config
+
+    def open(self) -> "Camera":
+        err, id = direct_binding.multi_usb_init(self.xml_config, self.formats_def, self.log_file)
+        check(err, f"Failed to initialize {self.name} with {self.xml_config}")
+        self.id = id.value
+        err, self.serial = direct_binding.get_multi_get_serial(self.id)
+        check(err, f"Failed to read the serial number of {self.name}")
+        self.width, self.height, err = direct_binding.get_multi_thermal_image_size(self.id)
+        check(err, f"Failed to read the image size of {self.name}")
+        if self.width <= 0 or self.height <= 0:
+            raise IRImagerError(f"{self.name} reported an image size of {self.width}x{self.height}")
+        if self.video_format is not None:
+            if self.video_format.size != (self.width, self.height):
+                raise IRImagerError(
+                    f"{self.name} delivers {self.width}x{self.height}, not the "
+                    f"{self.video_format.width}x{self.video_format.height} of {self.video_format.name!r}"
+                )
+            direct_binding.set_frame_period(1.0 / self.video_format.rate, self.id)
+        elif self._config is not None and self._config.framerate:
+            direct_binding.set_frame_period(1.0 / self._config.framerate, self.id)
+        for acquisition in self.acquisitions.values():
+            acquisition.id = self.id
+        return self
+
+    @property
+    def is_open(self) -> bool:
+        return self.id is not None
+
+    #
+    # @brief makes the acquisition for the current image size the active one, creating it
+    # and its ring buffer if needed, without starting it; may be called before open() when
+    # the video format is known, so the allocation is done before the device streams
+    #
+    def allocate(self) -> Acquisition:
+        if self.width <= 0 or self.height <= 0:
+            raise IRImagerError(f"the image size of {self.name} is unknown, open it or give a video_format")
+        self.acquisition = self._acquisition_for(self.width, self.height)
+        return self.acquisition
+
+    def _acquisition_for(self, width: int, height: int) -> Acquisition:
+        acquisition = self.acquisitions.get((width, height))
+        if acquisition is None:
+            acquisition = Acquisition(
+                width, height, self.id, capacity=self.capacity or 1024, name=self.name, metadata=True,
+            )
+            self.acquisitions[(width, height)] = acquisition
+        return acquisition
+
+    # @brief starts the active acquisition, or resumes it after a mode switch
+    def start(self) -> "Camera":
+        if not self.is_open:
+            self.open()
+        self.allocate().start()
+        return self
+
+    def stop(self):
+        for acquisition in self.acquisitions.values():
+            acquisition.stop()
+
+    def latest(self, out: Optional[np.ndarray] = None) -> Tuple[int, Optional[np.ndarray], float]:
+        return self.acquisition.latest(out)
+
+    def reader(self, from_start: bool = False) -> RingReader:
+        return self.acquisition.reader(from_start)
+
+    #
+    # @brief starts streaming this camera's frames to a recording, see Recorder for kwargs;
+    # serial, videoformatindex and temperature_range default to the camera's and its config's
+    #
+    def record(self, path: str, **kwargs) -> Recorder:
+        attrs = dict(kwargs.pop("attrs", None) or {}, camera=self.name)
+        if self.video_format is not None:
+            attrs.setdefault("video_format", self.video_format.name)
+        config = self.config
+        kwargs.setdefault("serial", self.serial)
+        if config.videoformatindex is not None:
+            kwargs.setdefault("videoformatindex", config.videoformatindex)
+        if config.temperature_range is not None:
+            kwargs.setdefault("temperature_range", config.temperature_range)
+        recorder = Recorder(path, self.width, self.height, attrs=attrs, **kwargs)
+        return recorder.start(self.reader())
+
+    # @brief publishes this camera's frames to other local processes, see bus.FramePublisher
+    def publish(self, name: Optional[str] = None, **kwargs) -> FramePublisher:
+        if self.acquisition is None:
+            self.start()
+        return FramePublisher(self.acquisition, name, serial=self.serial, **kwargs).start()
+
+    #
+    # @brief asynchronous stream of this camera's frames, starting the camera if needed:
+    #   async for frame in camera.frames(): ...
+    # see FrameStream for max_queue, policy and from_start
+    #
+    def frames(self, **kwargs) -> FrameStream:
+        if self.acquisition is None or not self.acquisition.is_running():
+            self.start()
+        return FrameStream(self.acquisition, **kwargs)
+
+    # @brief empty RoiSet for this camera's frames, see roi.RoiSet
+    def rois(self, percentiles=()) -> RoiSet:
+        return RoiSet((self.height, self.width), percentiles=percentiles)
+
+    # @brief ROI statistics time series of every frame, starting the camera if needed
+    def monitor(self, rois: RoiSet, **kwargs) -> RoiMonitor:
+        if self.acquisition is None or not self.acquisition.is_running():
+            self.start()
+        return RoiMonitor(self.acquisition, rois, **kwargs).start()
+
+    # single grab outside of the acquisition thread, waiting up to `timeout` seconds
+    def grab(self, timeout: Optional[float] = direct_binding.DEFAULT_TIMEOUT) -> Tuple[np.ndarray, int]:
+        return direct_binding.get_multi_thermal_image(self.id, self.width, self.height, timeout)
+
+    def stats(self) -> dict:
+        stats = {"name": self.name, "id": self.id, "serial": self.serial}
+        if self.acquisition is not None:
+            stats.update(self.acquisition.stats())
+        return stats
+
+
+#
+# Owns any number of Cameras, keyed by name. The SDK has one global terminate, so cameras
+# are shut down together by close().
+#
+class CameraManager:
+    def __init__(self):
+        self.cameras: Dict[str, Camera] = {}
+
+    def __enter__(self) -> "CameraManager":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getitem__(self, name: str) -> Camera:
+        return self.cameras[name]
+
+    def __iter__(self) -> Iterator[Camera]:
+        return iter(self.cameras.values())
+
+    def __len__(self) -> int:
+        return len(self.cameras)
+
+    # @brief opens a camera and registers it; see Camera for the arguments
+    def add(self, xml_config: str, name: Optional[str] = None, **kwargs) -> Camera:
+        camera = Camera(xml_config, name, **kwargs)
+        if camera.name in self.cameras:
+            raise ValueError(f"a camera named {camera.name!r} is already registered")
+        if camera.video_format is not None:
+            camera.allocate()
+        camera.open()
+        self.cameras[camera.name] = camera
+        return camera
+
+    def by_serial(self, serial: int) -> Camera:
+        for camera in self.cameras.values():
+            if camera.serial == serial:
+                return camera
+        raise KeyError(serial)
+
+    def by_id(self, id: int) -> Camera:
+        for camera in self.cameras.values():
+            if camera.id == id:
+                return camera
+        raise KeyError(id)
+
+    def start(self) -> "CameraManager":
+        for camera in self.cameras.values():
+            camera.start()
+        return self
+
+    def stop(self):
+        for camera in self.cameras.values():
+            camera.stop()
+
+    def close(self):
+        self.stop()
+        if self.cameras:
+            direct_binding.terminate()
+        for camera in self.cameras.values():
+            camera.id = None
+        self.cameras.clear()
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: camera.stats() for name, camera in self.cameras.items()}
+
+    #
+    # @brief reinitialises a camera with another config, e.g. to toggle between a full frame
+    # and a fast reduced format:
+    #   manager.switch("17092037", videoformatindex=3, framerate=1000)
+    # The SDK can only terminate all cameras at once, so every camera is reopened; their
+    # acquisition threads are paused meanwhile rather than ended, and each frame size keeps
+    # its ring buffer, so switching back and forth allocates nothing after the first time.
+    # The config file is written and, given `video_format`, the new ring buffer allocated
+    # before the cameras stop streaming. If reopening fails or the new mode delivers no frame,
+    # the previous config is restored and the paused acquisitions resumed before the error
+    # is raised.
+    # A switch that changes the frame size makes camera.acquisition another Acquisition: the
+    # Recorder, ProcessingStage, FrameStream or RoiMonitor attached to the previous one gets
+    # no more frames until the camera switches back to that size. Stop them and attach new
+    # ones to camera.acquisition.
+    # @param[in] config path or config.ImagerConfig, the camera's current config by default
+    # @param[in] overrides config settings to change, see ImagerConfig.replace
+    # @param[in] video_format formats.VideoFormat (or name) the new config selects, if known
+    # @param[in] timeout seconds to wait for the first frame in the new mode
+    # @return the ModeSwitch timings, also appended to camera.switches
+    #
+    def switch(self, name: str, config=None, video_format=None, timeout: float = 5.0, **overrides) -> ModeSwitch:
+        camera = self.cameras[name]
+        if config is None:
+            config = camera.config
+        elif not isinstance(config, ImagerConfig):
+            config = load_config(config)
+        if overrides:
+            config = config.replace(**overrides)
+        path = config.file()
+        if isinstance(video_format, str):
+            video_format = load_formats(camera.formats_def).find(video_format)
+        reused = video_format is not None and video_format.size in camera.acquisitions
+        if video_format is not None:
+            camera._acquisition_for(*video_format.size)
+        running = [other for other in self.cameras.values()
+                   if other.acquisition is not None and other.acquisition.is_running()]
+
+        started = time.perf_counter()
+        for other in running:
+            if not other.acquisition.pause():
+                for resumed in running:
+                    resumed.acquisition.resume()
+                raise IRImagerError(f"the acquisition of {other.name} did not pause")
+        paused = time.perf_counter()
+        ring = camera.acquisition.ring if camera.acquisition is not None else None
+        last_frame = ring.host_ns[(ring.count - 1) % ring.capacity] * 1e-9 if ring is not None and ring.count else paused
+        previous = (camera._config, camera.xml_config, camera.video_format)
+        try:
+            self._reopen(camera, config, path, video_format)
+            if video_format is None:
+                reused = (camera.width, camera.height) in camera.acquisitions
+            acquisition = camera.allocate()
+            count = acquisition.ring.count
+            for other in running:
+                other.start()
+            if camera not in running:
+                acquisition.start()
+            reopened = time.perf_counter()
+
+            deadline = reopened + timeout
+            while acquisition.ring.count == count:
+                if time.perf_counter() > deadline:
+                    raise FrameTimeout(f"{camera.name} delivered no frame within {timeout} s of the switch")
+                time.sleep(0.0005)
+        except Exception as error:
+            try:
+                self._restore(camera, previous, running)
+            except Exception as recovery:
+                raise IRImagerError(
+                    f"switching {camera.name} failed ({error}) and restoring its previous config failed too: {recovery}"
+                ) from error
+            raise
+        first_frame = acquisition.ring.host_ns[count % acquisition.ring.capacity] * 1e-9
+        result = ModeSwitch(
+            camera.name, path, camera.width, camera.height, reused,
+            pause=paused - started, reinit=reopened - paused,
+            first_frame=first_frame - reopened, downtime=first_frame - last_frame,
+        )
+        camera.switches.append(result)
+        return result
+
+    # terminates every camera and opens them again, `camera` with the given config
+    def _reopen(self, camera: Camera, config: Optional[ImagerConfig], path: str, video_format):
+        direct_binding.terminate()
+        for other in self.cameras.values():
+            other.id = None
+        camera._config, camera.xml_config, camera.video_format = config, path, video_format
+        for other in self.cameras.values():
+            other.open()
+
+    # back to the config before a failed switch, with the `running` cameras streaming again
+    def _restore(self, camera: Camera, previous: tuple, running: List[Camera]):
+        for other in running:
+            for acquisition in other.acquisitions.values():
+                if not acquisition.paused:
+                    acquisition.pause()
+        if camera not in running and camera.acquisition is not None:
+            camera.acquisition.stop()
+        self._reopen(camera, *previous)
+        camera.allocate()
+        for other in running:
+            other.start()
+
+    # @brief waits until every started camera has delivered a frame
+    def wait_ready(self, timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(camera.acquisition is not None and camera.acquisition.ring.count > 0
+                   for camera in self.cameras.values()):
+                return True
+            time.sleep(0.01)
+        return False
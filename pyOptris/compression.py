@@ -0,0 +1,589 @@
+import collections
+import json
+import lzma
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .drops import counter_stats
+from .recording import METADATA_DTYPE, _align, _dtype_to_json
+
+#
+# Compressed recording container
+# ==============================
+# Thermal frames compress well once neighbouring frames are subtracted: most pixels change
+# by a few counts. Frames are stored in independent chunks of up to chunk_frames frames,
+# each compressed on its own in a thread pool (zlib, lzma, zstd and blosc2 release the GIL)
+# and written in order:
+#
+#   offset 0                 COMPRESSED_HEADER_DTYPE, UTF-8 JSON attributes, zero padded
+#                            up to HEADER_SIZE
+#   HEADER_SIZE              chunks, back to back: CHUNK_HEADER_DTYPE, compressed frame
+#                            payload, then the chunk's float64 timestamps and metadata records
+#   index_offset             chunk_count CHUNK_INDEX_DTYPE entries, written on close
+#
+# Within a chunk the first frame is stored as is and every other frame as its difference
+# to the previous one (uint16 wrap-around arithmetic, so the round trip is exact); the
+# high and low bytes are then split into two planes ("shuffle") before compression.
+# A chunk therefore decodes without any other chunk, which gives random access through
+# the index. frame_count and chunk_count are advanced after each chunk is written; a file
+# without index (the writer was killed) is recovered by walking the chunk headers.
+#
+COMPRESSED_MAGIC = b"OPTRSCMP"
+COMPRESSED_VERSION = 1
+HEADER_SIZE = 4096
+CHUNK_MAGIC = b"CHNK"
+
+COMPRESSED_HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("header_size", "<u4"),
+    ("width", "<u4"),
+    ("height", "<u4"),
+    ("videoformatindex", "<i4"),
+    ("attrs_size", "<u4"),
+    ("serial", "<u8"),
+    ("temperature_min", "<f8"),
+    ("temperature_max", "<f8"),
+    ("frame_count", "<u8"),
+    ("chunk_count", "<u8"),
+    ("index_offset", "<u8"),
+    ("end_offset", "<u8"),
+    ("codec", "S16"),
+    ("level", "<i4"),
+    ("delta", "<u4"),
+    ("chunk_frames", "<u4"),
+])
+
+CHUNK_HEADER_DTYPE = np.dtype([
+    ("magic", "S4"),
+    ("frames", "<u4"),
+    ("first", "<u8"),
+    ("payload_size", "<u8"),
+    ("crc32", "<u4"),
+    ("reserved", "<u4"),
+])
+
+CHUNK_INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("first", "<u8"),
+    ("frames", "<u4"),
+    ("payload_size", "<u8"),
+])
+
+
+#
+# One lossless byte codec. level None uses the codec's default, chosen for recording
+# speed rather than ratio.
+#
+class Codec(NamedTuple):
+    name: str
+    compress: Callable[[bytes, int], bytes]
+    decompress: Callable[[bytes], bytes]
+    default_level: int
+
+
+def _zstd() -> Optional[Codec]:
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return Codec("zstd", lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+                 lambda data: zstandard.ZstdDecompressor().decompress(data), 3)
+
+
+def _blosc() -> Optional[Codec]:
+    try:
+        import blosc2
+    except ImportError:
+        return None
+    # the frames are shuffled already, blosc only has to run its codec
+    return Codec("blosc", lambda data, level: blosc2.compress(data, clevel=level, filter=blosc2.Filter.NOFILTER,
+                                                             codec=blosc2.Codec.ZSTD),
+                 blosc2.decompress, 5)
+
+
+_CODECS: Dict[str, Optional[Codec]] = {
+    "zlib": Codec("zlib", zlib.compress, zlib.decompress, 1),
+    "lzma": Codec("lzma", lambda data, level: lzma.compress(data, preset=level), lzma.decompress, 0),
+}
+_OPTIONAL_CODECS = {"zstd": _zstd, "blosc": _blosc}
+
+
+# @brief codec by name; zstd and blosc need the zstandard and blosc2 packages
+def get_codec(name: str) -> Codec:
+    if name not in _CODECS and name in _OPTIONAL_CODECS:
+        _CODECS[name] = _OPTIONAL_CODECS[name]()
+    codec = _CODECS.get(name)
+    if codec is None:
+        if name in _OPTIONAL_CODECS:
+            raise ValueError(f"codec {name!r} is not installed")
+        raise ValueError(f"unknown codec {name!r}, expected one of {sorted(set(_CODECS) | set(_OPTIONAL_CODECS))}")
+    return codec
+
+
+# @return names of the codecs usable in this environment
+def available_codecs() -> List[str]:
+    names = []
+    for name in list(_CODECS) + [name for name in _OPTIONAL_CODECS if name not in _CODECS]:
+        try:
+            get_codec(name)
+        except ValueError:
+            continue
+        names.append(name)
+    return names
+
+
+# @brief delta and shuffle transform of (n, h, w) uint16 frames, the inverse of _decode
+def _encode(frames: np.ndarray, delta: bool) -> bytes:
+    frames = np.ascontiguousarray(frames, dtype="<u2").reshape(len(frames), -1)
+    if delta and len(frames) > 1:
+        deltas = np.empty_like(frames)
+        deltas[0] = frames[0]
+        np.subtract(frames[1:], frames[:-1], out=deltas[1:])
+        frames = deltas
+    planes = frames.view(np.uint8).reshape(-1, 2)
+    return planes.T.tobytes()
+
+
+def _decode(data: bytes, n: int, height: int, width: int, delta: bool) -> np.ndarray:
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(2, -1)
+    interleaved = np.empty((planes.shape[1], 2), dtype=np.uint8)
+    interleaved.T[...] = planes
+    frames = interleaved.view("<u2").reshape(n, height * width)
+    if delta:
+        np.cumsum(frames, axis=0, dtype=np.uint16, out=frames)
+    return frames.reshape(n, height, width)
+
+
+def _compress_chunk(codec: Codec, level: int, delta: bool, first: int, frames: np.ndarray,
+                    timestamps: np.ndarray, metadata: np.ndarray) -> bytes:
+    payload = codec.compress(_encode(frames, delta), level)
+    header = np.zeros((), dtype=CHUNK_HEADER_DTYPE)
+    header["magic"] = CHUNK_MAGIC
+    header["frames"] = len(frames)
+    header["first"] = first
+    header["payload_size"] = len(payload)
+    header["crc32"] = zlib.crc32(payload)
+    return b"".join((header.tobytes(), payload, np.ascontiguousarray(timestamps, dtype="<f8").tobytes(),
+                     np.ascontiguousarray(metadata).tobytes()))
+
+
+def is_compressed_recording(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(COMPRESSED_MAGIC)) == COMPRESSED_MAGIC
+
+
+#
+# Writer for the compressed container, a drop-in for RecordingWriter in Recorder.
+# append() collects frames into chunks of chunk_frames and hands every full chunk to the
+# thread pool right away; commit() writes the chunks compressed by then, in order, without
+# waiting for the others, so compression of several chunks overlaps with capture.
+# @param[in] codec "zlib" (default), "lzma", "zstd" or "blosc", see available_codecs()
+# @param[in] level codec level, None for the codec's fast default
+# @param[in] delta store frame differences within a chunk
+# @param[in] workers compression threads; at most 2 * workers chunks are in flight, append()
+#            blocks on the oldest one beyond that
+#
+class CompressedRecordingWriter:
+    def __init__(
+        self,
+        path: str,
+        width: int,
+        height: int,
+        serial: int = 0,
+        videoformatindex: int = -1,
+        temperature_range: Tuple[float, float] = (0.0, 0.0),
+        metadata_dtype: np.dtype = METADATA_DTYPE,
+        attrs: Optional[dict] = None,
+        codec: str = "zlib",
+        level: Optional[int] = None,
+        delta: bool = True,
+        chunk_frames: int = 256,
+        workers: int = 4,
+    ):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.codec = get_codec(codec)
+        self.level = self.codec.default_level if level is None else level
+        self.delta = delta
+        self.chunk_frames = chunk_frames
+        self.metadata_dtype = np.dtype(metadata_dtype)
+        self.frame_count = 0
+        self.committed = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+        self.attrs = dict(attrs or {})
+        self.attrs["metadata_dtype"] = _dtype_to_json(self.metadata_dtype)
+        attrs_json = self._encode_attrs()
+
+        self.header = np.zeros((), dtype=COMPRESSED_HEADER_DTYPE)
+        self.header["magic"] = COMPRESSED_MAGIC
+        self.header["version"] = COMPRESSED_VERSION
+        self.header["header_size"] = HEADER_SIZE
+        self.header["width"] = width
+        self.header["height"] = height
+        self.header["videoformatindex"] = videoformatindex
+        self.header["attrs_size"] = len(attrs_json)
+        self.header["serial"] = serial
+        self.header["temperature_min"], self.header["temperature_max"] = temperature_range
+        self.header["end_offset"] = HEADER_SIZE
+        self.header["codec"] = self.codec.name.encode()
+        self.header["level"] = self.level
+        self.header["delta"] = delta
+        self.header["chunk_frames"] = chunk_frames
+
+        self.index: List[tuple] = []
+        self.file = open(path, "wb+")
+        self.file.write(self.header.tobytes() + attrs_json)
+        self.file.write(b"\0" * (HEADER_SIZE - self.file.tell()))
+        self.file.flush()
+
+        self._frames = np.empty((chunk_frames, height, width), dtype=np.uint16)
+        self._timestamps = np.empty(chunk_frames, dtype=np.float64)
+        self._metadata = np.zeros(chunk_frames, dtype=self.metadata_dtype)
+        self._fill = 0
+        self._max_pending = 2 * workers
+        self._pending = collections.deque()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="compress")
+
+    def __enter__(self) -> "CompressedRecordingWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.index)
+
+    # compressed size relative to the raw frames written so far
+    @property
+    def ratio(self) -> float:
+        return self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 0.0
+
+    #
+    # @brief queues frames for compression; they become visible to readers once their chunk
+    # is written by commit()
+    #
+    def append(self, frames: np.ndarray, timestamps: np.ndarray, metadata: Optional[np.ndarray] = None):
+        done = 0
+        while done < len(frames):
+            n = min(len(frames) - done, self.chunk_frames - self._fill)
+            rows = slice(self._fill, self._fill + n)
+            self._frames[rows] = frames[done:done + n]
+            self._timestamps[rows] = timestamps[done:done + n]
+            if metadata is not None:
+                self._metadata[rows] = metadata[done:done + n]
+            else:
+                self._metadata[rows] = np.zeros((), dtype=self.metadata_dtype)
+            self._fill += n
+            done += n
+            self.frame_count += n
+            if self._fill == self.chunk_frames:
+                self._submit()
+
+    # @brief writes every chunk compressed so far and publishes it in the header
+    def commit(self, sync: bool = False):
+        self._write_ready(wait=False)
+        self._commit(sync)
+
+    # compresses the last partial chunk, writes the chunk index and closes the file
+    def close(self, sync: bool = True):
+        if self.file.closed:
+            return
+        if self._fill:
+            self._submit()
+        self._write_ready(wait=True)
+        self._executor.shutdown()
+        index = np.array(self.index, dtype=CHUNK_INDEX_DTYPE)
+        offset = _align(int(self.header["end_offset"]), 8)
+        self._write_at(offset, index.tobytes())
+        self.header["index_offset"] = offset
+        self._commit(sync)
+        self.file.close()
+
+    def update_attrs(self, **attrs):
+        previous = int(self.header["attrs_size"])
+        self.attrs.update(attrs)
+        attrs_json = self._encode_attrs()
+        self._write_at(COMPRESSED_HEADER_DTYPE.itemsize, attrs_json + b"\0" * max(0, previous - len(attrs_json)))
+        self.header["attrs_size"] = len(attrs_json)
+        self._write_at(0, self.header.tobytes())
+        self.file.flush()
+
+    def _encode_attrs(self) -> bytes:
+        attrs_json = json.dumps(self.attrs).encode()
+        if COMPRESSED_HEADER_DTYPE.itemsize + len(attrs_json) > HEADER_SIZE:
+            raise ValueError(f"recording attributes exceed the {HEADER_SIZE} byte header")
+        return attrs_json
+
+    def _submit(self):
+        n = self._fill
+        first = self.frame_count - n
+        future = self._executor.submit(_compress_chunk, self.codec, self.level, self.delta, first,
+                                       self._frames[:n].copy(), self._timestamps[:n].copy(),
+                                       self._metadata[:n].copy())
+        self._pending.append((first, n, future))
+        self._fill = 0
+        if len(self._pending) > self._max_pending:
+            self._write_ready(wait=False, at_most=len(self._pending) - self._max_pending)
+
+    # writes finished chunks in order; with `at_most` waits for that many chunks
+    def _write_ready(self, wait: bool, at_most: Optional[int] = None):
+        written = 0
+        while self._pending:
+            first, n, future = self._pending[0]
+            if not (wait or (at_most is not None and written < at_most) or future.done()):
+                return
+            chunk = future.result()
+            self._pending.popleft()
+            offset = int(self.header["end_offset"])
+            self._write_at(offset, chunk)
+            payload_size = len(chunk) - CHUNK_HEADER_DTYPE.itemsize - n * (8 + self.metadata_dtype.itemsize)
+            self.index.append((offset, first, n, payload_size))
+            self.header["end_offset"] = offset + len(chunk)
+            self.raw_bytes += n * self.width * self.height * 2
+            self.compressed_bytes += payload_size
+            written += 1
+
+    def _commit(self, sync: bool):
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+        self.header["chunk_count"] = len(self.index)
+        self.header["frame_count"] = self.index[-1][1] + self.index[-1][2] if self.index else 0
+        self._write_at(0, self.header.tobytes())
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+        self.committed = int(self.header["frame_count"])
+
+    def _write_at(self, offset: int, data):
+        self.file.seek(offset)
+        self.file.write(data)
+
+
+#
+# Reader for the compressed container with the interface of RecordingReader: len(),
+# reader[i], reader.frames[a:b], frame(i), timestamps and metadata. Frames are decoded a
+# chunk at a time; the most recently used chunks are cached, so sequential access decodes
+# every chunk once. read() decodes a range of chunks in parallel.
+# @param[in] cache_chunks decoded chunks kept in memory
+#
+class CompressedRecordingReader:
+    def __init__(self, path: str, cache_chunks: int = 4):
+        self.path = path
+        self.cache_chunks = cache_chunks
+        self._cache = collections.OrderedDict()
+        self.file = None
+        self.refresh()
+
+    def __enter__(self) -> "CompressedRecordingReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def refresh(self):
+        if self.file is None:
+            self.file = open(self.path, "rb")
+        self.file.seek(0)
+        raw = self.file.read(HEADER_SIZE)
+        if raw[:len(COMPRESSED_MAGIC)] != COMPRESSED_MAGIC:
+            raise ValueError(f"{self.path} is not a pyOptris compressed recording")
+        header = np.frombuffer(raw, dtype=COMPRESSED_HEADER_DTYPE, count=1)[0]
+        if header["version"] > COMPRESSED_VERSION:
+            raise ValueError(f"{self.path} has unsupported compressed recording version {header['version']}")
+        attrs_start = COMPRESSED_HEADER_DTYPE.itemsize
+        self.header = header
+        self.attrs = json.loads(raw[attrs_start:attrs_start + int(header["attrs_size"])].decode())
+        self.metadata_dtype = np.dtype(self.attrs["metadata_dtype"])
+        self.codec = get_codec(header["codec"].decode())
+        self.delta = bool(header["delta"])
+        self.index = self._read_index()
+        self._timestamps = self._metadata = None
+        self.frames = _CompressedFrames(self)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return int(self.index["first"][-1] + self.index["frames"][-1]) if len(self.index) else 0
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    @property
+    def width(self) -> int:
+        return int(self.header["width"])
+
+    @property
+    def height(self) -> int:
+        return int(self.header["height"])
+
+    @property
+    def serial(self) -> int:
+        return int(self.header["serial"])
+
+    @property
+    def videoformatindex(self) -> int:
+        return int(self.header["videoformatindex"])
+
+    @property
+    def temperature_range(self) -> Tuple[float, float]:
+        return float(self.header["temperature_min"]), float(self.header["temperature_max"])
+
+    # raw frame bytes over stored payload bytes
+    @property
+    def ratio(self) -> float:
+        payload = int(self.index["payload_size"].sum())
+        return len(self) * self.width * self.height * 2 / payload if payload else 0.0
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        if self._timestamps is None:
+            self._load_stamps()
+        return self._timestamps
+
+    @property
+    def metadata(self) -> np.ndarray:
+        if self._metadata is None:
+            self._load_stamps()
+        return self._metadata
+
+    # @return (frame, timestamp, metadata record) of frame `index`
+    def frame(self, index: int):
+        return self.frames[index], float(self.timestamps[index]), self.metadata[index]
+
+    def frame_drops(self, step: Optional[int] = None) -> dict:
+        return counter_stats(self.metadata["counter_hw"], step)
+
+    # @brief (n, h, w) frames start..stop, decoding their chunks on `workers` threads
+    def read(self, start: int = 0, stop: Optional[int] = None, workers: int = 4) -> np.ndarray:
+        stop = len(self) if stop is None else min(stop, len(self))
+        out = np.empty((max(0, stop - start), self.height, self.width), dtype=np.uint16)
+        if stop <= start:
+            return out
+        first, last = self.chunk_of(start), self.chunk_of(stop - 1)
+        with ThreadPoolExecutor(workers) as executor:
+            for chunk, frames in zip(range(first, last + 1), executor.map(self.decode_chunk, range(first, last + 1))):
+                begin = int(self.index["first"][chunk])
+                lo, hi = max(start, begin), min(stop, begin + len(frames))
+                out[lo - start:hi - start] = frames[lo - begin:hi - begin]
+        return out
+
+    def chunk_of(self, index: int) -> int:
+        return int(np.searchsorted(self.index["first"], index, side="right")) - 1
+
+    # @brief all frames of chunk `chunk`, uncached; raises ValueError if the payload is corrupt
+    def decode_chunk(self, chunk: int) -> np.ndarray:
+        entry = self.index[chunk]
+        offset = int(entry["offset"])
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            header = self._chunk_header(chunk, offset, f.read(CHUNK_HEADER_DTYPE.itemsize))
+            payload = f.read(int(entry["payload_size"]))
+        self._check_payload(chunk, offset, header, payload)
+        data = self.codec.decompress(payload)
+        return _decode(data, int(entry["frames"]), self.height, self.width, self.delta)
+
+    def _chunk(self, chunk: int) -> np.ndarray:
+        frames = self._cache.get(chunk)
+        if frames is None:
+            frames = self.decode_chunk(chunk)
+            frames.flags.writeable = False
+            self._cache[chunk] = frames
+            while len(self._cache) > self.cache_chunks:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(chunk)
+        return frames
+
+    def _read_index(self) -> np.ndarray:
+        header = self.header
+        count = int(header["chunk_count"])
+        if header["index_offset"]:
+            self.file.seek(int(header["index_offset"]))
+            return np.frombuffer(self.file.read(count * CHUNK_INDEX_DTYPE.itemsize), dtype=CHUNK_INDEX_DTYPE)
+        # still recording, or the writer died: walk the committed chunks
+        index = np.empty(count, dtype=CHUNK_INDEX_DTYPE)
+        offset = HEADER_SIZE
+        for i in range(count):
+            self.file.seek(offset)
+            chunk = self._chunk_header(i, offset, self.file.read(CHUNK_HEADER_DTYPE.itemsize))
+            self._check_payload(i, offset, chunk, self.file.read(int(chunk["payload_size"])))
+            index[i] = (offset, chunk["first"], chunk["frames"], chunk["payload_size"])
+            offset += self._chunk_size(int(chunk["frames"]), int(chunk["payload_size"]))
+        return index
+
+    def _chunk_header(self, chunk: int, offset: int, raw: bytes) -> np.void:
+        if len(raw) < CHUNK_HEADER_DTYPE.itemsize:
+            raise ValueError(f"{self.path}: chunk {chunk} at offset {offset} is truncated")
+        header = np.frombuffer(raw, dtype=CHUNK_HEADER_DTYPE)[0]
+        if header["magic"] != CHUNK_MAGIC:
+            raise ValueError(f"{self.path}: corrupt chunk {chunk} at offset {offset}")
+        return header
+
+    def _check_payload(self, chunk: int, offset: int, header: np.void, payload: bytes):
+        if len(payload) != header["payload_size"]:
+            raise ValueError(f"{self.path}: chunk {chunk} at offset {offset} is truncated")
+        if zlib.crc32(payload) != header["crc32"]:
+            raise ValueError(f"{self.path}: chunk {chunk} at offset {offset} fails its CRC32 check")
+
+    def _chunk_size(self, frames: int, payload_size: int) -> int:
+        return CHUNK_HEADER_DTYPE.itemsize + payload_size + frames * (8 + self.metadata_dtype.itemsize)
+
+    def _load_stamps(self):
+        n = len(self)
+        self._timestamps = np.empty(n, dtype=np.float64)
+        self._metadata = np.empty(n, dtype=self.metadata_dtype)
+        for entry in self.index:
+            first, frames = int(entry["first"]), int(entry["frames"])
+            self.file.seek(int(entry["offset"]) + CHUNK_HEADER_DTYPE.itemsize + int(entry["payload_size"]))
+            data = self.file.read(frames * (8 + self.metadata_dtype.itemsize))
+            self._timestamps[first:first + frames] = np.frombuffer(data, dtype="<f8", count=frames)
+            self._metadata[first:first + frames] = np.frombuffer(data, dtype=self.metadata_dtype, offset=frames * 8)
+
+
+# frames of a CompressedRecordingReader, indexable like a (n, h, w) array
+class _CompressedFrames:
+    def __init__(self, reader: CompressedRecordingReader):
+        self.reader = reader
+        self.dtype = np.dtype(np.uint16)
+        self.ndim = 3
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return (len(self.reader), self.reader.height, self.reader.width)
+
+    def __len__(self) -> int:
+        return len(self.reader)
+
+    def __getitem__(self, key) -> np.ndarray:
+        reader = self.reader
+        if isinstance(key, (int, np.integer)):
+            index = int(key) + len(self) if key < 0 else int(key)
+            if not 0 <= index < len(self):
+                raise IndexError(f"frame index {key} out of range for {len(self)} frames")
+            chunk = reader.chunk_of(index)
+            return reader._chunk(chunk)[index - int(reader.index["first"][chunk])]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return reader.read(start, stop)
+            key = np.arange(start, stop, step)
+        return np.stack([self[int(i)] for i in np.asarray(key).ravel()]) if len(key) else \
+            np.empty((0, reader.height, reader.width), dtype=np.uint16)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        frames = self.reader.read()
+        return frames if dtype is None else frames.astype(dtype)
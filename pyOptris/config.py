@@ -0,0 +1,246 @@
+import atexit
+import copy
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from typing import Dict, NamedTuple, Optional, Tuple
+
+#
+# Camera configuration
+# ====================
+# Typed view of the SDK's <imager> XML config. A file is parsed and validated once by
+# load_config() and cached until it changes; replace() derives variants such as another
+# video format or frame rate without a checked-in XML per mode, and file() writes a
+# variant to a temporary config for usb_init / multi_usb_init, once per distinct content.
+# Elements the model does not know, and the comments, are kept as they are.
+#
+
+# (attribute, element path, type) of the known settings; absent or empty elements are None
+CONFIG_FIELDS = (
+    ("serial", "serial", int),
+    ("videoformatindex", "videoformatindex", int),
+    ("formatspath", "formatspath", str),
+    ("calipath", "calipath", str),
+    ("fov", "fov", int),
+    ("temperature_min", "temperature/min", float),
+    ("temperature_max", "temperature/max", float),
+    ("optics_text", "optics_text", str),
+    ("framerate", "framerate", float),
+    ("bispectral", "bispectral", int),
+    ("autoflag_enable", "autoflag/enable", int),
+    ("autoflag_mininterval", "autoflag/mininterval", float),
+    ("autoflag_maxinterval", "autoflag/maxinterval", float),
+    ("tchipmode", "tchipmode", int),
+    ("tchipfixedvalue", "tchipfixedvalue", float),
+    ("focus", "focus", float),
+    ("enable_extended_temp_range", "enable_extended_temp_range", int),
+    ("buffer_queue_size", "buffer_queue_size", int),
+    ("enable_high_precision", "enable_high_precision", int),
+    ("radial_distortion_correction", "radial_distortion_correction", int),
+    ("use_external_probe", "use_external_probe", int),
+    ("device_api", "device_api", int),
+    ("device_ip_address", "ethernet_device/device_ip_address", str),
+    ("local_udp_port", "ethernet_device/local_udp_port", int),
+    ("check_udp_sender_ip", "ethernet_device/check_udp_sender_ip", int),
+)
+_FIELDS = {name: (path, kind) for name, path, kind in CONFIG_FIELDS}
+
+# allowed values of the enumerated settings
+_CHOICES = {
+    "bispectral": (0, 1),
+    "autoflag_enable": (0, 1),
+    "tchipmode": (0, 1, 2),
+    "enable_extended_temp_range": (0, 1),
+    "enable_high_precision": (0, 1),
+    "radial_distortion_correction": (0, 1, 2),
+    "use_external_probe": (0, 1),
+    "check_udp_sender_ip": (0, 1),
+}
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+#
+# One <imager> config. Settings are read as attributes, e.g. config.framerate; settings the
+# XML leaves out are None and the SDK uses its defaults for them.
+# @param[in] root parsed <imager> element; the config keeps it, never modify it afterwards
+# @param[in] path file the config was read from, None for derived configs
+#
+class ImagerConfig:
+    def __init__(self, root: ET.Element, path: Optional[str] = None):
+        self.path = path
+        self.root = root
+        self.values: Dict[str, object] = {}
+        self._file = path
+        where = path or "config"
+        if root.tag != "imager":
+            raise ValueError(f"{where}: expected an <imager> root element, got <{root.tag}>")
+        for name, element, kind in CONFIG_FIELDS:
+            node = root.find(element)
+            text = node.text.strip() if node is not None and node.text else ""
+            if not text:
+                continue
+            try:
+                self.values[name] = kind(text)
+            except ValueError:
+                raise ValueError(f"{where}: <{element}> must be {kind.__name__}, got {text!r}") from None
+        self._validate(where)
+
+    def __getattr__(self, name):
+        if name in _FIELDS:
+            return self.values.get(name)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def __repr__(self) -> str:
+        settings = ", ".join(f"{name}={value!r}" for name, value in self.values.items()
+                             if name in ("serial", "videoformatindex", "framerate", "buffer_queue_size"))
+        return f"ImagerConfig({self.path or 'derived'}: {settings})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ImagerConfig) and self.to_xml() == other.to_xml()
+
+    def __hash__(self) -> int:
+        return hash(self.to_xml())
+
+    @property
+    def temperature_range(self) -> Optional[Tuple[float, float]]:
+        if self.temperature_min is None or self.temperature_max is None:
+            return None
+        return self.temperature_min, self.temperature_max
+
+    def _validate(self, where: str):
+        values = self.values
+        for name in ("videoformatindex", "fov", "buffer_queue_size", "serial"):
+            if values.get(name, 0) < 0:
+                raise ValueError(f"{where}: {name} must not be negative, got {values[name]}")
+        if values.get("framerate") is not None and values["framerate"] <= 0:
+            raise ValueError(f"{where}: framerate must be positive, got {values['framerate']}")
+        if values.get("buffer_queue_size") == 0:
+            raise ValueError(f"{where}: buffer_queue_size must be at least 1")
+        temperatures = self.temperature_range
+        if temperatures is not None and temperatures[0] >= temperatures[1]:
+            raise ValueError(f"{where}: temperature min {temperatures[0]} must be below max {temperatures[1]}")
+        for name, choices in _CHOICES.items():
+            if values.get(name, choices[0]) not in choices:
+                raise ValueError(f"{where}: {name} must be one of {choices}, got {values[name]}")
+
+    #
+    # @brief a copy with some settings changed, validated like a parsed file
+    # @param[in] temperature (min, max) shorthand for temperature_min and temperature_max
+    # @param[in] overrides settings by attribute name, e.g. videoformatindex=3, framerate=1000,
+    #            buffer_queue_size=8; None removes the element
+    #
+    def replace(self, temperature: Optional[Tuple[float, float]] = None, **overrides) -> "ImagerConfig":
+        if temperature is not None:
+            overrides["temperature_min"], overrides["temperature_max"] = temperature
+        root = copy.deepcopy(self.root)
+        for name, value in overrides.items():
+            if name not in _FIELDS:
+                raise TypeError(f"unknown config setting {name!r}")
+            path = _FIELDS[name][0]
+            node = root.find(path)
+            if value is None:
+                if node is not None:
+                    parent = root.find(path.rpartition("/")[0]) if "/" in path else root
+                    parent.remove(node)
+                continue
+            if node is None:
+                node = root
+                for part in path.split("/"):
+                    child = node.find(part)
+                    node = child if child is not None else ET.SubElement(node, part)
+            node.text = _format_value(value)
+        return ImagerConfig(root, None)
+
+    def to_xml(self) -> bytes:
+        return ET.tostring(self.root, encoding="UTF-8", xml_declaration=True)
+
+    def write(self, path: str) -> str:
+        with open(path, "wb") as file:
+            file.write(self.to_xml())
+        return path
+
+    #
+    # @brief path of an XML file holding this config, for usb_init / multi_usb_init: the
+    # file it was read from, or a temporary file written on first use and removed at exit
+    #
+    def file(self) -> str:
+        if self._file is None:
+            xml = self.to_xml()
+            name = f"imager-{self.serial or 0}-{hashlib.sha1(xml).hexdigest()[:12]}.xml"
+            path = os.path.join(_temporary_directory(), name)
+            if not os.path.exists(path):
+                with open(path + ".tmp", "wb") as file:
+                    file.write(xml)
+                os.replace(path + ".tmp", path)
+            self._file = path
+        return self._file
+
+
+_directory: Optional[str] = None
+_directory_lock = threading.Lock()
+
+
+def _temporary_directory() -> str:
+    global _directory
+    with _directory_lock:
+        if _directory is None:
+            _directory = tempfile.mkdtemp(prefix="pyoptris-config-")
+            atexit.register(shutil.rmtree, _directory, True)
+        return _directory
+
+
+# @brief parses the text of an <imager> config; ValueError if it is malformed or invalid
+def parse_config(text, path: Optional[str] = None) -> ImagerConfig:
+    parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))
+    try:
+        parser.feed(text)
+        root = parser.close()
+    except ET.ParseError as e:
+        raise ValueError(f"{path or 'config'}: {e}") from None
+    return ImagerConfig(root, path)
+
+
+_cache: Dict[str, Tuple[Tuple[int, int], ImagerConfig]] = {}
+_cache_lock = threading.Lock()
+
+
+# @brief ImagerConfig of an XML file, parsed once and reused until the file changes
+def load_config(path: str) -> ImagerConfig:
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    with open(path, "rb") as file:
+        config = parse_config(file.read(), path)
+    with _cache_lock:
+        _cache[path] = (version, config)
+    return config
+
+
+#
+# Timings of a CameraManager.switch(), in seconds: `pause` parking the acquisition threads,
+# `reinit` terminate and reopening every camera, `first_frame` from the restart to the first
+# frame in the new mode, and `downtime` from the last frame before the switch to that one.
+# `reused` is True when the ring buffer of the new mode already existed.
+#
+class ModeSwitch(NamedTuple):
+    camera: str
+    config: str
+    width: int
+    height: int
+    reused: bool
+    pause: float
+    reinit: float
+    first_frame: float
+    downtime: float
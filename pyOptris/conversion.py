@@ -0,0 +1,103 @@
+import functools
+from typing import Optional
+
+import numpy as np
+
+#
+# Raw thermal data to temperature, as documented for evo_irimager_get_thermal_image:
+#   t = ((double)data[x] - 1000.0) / 10.0
+# With <enable_high_precision> the SDK reports more decimal places
+# (IRImager::getTemprangeDecimal()), the divisor then becomes 10 ** decimals.
+#
+RAW_OFFSET = 1000.0
+DEFAULT_DECIMALS = 1
+HIGH_PRECISION_DECIMALS = 2
+
+
+@functools.lru_cache(maxsize=None)
+def _lut(dtype: str, decimals: int, offset: float) -> np.ndarray:
+    lut = ((np.arange(65536, dtype=np.float64) - offset) / 10.0 ** decimals).astype(dtype)
+    lut.flags.writeable = False
+    return lut
+
+
+#
+# @brief 65536-entry table mapping every raw uint16 value to its temperature, built once
+# per (dtype, decimals, offset) and shared read-only
+#
+def temperature_lut(dtype=np.float32, decimals: int = DEFAULT_DECIMALS, offset: float = RAW_OFFSET) -> np.ndarray:
+    return _lut(np.dtype(dtype).str, decimals, float(offset))
+
+
+#
+# @brief converts a raw frame, or a (N, h, w) stack of frames, to temperatures
+# @param[in] raw uint16 array of any shape
+# @param[out] out optional destination of the same shape; its dtype wins over `dtype`
+# @param[in] dtype float32 (default), float64 or float16 output
+# @param[in] decimals decimal places of the raw data, 2 with enable_high_precision on most cameras
+# @param[in] method "scale" computes in place, "lut" gathers from temperature_lut().
+#            By default float16 goes through the table, which is both faster and exact to
+#            the nearest float16, and wider types are scaled in place.
+#
+def raw_to_temperature(
+    raw: np.ndarray,
+    out: Optional[np.ndarray] = None,
+    dtype=np.float32,
+    decimals: int = DEFAULT_DECIMALS,
+    offset: float = RAW_OFFSET,
+    method: Optional[str] = None,
+) -> np.ndarray:
+    if out is None:
+        out = np.empty(raw.shape, dtype=dtype)
+    elif out.shape != raw.shape:
+        raise ValueError(f"out has shape {out.shape}, expected {raw.shape}")
+    if method is None:
+        method = "lut" if out.dtype.itemsize < 4 else "scale"
+    if method == "lut":
+        np.take(temperature_lut(out.dtype, decimals, offset), raw, out=out)
+    elif method == "scale":
+        np.subtract(raw, offset, out=out, dtype=out.dtype)
+        np.divide(out, 10.0 ** decimals, out=out)
+    else:
+        raise ValueError(f"unknown conversion method {method!r}")
+    return out
+
+
+# @brief inverse of raw_to_temperature, e.g. to compare thresholds against raw frames directly
+def temperature_to_raw(temperature, decimals: int = DEFAULT_DECIMALS, offset: float = RAW_OFFSET) -> np.ndarray:
+    raw = np.rint(np.asarray(temperature, dtype=np.float64) * 10.0 ** decimals + offset)
+    return np.clip(raw, 0, 65535).astype(np.uint16)
+
+
+#
+# Conversion bound to one camera configuration, with an optional reusable output buffer.
+# @param[in] high_precision matches <enable_high_precision> in the XML config
+#
+class TemperatureConverter:
+    def __init__(
+        self,
+        dtype=np.float32,
+        high_precision: bool = False,
+        decimals: Optional[int] = None,
+        offset: float = RAW_OFFSET,
+        method: Optional[str] = None,
+    ):
+        if decimals is None:
+            decimals = HIGH_PRECISION_DECIMALS if high_precision else DEFAULT_DECIMALS
+        self.dtype = np.dtype(dtype)
+        self.decimals = decimals
+        self.offset = offset
+        self.method = method
+        self._out = None
+
+    def __call__(self, raw: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        return raw_to_temperature(raw, out, self.dtype, self.decimals, self.offset, self.method)
+
+    # converts into a buffer owned by the converter; the result is overwritten by the next call
+    def convert_reuse(self, raw: np.ndarray) -> np.ndarray:
+        if self._out is None or self._out.shape != raw.shape:
+            self._out = np.empty(raw.shape, dtype=self.dtype)
+        return self(raw, self._out)
+
+    def to_raw(self, temperature) -> np.ndarray:
+        return temperature_to_raw(temperature, self.decimals, self.offset)
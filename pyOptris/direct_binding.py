@@ -1,12 +1,101 @@
 import ctypes
+import os
 import sys
+import threading
+import time
 from enum import Enum
-from typing import Optional, Tuple
-import ctypes
+from typing import Callable, Dict, List, Optional, Tuple
 import numpy as np
 
+from .conversion import raw_to_temperature
+from .errors import FrameTimeout, error_for
+
 DEFAULT_WIN_PATH = "pyOptris\\x64\\libirimager.dll"
-lib = ctypes.CDLL(DEFAULT_WIN_PATH)
+# set to "simulator" to start on the simulated camera backend instead of the SDK
+BACKEND_ENV = "PYOPTRIS_BACKEND"
+# path of the SDK library, overrides the search in find_library()
+LIBRARY_ENV = "PYOPTRIS_LIBRARY"
+# where the libirimager .deb (see libirimager_setup.sh) and source builds install the library
+LINUX_LIBRARY_PATHS = (
+    "/usr/lib/libirimager.so",
+    "/usr/local/lib/libirimager.so",
+    "/usr/lib/x86_64-linux-gnu/libirimager.so",
+    "/usr/lib/aarch64-linux-gnu/libirimager.so",
+)
+
+# seconds the frame getters wait for a frame before raising FrameTimeout
+DEFAULT_TIMEOUT = 1.0
+# frame period assumed until set_frame_period() is called, 1 / 100 Hz
+DEFAULT_FRAME_PERIOD = 0.01
+# shortest sleep between two attempts
+MIN_BACKOFF = 0.0001
+
+_frame_periods: Dict[Optional[int], float] = {}
+
+
+#
+# @brief sets the frame period the getters of a camera tune their retry backoff to
+# @param[in] period seconds per frame, e.g. 1 / 32 for a 32 Hz format
+# @param[in] id camera ID, None for the camera opened with usb_init
+#
+def set_frame_period(period: float, id: Optional[int] = None):
+    _frame_periods[id] = period
+
+def frame_period(id: Optional[int] = None) -> float:
+    return _frame_periods.get(id, DEFAULT_FRAME_PERIOD)
+
+
+#
+# Exponential backoff for frame polling: the first retry comes after 1/8 of a frame period,
+# doubling up to one full period, so a frame is picked up within a fraction of its period
+# while idle waiting costs next to no CPU. time.sleep releases the GIL.
+#
+class Backoff:
+    def __init__(self, period: float = DEFAULT_FRAME_PERIOD):
+        self.period = max(period, MIN_BACKOFF)
+        self.reset()
+
+    def reset(self):
+        self.delay = max(self.period / 8, MIN_BACKOFF)
+
+    def sleep(self, limit: Optional[float] = None):
+        delay = self.delay if limit is None else min(self.delay, limit)
+        if delay > 0:
+            time.sleep(delay)
+        self.delay = min(self.delay * 2, self.period)
+
+
+#
+# @brief calls grab() until it returns 0
+# @param[in] grab attempt returning an SDK error code, e.g. lambda: get_thermal_image_into(out)
+# @param[in] timeout seconds to wait; None waits forever, 0 makes a single attempt
+# @param[in] period frame period the backoff is tuned to
+# @return 0
+# @throws FatalError on -2, FrameTimeout when no frame arrived in time
+#
+def wait_for_frame(
+    grab: Callable[[], int],
+    timeout: Optional[float] = DEFAULT_TIMEOUT,
+    period: float = DEFAULT_FRAME_PERIOD,
+    what: str = "frame",
+) -> int:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    backoff = None
+    while True:
+        err = grab()
+        if err == 0:
+            return 0
+        if err == -2:
+            raise error_for(err, f"fatal error while waiting for {what}")
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise FrameTimeout(f"no {what} within {timeout} s (last error code {err})", err)
+        else:
+            remaining = None
+        if backoff is None:
+            backoff = Backoff(period)
+        backoff.sleep(remaining)
 
 
 #
@@ -28,9 +117,10 @@ def usb_init(
     )
 
 #multi cameras init
+# @return (error code, ctypes.c_uint camera ID to pass as `id` to the multi_* functions)
 def multi_usb_init(
     xml_config: str, formats_def: Optional[str] = None, log_file: Optional[str] = None
-) -> int:
+) -> Tuple[int, ctypes.c_uint]:
     id_var = ctypes.c_uint()
     err = lib.evo_irimager_multi_usb_init(
         ctypes.byref(id_var), 
@@ -38,7 +128,6 @@ def multi_usb_init(
         None if formats_def is None else formats_def.encode(),
         None if log_file is None else log_file.encode(),
     )
-    print(id_var)
     return err, id_var
 
 
@@ -104,6 +193,18 @@ def get_multi_palette_image_size(id: int) -> Tuple[int, int, int]:
     err = lib.evo_irimager_multi_get_palette_image_size(id, ctypes.byref(width), ctypes.byref(height))
     return width.value, height.value, err
 
+#
+# @brief Accessor to thermal image width and height of the camera with the given ID
+# @return (width, height, error code)
+#
+# __IRDIRECTSDK_API__ int evo_irimager_multi_get_thermal_image_size(unsigned int id, int* w, int* h);
+#
+def get_multi_thermal_image_size(id: int) -> Tuple[int, int, int]:
+    width = ctypes.c_int()
+    height = ctypes.c_int()
+    err = lib.evo_irimager_multi_get_thermal_image_size(id, ctypes.byref(width), ctypes.byref(height))
+    return width.value, height.value, err
+
 # @brief Accessor to thermal image by reference
 # Conversion to temperature values are to be performed as follows:
 # t = ((double)data[x] - 1000.0) / 10.0;
@@ -114,53 +215,161 @@ def get_multi_palette_image_size(id: int) -> Tuple[int, int, int]:
 #
 # __IRDIRECTSDK_API__ int evo_irimager_get_thermal_image(int* w, int* h, unsigned short* data);
 #
-def get_thermal_image(width: int, height: int):
-    w = ctypes.byref(ctypes.c_int(width))
-    h = ctypes.byref(ctypes.c_int(height))
+# The getters below wait for a frame (see wait_for_frame) and return (data, 0); they raise
+# FrameTimeout after `timeout` seconds and FatalError on -2.
+#
+def get_thermal_image(width: int, height: int, timeout: Optional[float] = DEFAULT_TIMEOUT):
     thermalData = np.empty((height, width), dtype=np.uint16)
-    thermalDataPointer = thermalData.ctypes.data_as(ctypes.POINTER(ctypes.c_ushort))
-    err = lib.evo_irimager_get_thermal_image(w, h, thermalDataPointer)
+    err = wait_for_frame(lambda: get_thermal_image_into(thermalData), timeout, frame_period(), "thermal image")
     return thermalData, err
 
-def get_multi_thermal_image(id:int,width: int, height: int):
-    w = ctypes.byref(ctypes.c_int(width))
-    h = ctypes.byref(ctypes.c_int(height))
+def get_multi_thermal_image(id:int,width: int, height: int, timeout: Optional[float] = DEFAULT_TIMEOUT):
     thermalData = np.empty((height, width), dtype=np.uint16)
-    thermalDataPointer = thermalData.ctypes.data_as(ctypes.POINTER(ctypes.c_ushort))
-    err = lib.evo_irimager_multi_get_thermal_image(id,w, h, thermalDataPointer)
+    err = wait_for_frame(lambda: get_multi_thermal_image_into(id, thermalData), timeout, frame_period(id),
+                         f"thermal image of camera {id}")
     return thermalData, err
+
+#
+# @brief Same as get_thermal_image / get_multi_thermal_image, but fills a caller-owned
+# C-contiguous uint16 array of shape (h, w) instead of allocating a new one.
+# Single attempt without waiting, wrap in wait_for_frame() to wait.
+# @param[out] out destination frame, reused across calls
+# @return error code: 0 on success, -1 on error, -2 on fatal error (only TCP connection)
+#
+def get_thermal_image_into(out: np.ndarray) -> int:
+    _check_frame(out, np.uint16, 2)
+    height, width = out.shape
+    return lib.evo_irimager_get_thermal_image(
+        ctypes.byref(ctypes.c_int(width)), ctypes.byref(ctypes.c_int(height)), out.ctypes.data
+    )
+
+def get_multi_thermal_image_into(id: int, out: np.ndarray) -> int:
+    _check_frame(out, np.uint16, 2)
+    height, width = out.shape
+    return lib.evo_irimager_multi_get_thermal_image(
+        id, ctypes.byref(ctypes.c_int(width)), ctypes.byref(ctypes.c_int(height)), out.ctypes.data
+    )
+
+def _check_frame(out: np.ndarray, dtype, ndim: int):
+    if out.dtype != dtype or out.ndim != ndim or not out.flags.c_contiguous:
+        raise ValueError(
+            f"expected a C-contiguous {np.dtype(dtype).name} array with {ndim} dimensions, "
+            f"got {out.dtype.name} {out.shape}"
+        )
+
 #
+# @return (error code, serial number)
 def get_multi_get_serial(id:int):
-    serial = ctypes.byref(ctypes.c_ulong())
-    err = lib.evo_irimager_multi_get_serial(id,serial)
-    return err, serial
+    serial = ctypes.c_ulong()
+    err = lib.evo_irimager_multi_get_serial(id, ctypes.byref(serial))
+    return err, serial.value
+
+#
+# Frame metadata as delivered by the SDK (EvoIRFrameMetadata in direct_binding.h):
+#   counter         consecutively numbered for each received frame
+#   counterHW       hardware frame counter of the device
+#   timestamp       device time stamp in units of 100 ns (TIMESTAMP_UNITS per second)
+#   timestampMedia  time stamp of the media sample, same units
+#   flagState       EvoIRFlagState of the shutter flag at capturing time
+#   tempChip, tempFlag, tempBox  chip, shutter flag and housing temperatures
+#   pifIn           process interface inputs
+#
+class EvoIRFlagState(Enum):
+    OPEN = 0
+    CLOSE = 1
+    OPENING = 2
+    CLOSING = 3
+    ERROR = 4
 
-def get_multi_get_thermal_image_metadata(id:int, width:int, height:int):
-    w = ctypes.byref(ctypes.c_int(width))
-    h = ctypes.byref(ctypes.c_int(height))
-    # memory thermal data
+class EvoIRFrameMetadata(ctypes.Structure):
+    _fields_ = [
+        ("counter", ctypes.c_uint),
+        ("counterHW", ctypes.c_uint),
+        ("timestamp", ctypes.c_longlong),
+        ("timestampMedia", ctypes.c_longlong),
+        ("flagState", ctypes.c_int),
+        ("tempChip", ctypes.c_float),
+        ("tempFlag", ctypes.c_float),
+        ("tempBox", ctypes.c_float),
+        ("pifIn", ctypes.c_ushort * 2),
+    ]
+
+TIMESTAMP_UNITS = 10_000_000
+
+# EvoIRFrameMetadata as a NumPy record, byte for byte, so the SDK can write straight into
+# preallocated record arrays
+FRAME_METADATA_DTYPE = np.dtype([
+    ("counter", np.uint32),
+    ("counterHW", np.uint32),
+    ("timestamp", np.int64),
+    ("timestampMedia", np.int64),
+    ("flagState", np.int32),
+    ("tempChip", np.float32),
+    ("tempFlag", np.float32),
+    ("tempBox", np.float32),
+    ("pifIn", np.uint16, (2,)),
+], align=True)
+assert FRAME_METADATA_DTYPE.itemsize == ctypes.sizeof(EvoIRFrameMetadata)
+
+# flag state as EvoIRFlagState, or the raw int for a value newer firmware may add
+def _flag_state(value: int):
+    try:
+        return EvoIRFlagState(value)
+    except ValueError:
+        return value
+
+def _metadata_dict(metadata) -> dict:
+    return {
+        "counter": int(metadata["counter"]),
+        "counterHW": int(metadata["counterHW"]),
+        "timestamp": int(metadata["timestamp"]) / TIMESTAMP_UNITS,
+        "timestampMedia": int(metadata["timestampMedia"]) / TIMESTAMP_UNITS,
+        "flagState": _flag_state(int(metadata["flagState"])),
+        "tempChip": float(metadata["tempChip"]),
+        "tempFlag": float(metadata["tempFlag"]),
+        "tempBox": float(metadata["tempBox"]),
+        "pifIn": tuple(int(v) for v in metadata["pifIn"]),
+    }
+
+#
+# @brief Accessor to thermal image and its metadata by reference
+# @param[in] w image width
+# @param[in] h image height
+# @param[out] data pointer to unsigned short array allocate by the user (size of w * h)
+# @param[out] metadata pointer to EvoIRFrameMetadata allocated by the user
+# @return error code: 0 on success, -1 on error, -2 on fatal error (only TCP connection)
+#
+# __IRDIRECTSDK_API__ int evo_irimager_get_thermal_image_metadata(int* w, int* h, unsigned short* data, EvoIRFrameMetadata* metadata);
+# __IRDIRECTSDK_API__ int evo_irimager_multi_get_thermal_image_metadata(unsigned int id, int* w, int* h, unsigned short* data, EvoIRFrameMetadata* metadata);
+#
+# @return (temperatures, metadata dict with timestamps in seconds, error code)
+def get_multi_get_thermal_image_metadata(id:int, width:int, height:int, timeout: Optional[float] = DEFAULT_TIMEOUT):
     thermalData = np.empty((height, width), dtype=np.uint16)
-    thermalDataPointer = thermalData.ctypes.data_as((ctypes.POINTER(ctypes.c_ushort)))
-    # memory metadata as raw bytes
-    metadata_size = ctypes.sizeof(ctypes.c_double) * 5
-    metadata_buffer = ctypes.create_string_buffer(metadata_size)
+    metadata = np.zeros(1, dtype=FRAME_METADATA_DTYPE)
+    err = wait_for_frame(lambda: get_multi_thermal_image_metadata_into(id, thermalData, metadata), timeout,
+                         frame_period(id), f"thermal image of camera {id}")
+    return raw_to_temperature(thermalData), _metadata_dict(metadata[0]), err
+
+# @param[out] metadata FRAME_METADATA_DTYPE record array, the first record is filled
+def get_thermal_image_metadata_into(out: np.ndarray, metadata: np.ndarray) -> int:
+    _check_frame(out, np.uint16, 2)
+    _check_metadata(metadata)
+    height, width = out.shape
+    return lib.evo_irimager_get_thermal_image_metadata(
+        ctypes.byref(ctypes.c_int(width)), ctypes.byref(ctypes.c_int(height)), out.ctypes.data, metadata.ctypes.data
+    )
 
-    err = lib.evo_irimager_multi_get_thermal_image_metadata(
-        id, w, h, thermalDataPointer, metadata_buffer
+def get_multi_thermal_image_metadata_into(id: int, out: np.ndarray, metadata: np.ndarray) -> int:
+    _check_frame(out, np.uint16, 2)
+    _check_metadata(metadata)
+    height, width = out.shape
+    return lib.evo_irimager_multi_get_thermal_image_metadata(
+        id, ctypes.byref(ctypes.c_int(width)), ctypes.byref(ctypes.c_int(height)), out.ctypes.data, metadata.ctypes.data
     )
-    # metadata fields from buffer
-    timestamp = ctypes.cast(metadata_buffer, ctypes.POINTER(ctypes.c_double))[0]
-    temperature_min = ctypes.cast(metadata_buffer, ctypes.POINTER(ctypes.c_double))[1]
-    temperature_max = ctypes.cast(metadata_buffer, ctypes.POINTER(ctypes.c_double))[2]
-
-    temperatureData = ((thermalData - 1000.0) / 10.0)
-    metadata = {
-        "timestamp": timestamp,
-        "temperature_min": temperature_min,
-        "temperature_max": temperature_max
-    }
 
-    return temperatureData, metadata, err
+def _check_metadata(metadata: np.ndarray):
+    if metadata.dtype != FRAME_METADATA_DTYPE or not metadata.flags.c_contiguous or metadata.size < 1:
+        raise ValueError("metadata must be a contiguous FRAME_METADATA_DTYPE array")
 
 # @brief Accessor to an RGB palette image by reference
 # data format: unsigned char array (size 3 * w * h) r,g,b
@@ -171,36 +380,139 @@ def get_multi_get_thermal_image_metadata(id:int, width:int, height:int):
 #
 # __IRDIRECTSDK_API__ int evo_irimager_get_palette_image(int* w, int* h, unsigned char* data);
 #
-def get_palette_image(width: int, height: int) -> np.ndarray:
-    w = ctypes.byref(ctypes.c_int(width))
-    h = ctypes.byref(ctypes.c_int(height))
+def get_palette_image(width: int, height: int, timeout: Optional[float] = DEFAULT_TIMEOUT) -> np.ndarray:
     paletteData = np.empty((height, width, 3), dtype=np.uint8)
-    paletteDataPointer = paletteData.ctypes.data_as(ctypes.POINTER(ctypes.c_ubyte))
-    retVal = -1
-    while retVal != 0:
-        retVal = lib.evo_irimager_get_palette_image(w, h, paletteDataPointer)
+    wait_for_frame(lambda: get_palette_image_into(paletteData), timeout, frame_period(), "palette image")
     return paletteData
 
+def get_palette_image_into(out: np.ndarray) -> int:
+    _check_frame(out, np.uint8, 3)
+    height, width, _ = out.shape
+    return lib.evo_irimager_get_palette_image(
+        ctypes.byref(ctypes.c_int(width)), ctypes.byref(ctypes.c_int(height)), out.ctypes.data
+    )
 
 
-
-def get_multi_palette_image(id: int, width: int, height: int) -> np.ndarray:
-    w = ctypes.c_int(width)
-    h = ctypes.c_int(height)
-    id = ctypes.c_long(id)
-
-    # allocates memory for the palette data
+def get_multi_palette_image(id: int, width: int, height: int, timeout: Optional[float] = DEFAULT_TIMEOUT) -> np.ndarray:
     paletteData = np.empty((height, width, 3), dtype=np.uint8)  # 3 for RGB
-    paletteDataPointer = paletteData.ctypes.data_as(ctypes.POINTER(ctypes.c_ubyte))
-
-    # calling function multi-camera palette image
-    retVal = lib.evo_irimager_multi_get_palette_image(id, ctypes.byref(w), ctypes.byref(h), paletteDataPointer)
+    wait_for_frame(lambda: get_multi_palette_image_into(id, paletteData), timeout, frame_period(id),
+                   f"palette image of camera {id}")
+    return paletteData
 
-    if retVal != 0:
-        raise RuntimeError(f"Error getting multi palette image for ID {id}: {retVal}")
+def get_multi_palette_image_into(id: int, out: np.ndarray) -> int:
+    _check_frame(out, np.uint8, 3)
+    height, width, _ = out.shape
+    return lib.evo_irimager_multi_get_palette_image(
+        id, ctypes.byref(ctypes.c_int(width)), ctypes.byref(ctypes.c_int(height)), out.ctypes.data
+    )
 
-    return paletteData
 
+# the SDK only delivers EvoIRFrameMetadata along with thermal images
+def _no_palette_metadata(*args) -> int:
+    raise ValueError("device metadata is only available with thermal images, not palette images")
+
+
+#
+# Fixed ring of preallocated frame buffers for the capture hot path.
+# Frames, the ctypes pointers into every slot and the width/height arguments are
+# created once, so grab_*() does no numpy allocation and no ctypes marshalling.
+# Pass `frames` to wrap a caller-owned (N, h, w) uint16 or (N, h, w, 3) uint8 block, and
+# `metadata` to wrap a caller-owned (N,) FRAME_METADATA_DTYPE array that grab_*metadata()
+# fills in place, one record per slot.
+# The returned slot stays valid until the ring wraps around `size` grabs later.
+#
+class FramePool:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        size: int = 4,
+        palette: bool = False,
+        frames: Optional[np.ndarray] = None,
+        metadata: Optional[np.ndarray] = None,
+    ):
+        dtype = np.uint8 if palette else np.uint16
+        if frames is None:
+            shape = (size, height, width, 3) if palette else (size, height, width)
+            frames = np.empty(shape, dtype=dtype)
+        _check_frame(frames, dtype, 4 if palette else 3)
+        if frames.shape[1:3] != (height, width):
+            raise ValueError(f"frames of shape {frames.shape} do not match {width}x{height}")
+
+        self.width = width
+        self.height = height
+        self.palette = palette
+        self.frames = frames
+        self.size = len(frames)
+        self.index = -1
+        self.addresses = [frame.ctypes.data for frame in frames]
+        self._width = ctypes.c_int(width)
+        self._height = ctypes.c_int(height)
+        self._width_ptr = ctypes.pointer(self._width)
+        self._height_ptr = ctypes.pointer(self._height)
+        if metadata is None:
+            metadata = np.zeros(self.size, dtype=FRAME_METADATA_DTYPE)
+        _check_metadata(metadata)
+        if len(metadata) != self.size:
+            raise ValueError(f"{len(metadata)} metadata records for {self.size} frames")
+        self.metadata = metadata
+        self.metadata_addresses = [metadata.ctypes.data + i * metadata.itemsize for i in range(self.size)]
+        if palette:
+            self._get = lib.evo_irimager_get_palette_image
+            self._get_multi = lib.evo_irimager_multi_get_palette_image
+            self._get_metadata = self._get_multi_metadata = _no_palette_metadata
+        else:
+            self._get = lib.evo_irimager_get_thermal_image
+            self._get_multi = lib.evo_irimager_multi_get_thermal_image
+            self._get_metadata = lib.evo_irimager_get_thermal_image_metadata
+            self._get_multi_metadata = lib.evo_irimager_multi_get_thermal_image_metadata
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, slot: int) -> np.ndarray:
+        return self.frames[slot]
+
+    def next_slot(self) -> int:
+        self.index += 1
+        if self.index == self.size:
+            self.index = 0
+        return self.index
+
+    # @param[in] slot grab into this slot instead of the next one in the ring
+    # @return (slot, error code); frames[slot] holds the image when the error code is 0
+    def grab(self, slot: Optional[int] = None) -> Tuple[int, int]:
+        if slot is None:
+            slot = self.next_slot()
+        err = self._get(self._width_ptr, self._height_ptr, self.addresses[slot])
+        return slot, err
+
+    def grab_multi(self, id: int, slot: Optional[int] = None) -> Tuple[int, int]:
+        if slot is None:
+            slot = self.next_slot()
+        err = self._get_multi(id, self._width_ptr, self._height_ptr, self.addresses[slot])
+        return slot, err
+
+    # like grab, and fills metadata[slot] with the EvoIRFrameMetadata of the frame
+    def grab_metadata(self, slot: Optional[int] = None) -> Tuple[int, int]:
+        if slot is None:
+            slot = self.next_slot()
+        err = self._get_metadata(
+            self._width_ptr, self._height_ptr, self.addresses[slot], self.metadata_addresses[slot]
+        )
+        return slot, err
+
+    def grab_multi_metadata(self, id: int, slot: Optional[int] = None) -> Tuple[int, int]:
+        if slot is None:
+            slot = self.next_slot()
+        err = self._get_multi_metadata(
+            id, self._width_ptr, self._height_ptr, self.addresses[slot], self.metadata_addresses[slot]
+        )
+        return slot, err
+
+    # device timestamp of metadata[slot], in seconds
+    def device_time(self, slot: int) -> float:
+        return self.metadata[slot]["timestamp"] / TIMESTAMP_UNITS
 
 #
 # @brief Accessor to an RGB palette image and a thermal image by reference
@@ -215,20 +527,23 @@ def get_multi_palette_image(id: int, width: int, height: int) -> np.ndarray:
 # __IRDIRECTSDK_API__ int evo_irimager_get_thermal_palette_image(int w_t, int h_t, unsigned short* data_t, int w_p, int h_p, unsigned char* data_p );
 #
 def get_thermal_palette_image(
-    t_width: int, t_height: int, p_width: int, p_height
+    t_width: int, t_height: int, p_width: int, p_height, timeout: Optional[float] = DEFAULT_TIMEOUT
 ) -> Tuple[np.ndarray, np.ndarray]:
-    t_w = ctypes.byref(ctypes.c_int(t_width))
-    t_h = ctypes.byref(ctypes.c_int(t_height))
-    p_w = ctypes.byref(ctypes.c_int(p_width))
-    p_h = ctypes.byref(ctypes.c_int(p_height))
+    t_w = ctypes.c_int(t_width)
+    t_h = ctypes.c_int(t_height)
+    p_w = ctypes.c_int(p_width)
+    p_h = ctypes.c_int(p_height)
     thermalData = np.empty((t_height, t_width), dtype=np.uint16)
     paletteData = np.empty((p_height, p_width, 3), dtype=np.uint8)
     thermalDataPointer = thermalData.ctypes.data_as(ctypes.POINTER(ctypes.c_ushort))
     paletteDataPointer = paletteData.ctypes.data_as(ctypes.POINTER(ctypes.c_ubyte))
-    _ = lib.evo_irimager_get_thermal_palette_image(
-        t_w, t_h, thermalDataPointer, p_w, p_h, paletteDataPointer
+    wait_for_frame(
+        lambda: lib.evo_irimager_get_thermal_palette_image(
+            t_w, t_h, thermalDataPointer, p_w, p_h, paletteDataPointer
+        ),
+        timeout, frame_period(), "thermal and palette image",
     )
-    return #(thermalData, paletteData)
+    return thermalData, paletteData
 
 def get_multi_thermal_palette_image(id:int, width: int, height: int):
     w = ctypes.byref(ctypes.c_int(width))
@@ -311,13 +626,6 @@ class ShutterMode(Enum):
     MANUAL = 0
     AUTO = 1
 
-class EvoIRFrameMetadata(ctypes.Structure):
-    _fields_ = [
-        ("timestamp", ctypes.c_double),
-        ("temperature_min", ctypes.c_double),
-        ("temperature_max", ctypes.c_double),  # Checking these for now
-    ]
-
 def set_shutter_mode(shutterMode: ShutterMode) -> int:
     return lib.evo_irimager_set_shutter_mode(shutterMode.value)
 
@@ -421,18 +729,189 @@ def daemon_is_running() -> int:
 def daemon_kill() -> int:
     return lib.evo_irimager_daemon_kill(None)
 
-#signatures 
-
-lib.evo_irimager_multi_get_palette_image_size.argtypes = [
-    ctypes.c_uint,   # Camera ID
-    ctypes.POINTER(ctypes.c_int),  # Pointer to width
-    ctypes.POINTER(ctypes.c_int)   # Pointer to height
-]
-lib.evo_irimager_multi_get_palette_image_size.restype = ctypes.c_int
-
-lib.evo_irimager_multi_get_palette_image.argtypes = [
-    ctypes.POINTER(ctypes.c_int),
-    ctypes.POINTER(ctypes.c_int),
-    ctypes.POINTER(ctypes.c_ubyte)
-]
-lib.evo_irimager_multi_get_palette_image.restype = ctypes.c_int
\ No newline at end of file
+#
+# Backends: every wrapper above calls through the module level `lib`, which is either the
+# ctypes SDK library or an object exposing the same evo_irimager_* functions, such as
+# simulator.SimulatedIRImager. Select the backend before creating FramePools/Acquisitions,
+# they bind the getters when they are constructed.
+# Nothing is loaded at import: `lib` starts out as a _LazyLibrary that resolves the default
+# backend on the first device call, so tools that only read recordings never touch the SDK.
+#
+class _MissingLibrary:
+    def __init__(self, error: Exception):
+        self.error = error
+
+    def __getattr__(self, name):
+        raise OSError(
+            f"IRImager SDK library is not available ({self.error}); "
+            f"set {LIBRARY_ENV} to its path, or use set_backend() or use_simulator() to run without it"
+        )
+
+
+class _LazyLibrary:
+    def __getattr__(self, name):
+        return getattr(get_backend(), name)
+
+
+_backend_lock = threading.Lock()
+
+
+#
+# @brief candidate paths of the SDK library for this platform, in search order
+# The LIBRARY_ENV path comes first; a bare library name is left to the system loader.
+#
+def library_candidates() -> List[str]:
+    candidates = []
+    override = os.environ.get(LIBRARY_ENV)
+    if override:
+        candidates.append(override)
+    package = os.path.dirname(os.path.abspath(__file__))
+    if sys.platform == "win32":
+        candidates += [os.path.join(package, "x64", "libirimager.dll"), DEFAULT_WIN_PATH]
+    else:
+        candidates += list(LINUX_LIBRARY_PATHS)
+    import ctypes.util
+
+    found = ctypes.util.find_library("irimager") or ctypes.util.find_library("libirimager")
+    if found:
+        candidates.append(found)
+    candidates.append("libirimager.dll" if sys.platform == "win32" else "libirimager.so")
+    return candidates
+
+
+#
+# @brief path of the SDK library: the first existing candidate, else the bare library name
+# @return the path, or None when LIBRARY_ENV names a file that does not exist
+#
+def find_library() -> Optional[str]:
+    candidates = library_candidates()
+    override = os.environ.get(LIBRARY_ENV)
+    if override and not os.path.exists(override):
+        return None
+    for path in candidates:
+        # bare names such as find_library()'s are searched for by the system loader
+        if os.path.basename(path) == path or os.path.exists(path):
+            return path
+    return None
+
+
+def load_library(path: Optional[str] = None) -> ctypes.CDLL:
+    if path is None:
+        path = find_library()
+        if path is None:
+            raise OSError(f"{LIBRARY_ENV}={os.environ.get(LIBRARY_ENV)} does not exist")
+    library = ctypes.CDLL(path)
+    _declare_signatures(library)
+    return library
+
+
+def _default_backend():
+    if os.environ.get(BACKEND_ENV) == "simulator":
+        from .simulator import SimulatedIRImager
+
+        return SimulatedIRImager()
+    try:
+        return load_library()
+    except OSError as e:
+        return _MissingLibrary(e)
+
+
+# @brief the current backend, resolving the default one on first use
+def get_backend():
+    global lib
+    if isinstance(lib, _LazyLibrary):
+        with _backend_lock:
+            if isinstance(lib, _LazyLibrary):
+                lib = _default_backend()
+    return lib
+
+
+# @return True once a backend has been loaded or set
+def backend_loaded() -> bool:
+    return not isinstance(lib, _LazyLibrary)
+
+
+# @return the previous backend, so it can be restored; None when none had been loaded yet
+def set_backend(backend):
+    global lib
+    with _backend_lock:
+        previous = None if isinstance(lib, _LazyLibrary) else lib
+        lib = _LazyLibrary() if backend is None else backend
+    return previous
+
+
+# @brief switches to a simulator.SimulatedIRImager built from the given arguments
+def use_simulator(**kwargs):
+    from .simulator import SimulatedIRImager
+
+    simulator = SimulatedIRImager(**kwargs)
+    set_backend(simulator)
+    return simulator
+
+
+#signatures
+
+def _declare_signatures(lib):
+    lib.evo_irimager_get_thermal_image.argtypes = [
+        ctypes.POINTER(ctypes.c_int),  # Pointer to width
+        ctypes.POINTER(ctypes.c_int),  # Pointer to height
+        ctypes.c_void_p                # unsigned short* thermal data
+    ]
+    lib.evo_irimager_get_thermal_image.restype = ctypes.c_int
+
+    lib.evo_irimager_multi_get_thermal_image.argtypes = [
+        ctypes.c_uint,                 # Camera ID
+        ctypes.POINTER(ctypes.c_int),  # Pointer to width
+        ctypes.POINTER(ctypes.c_int),  # Pointer to height
+        ctypes.c_void_p                # unsigned short* thermal data
+    ]
+    lib.evo_irimager_multi_get_thermal_image.restype = ctypes.c_int
+
+    lib.evo_irimager_get_palette_image.argtypes = [
+        ctypes.POINTER(ctypes.c_int),  # Pointer to width
+        ctypes.POINTER(ctypes.c_int),  # Pointer to height
+        ctypes.c_void_p                # unsigned char* RGB data
+    ]
+    lib.evo_irimager_get_palette_image.restype = ctypes.c_int
+
+    lib.evo_irimager_get_thermal_image_metadata.argtypes = [
+        ctypes.POINTER(ctypes.c_int),  # Pointer to width
+        ctypes.POINTER(ctypes.c_int),  # Pointer to height
+        ctypes.c_void_p,               # unsigned short* thermal data
+        ctypes.c_void_p                # EvoIRFrameMetadata*
+    ]
+    lib.evo_irimager_get_thermal_image_metadata.restype = ctypes.c_int
+
+    lib.evo_irimager_multi_get_thermal_image_metadata.argtypes = [
+        ctypes.c_uint,                 # Camera ID
+        ctypes.POINTER(ctypes.c_int),  # Pointer to width
+        ctypes.POINTER(ctypes.c_int),  # Pointer to height
+        ctypes.c_void_p,               # unsigned short* thermal data
+        ctypes.c_void_p                # EvoIRFrameMetadata*
+    ]
+    lib.evo_irimager_multi_get_thermal_image_metadata.restype = ctypes.c_int
+
+    lib.evo_irimager_multi_get_thermal_image_size.argtypes = [
+        ctypes.c_uint,   # Camera ID
+        ctypes.POINTER(ctypes.c_int),  # Pointer to width
+        ctypes.POINTER(ctypes.c_int)   # Pointer to height
+    ]
+    lib.evo_irimager_multi_get_thermal_image_size.restype = ctypes.c_int
+
+    lib.evo_irimager_multi_get_palette_image_size.argtypes = [
+        ctypes.c_uint,   # Camera ID
+        ctypes.POINTER(ctypes.c_int),  # Pointer to width
+        ctypes.POINTER(ctypes.c_int)   # Pointer to height
+    ]
+    lib.evo_irimager_multi_get_palette_image_size.restype = ctypes.c_int
+
+    lib.evo_irimager_multi_get_palette_image.argtypes = [
+        ctypes.c_uint,                 # Camera ID
+        ctypes.POINTER(ctypes.c_int),  # Pointer to width
+        ctypes.POINTER(ctypes.c_int),  # Pointer to height
+        ctypes.c_void_p                # unsigned char* RGB data
+    ]
+    lib.evo_irimager_multi_get_palette_image.restype = ctypes.c_int
+
+
+lib = _LazyLibrary()
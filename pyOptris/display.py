@@ -0,0 +1,162 @@
+import collections
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+DISPLAY_MODES = ("latest", "max", "mean")
+
+
+#
+# Decides what a view shows and when, independently of the capture rate: a PI 1M at
+# 1000 Hz shown at 30 Hz is decimated ~33:1 without ever slowing acquisition down.
+# @param[in] rate target display refresh rate in Hz
+# @param[in] mode "latest" shows the newest frame; "max" and "mean" reduce every frame
+#            captured since the previous refresh, so a hot event shorter than the display
+#            period still shows up ("max") or noise is averaged out ("mean")
+#
+class DisplayScheduler:
+    def __init__(self, acquisition, rate: float = 30.0, mode: str = "latest"):
+        if mode not in DISPLAY_MODES:
+            raise ValueError(f"mode must be one of {DISPLAY_MODES}, got {mode!r}")
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.acquisition = acquisition
+        self.period = 1.0 / rate
+        self.mode = mode
+        self.shown = 0
+        self.late = 0
+        self.last_index = -1
+        self.window = 0
+        ring = acquisition.ring
+        self._reader = ring.reader()
+        self._accumulator = np.zeros(ring.frames.shape[1:], dtype=np.float64) if mode == "mean" else None
+        self._due = time.perf_counter()
+        self._shown_times = collections.deque(maxlen=64)
+        self._running = False
+        self._thread = None
+
+    @property
+    def rate(self) -> float:
+        return 1.0 / self.period
+
+    @property
+    def dropped(self) -> int:
+        return self._reader.dropped
+
+    # seconds until the next refresh is due, <= 0 when it is due now
+    def time_to_next(self) -> float:
+        return self._due - time.perf_counter()
+
+    #
+    # @brief the display frame if a refresh is due
+    # @param[out] out optional destination, reused across calls
+    # @param[in] force render even if the refresh is not due yet
+    # @return (index of the newest frame covered, frame) or None when nothing is due or no
+    #         new frame was captured since the last refresh
+    #
+    def poll(self, out: Optional[np.ndarray] = None, force: bool = False) -> Optional[Tuple[int, np.ndarray]]:
+        now = time.perf_counter()
+        if not force and now < self._due:
+            return None
+        # schedule on a fixed grid; refreshes that could not be served are skipped, not queued
+        self._due += self.period
+        if self._due < now:
+            self.late += 1
+            self._due = now + self.period
+        frame = self._render(out)
+        if frame is None:
+            return None
+        self.shown += 1
+        self._shown_times.append(now)
+        return self.last_index, frame
+
+    # @brief waits until the next refresh is due and renders it
+    def next(self, out: Optional[np.ndarray] = None, timeout: Optional[float] = None) -> Optional[Tuple[int, np.ndarray]]:
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            wait = self.time_to_next()
+            if deadline is not None:
+                wait = min(wait, deadline - time.perf_counter())
+            if wait > 0:
+                time.sleep(wait)
+            result = self.poll(out)
+            if result is not None:
+                return result
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+
+    #
+    # @brief calls callback(index, frame) at the display rate from a thread of its own
+    # The frame buffer is reused, the callback must copy what it keeps.
+    #
+    def start(self, callback: Callable[[int, np.ndarray], None]) -> "DisplayScheduler":
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(callback,), name="display", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # refresh rate actually achieved over the last refreshes
+    def display_fps(self) -> float:
+        times = self._shown_times
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stats(self) -> dict:
+        capture = self.acquisition.frame_rate()
+        display = self.display_fps()
+        return {
+            "mode": self.mode,
+            "target_fps": self.rate,
+            "display_fps": display,
+            "capture_fps": capture,
+            "decimation": capture / display if display else 0.0,
+            "shown": self.shown,
+            "late": self.late,
+            "window": self.window,
+            "dropped": self.dropped,
+        }
+
+    def _render(self, out: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if self.mode == "latest":
+            # nothing is reduced, so skip the frames in between instead of copying them
+            index, frame, _ = self.acquisition.ring.latest(out)
+            if index <= self.last_index:
+                return None
+            self._reader.position = index + 1
+            self.window = index - self.last_index if self.last_index >= 0 else 1
+            self.last_index = index
+            return frame
+
+        frames, _ = self._reader.read()
+        if len(frames) == 0:
+            return None
+        self.window = len(frames)
+        self.last_index = self._reader.position - 1
+        if out is None:
+            out = np.empty(frames.shape[1:], dtype=frames.dtype)
+        if self.mode == "max":
+            np.max(frames, axis=0, out=out)
+        else:
+            np.mean(frames, axis=0, out=self._accumulator)
+            np.rint(self._accumulator, out=self._accumulator)
+            out[...] = self._accumulator
+        return out
+
+    def _run(self, callback):
+        ring = self.acquisition.ring
+        out = np.empty(ring.frames.shape[1:], dtype=ring.frames.dtype)
+        while self._running:
+            result = self.next(out, timeout=0.1)
+            if result is not None:
+                callback(*result)
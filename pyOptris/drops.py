@@ -0,0 +1,132 @@
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+COUNTER_MODULO = 1 << 32
+
+
+#
+# Frame loss accounting from the device frame counter (EvoIRFrameMetadata.counterHW).
+# Consecutive frames normally advance the counter by `step`; a larger advance means the
+# frames in between never reached us (device or SDK buffer_queue_size overflow, or a
+# consumer that fell behind), no advance is a duplicate delivery and a backwards jump is
+# a counter reset. The gap histogram (lost frames per gap -> number of gaps) shows whether
+# losses are isolated frames or bursts, which is what buffer_queue_size has to absorb.
+# @param[in] step counter increment per delivered frame; None learns it as the smallest
+#            advance seen, which is right as soon as two consecutive frames arrive. Until
+#            then a leading gap looks like the step, so every advance seen is kept and the
+#            losses are recounted whenever the learned step shrinks; observe() and update()
+#            therefore agree however the counters are split between them.
+#
+class FrameCounterMonitor:
+    def __init__(self, step: Optional[int] = None):
+        self.step = step
+        self.received = 0
+        self.lost = 0
+        self.gaps = 0
+        self.duplicates = 0
+        self.resets = 0
+        self.max_gap = 0
+        self.gap_histogram = Counter()
+        self.last = None
+        # forward counter advance -> number of times seen
+        self._advances = Counter()
+
+    def __repr__(self) -> str:
+        return (f"FrameCounterMonitor(received={self.received}, lost={self.lost}, gaps={self.gaps}, "
+                f"duplicates={self.duplicates}, resets={self.resets})")
+
+    # @brief accounts for one frame; cheap enough for the acquisition thread
+    def observe(self, counter: int):
+        self.received += 1
+        last = self.last
+        self.last = counter
+        if last is None:
+            return
+        diff = (counter - last) % COUNTER_MODULO
+        if diff == 0:
+            self.duplicates += 1
+        elif diff >= COUNTER_MODULO // 2:
+            self.resets += 1
+        else:
+            self._advances[diff] += 1
+            if self.step is None or diff < self.step:
+                self.step = diff
+                self._recount()
+                return
+            missing = diff // self.step - 1
+            if missing > 0:
+                self._gap(missing, 1)
+
+    # @brief accounts for a batch of consecutive frames, e.g. a recording's counter column
+    def update(self, counters: np.ndarray):
+        counters = np.asarray(counters, dtype=np.int64)
+        if len(counters) == 0:
+            return
+        if self.last is not None:
+            counters = np.concatenate(([self.last], counters))
+            self.received -= 1
+        self.received += len(counters)
+        self.last = int(counters[-1])
+        diffs = np.diff(counters) % COUNTER_MODULO
+        self.duplicates += int(np.count_nonzero(diffs == 0))
+        backwards = diffs >= COUNTER_MODULO // 2
+        self.resets += int(np.count_nonzero(backwards))
+        forward = diffs[(diffs != 0) & ~backwards]
+        if len(forward) == 0:
+            return
+        advances, counts = np.unique(forward, return_counts=True)
+        self._advances.update(dict(zip(advances.tolist(), counts.tolist())))
+        smallest = int(advances[0])
+        if self.step is None or smallest < self.step:
+            self.step = smallest
+            self._recount()
+            return
+        for advance, count in zip(advances.tolist(), counts.tolist()):
+            missing = advance // self.step - 1
+            if missing > 0:
+                self._gap(missing, count)
+
+    # recounts every advance seen against the current step
+    def _recount(self):
+        self.lost = 0
+        self.gaps = 0
+        self.max_gap = 0
+        self.gap_histogram.clear()
+        for advance, count in self._advances.items():
+            missing = advance // self.step - 1
+            if missing > 0:
+                self._gap(missing, count)
+
+    def _gap(self, missing: int, count: int):
+        self.lost += missing * count
+        self.gaps += count
+        self.gap_histogram[missing] += count
+        if missing > self.max_gap:
+            self.max_gap = missing
+
+    @property
+    def loss_ratio(self) -> float:
+        expected = self.received + self.lost
+        return self.lost / expected if expected else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "lost": self.lost,
+            "gaps": self.gaps,
+            "duplicates": self.duplicates,
+            "resets": self.resets,
+            "max_gap": self.max_gap,
+            "loss_ratio": self.loss_ratio,
+            "step": self.step,
+            "gap_histogram": {str(length): count for length, count in sorted(self.gap_histogram.items())},
+        }
+
+
+# @brief frame loss statistics of a sequence of device frame counters
+def counter_stats(counters: np.ndarray, step: Optional[int] = None) -> dict:
+    monitor = FrameCounterMonitor(step)
+    monitor.update(counters)
+    return monitor.stats()
@@ -0,0 +1,42 @@
+from typing import Optional
+
+
+#
+# Errors raised for the SDK return codes: 0 on success, -1 on error (for the frame getters
+# mostly "no new frame yet"), -2 on fatal error (only TCP connection).
+# Every error keeps the raw code in `code`.
+#
+class IRImagerError(RuntimeError):
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+# -1: the call failed, usually because no new frame was available
+class FrameError(IRImagerError):
+    pass
+
+
+# -2: the connection to the camera or daemon is gone, retrying will not help
+class FatalError(IRImagerError):
+    pass
+
+
+# no frame arrived within the timeout
+class FrameTimeout(IRImagerError, TimeoutError):
+    pass
+
+
+ERROR_CODES = {-1: FrameError, -2: FatalError}
+
+
+# @brief error instance for a non-zero SDK return code
+def error_for(code: int, message: str) -> IRImagerError:
+    return ERROR_CODES.get(code, IRImagerError)(f"{message} (error code {code})", code)
+
+
+# @brief raises the typed error for a non-zero SDK return code
+def check(code: int, message: str) -> int:
+    if code != 0:
+        raise error_for(code, message)
+    return code
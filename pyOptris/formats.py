@@ -0,0 +1,408 @@
+import os
+import re
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+#
+# Formats.def
+# ===========
+# The SDK's video format definitions: one [Format] ... [Format end] block per mode a device
+# family supports, valid for ranges of hardware and firmware revisions:
+#
+#   Name = "PI1M 72x56 @ 1000Hz flex"
+#   HWRev = (2100..2199)
+#   FWRev = (2818..2818)
+#   Channels = 1
+#   In = 73 224 250          USB transfer frames: width, height, rate
+#   Out = 72 56 1000         image delivered per channel: width, height, rate
+#   SFrames = 4              images per transfer frame
+#   DeviceRes = 764 480 32   full sensor mode of "flex" formats
+#
+# Names are not authoritative (the "PI1M 766x480 @ 32Hz" format delivers 764x480), sizes
+# always come from Out. Def lines describe the pixel layout of a transfer and are not kept.
+# load_formats() parses a file once and caches the FormatIndex until the file changes.
+#
+
+# path of Formats.def, overrides the search in find_formats_file()
+FORMATS_ENV = "PYOPTRIS_FORMATS"
+# searched in order after FORMATS_ENV; the SDK configs use <formatspath>.\</formatspath>
+DEFAULT_FORMATS_PATHS = (
+    "Formats.def",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Formats.def"),
+    "/usr/share/libirimager/Formats.def",
+)
+# thermal images are uint16
+BYTES_PER_PIXEL = 2
+
+_RATE_IN_NAME = re.compile(r"@\s*([0-9.]+)\s*Hz")
+_REVISIONS = re.compile(r"\((\d+)\.\.(\d+)\)")
+
+
+# width, height and rate of a transfer or of an image channel
+class Output(NamedTuple):
+    width: int
+    height: int
+    rate: float
+    subframes: int = 1
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+#
+# One [Format] block. width, height and rate are those of the first (thermal) channel;
+# PI200/230 formats have a second, visible channel in outputs[1].
+#
+class VideoFormat(NamedTuple):
+    name: str
+    family: str
+    guid: str
+    hw_revisions: Tuple[Tuple[int, int], ...]
+    fw_revisions: Tuple[Tuple[int, int], ...]
+    transfer: Output
+    outputs: Tuple[Output, ...]
+    device_resolution: Optional[Output] = None
+    text: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"VideoFormat({self.name!r}, {self.width}x{self.height} @ {self.rate:g} Hz)"
+
+    @property
+    def width(self) -> int:
+        return self.outputs[0].width
+
+    @property
+    def height(self) -> int:
+        return self.outputs[0].height
+
+    # frame rate, taken from the name when Out rounds it (8.33 Hz is written as 8)
+    @property
+    def rate(self) -> float:
+        rate = self.outputs[0].rate
+        named = _RATE_IN_NAME.search(self.name)
+        if named and abs(float(named.group(1)) - rate) < 1:
+            return float(named.group(1))
+        return rate
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    # numpy shape of a frame
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.height, self.width
+
+    # a window of the sensor that is read out faster than the full frame
+    @property
+    def flex(self) -> bool:
+        return self.name.endswith(" flex")
+
+    @property
+    def frame_bytes(self) -> int:
+        return self.width * self.height * BYTES_PER_PIXEL
+
+    @property
+    def pixel_rate(self) -> float:
+        return self.width * self.height * self.rate
+
+    # thermal image bytes delivered per second
+    @property
+    def bytes_per_second(self) -> float:
+        return self.pixel_rate * BYTES_PER_PIXEL
+
+    # raw bytes per second on the USB link, including the rows and columns the SDK strips
+    @property
+    def usb_bytes_per_second(self) -> float:
+        return self.transfer.pixels * self.transfer.rate * BYTES_PER_PIXEL
+
+    def supports(self, hw_rev: Optional[int] = None, fw_rev: Optional[int] = None) -> bool:
+        return _in_ranges(hw_rev, self.hw_revisions) and _in_ranges(fw_rev, self.fw_revisions)
+
+    # @brief whether both formats can belong to one device: their hardware and firmware ranges overlap
+    def overlaps(self, other: "VideoFormat") -> bool:
+        return _ranges_overlap(self.hw_revisions, other.hw_revisions) and \
+            _ranges_overlap(self.fw_revisions, other.fw_revisions)
+
+    #
+    # @brief whether frames of this format are large enough for a region
+    # @param[in] roi (width, height) of the region, or a roi.Roi, whose bounding box size
+    #            counts: a roi.Roi is made in the coordinates of another (full) frame, a
+    #            flex window is positioned over it by the device
+    #
+    def covers(self, roi) -> bool:
+        width, height = _roi_extent(roi)
+        return width <= self.width and height <= self.height
+
+    # @brief zeroed (capacity, height, width) uint16 frame buffer
+    def allocate(self, capacity: int):
+        import numpy as np
+
+        return np.zeros((capacity, self.height, self.width), dtype=np.uint16)
+
+
+def _in_ranges(value: Optional[int], ranges: Tuple[Tuple[int, int], ...]) -> bool:
+    return value is None or any(lo <= value <= hi for lo, hi in ranges)
+
+
+def _ranges_overlap(a: Tuple[Tuple[int, int], ...], b: Tuple[Tuple[int, int], ...]) -> bool:
+    return any(lo <= other_hi and other_lo <= hi for lo, hi in a for other_lo, other_hi in b)
+
+
+def _roi_extent(roi) -> Tuple[int, int]:
+    if hasattr(roi, "bbox"):
+        x0, y0, x1, y1 = roi.bbox
+        return x1 - x0, y1 - y0
+    width, height = roi
+    return width, height
+
+
+def _roi_pixels(roi) -> int:
+    if hasattr(roi, "bbox"):
+        x0, y0, x1, y1 = roi.bbox
+        return (x1 - x0) * (y1 - y0)
+    width, height = roi
+    return width * height
+
+
+#
+# In-memory index of the formats of one Formats.def, by device family and hardware/firmware
+# revision. Names do not identify a device: the PI 640 modes are called "PI600 640x480"
+# and "PI640 640x120 flex". Formats whose revision ranges overlap, directly or through
+# other formats, are one device family, found under the first word of any of their names,
+# case-insensitive ("PI600" and "PI640" give the same formats, "Xi400" finds "XI400").
+# Devices with disjoint revisions, such as the Xi 80 ("Xi") and the Xi 400 ("XI400"), stay
+# apart.
+#
+class FormatIndex:
+    def __init__(self, formats: Sequence[VideoFormat], version: Optional[int] = None,
+                 release: Optional[int] = None, path: Optional[str] = None):
+        self.formats = tuple(formats)
+        self.version = version
+        self.release = release
+        self.path = path
+        # groups of formats connected by overlapping revisions, as lists of positions
+        groups: List[List[int]] = []
+        for position, format in enumerate(self.formats):
+            joined = [group for group in groups if any(format.overlaps(self.formats[i]) for i in group)]
+            merged = sorted(i for group in joined for i in group) + [position]
+            groups = [group for group in groups if group not in joined] + [merged]
+        members: Dict[str, set] = {}
+        for group in groups:
+            for name in {self.formats[i].family.upper() for i in group}:
+                members.setdefault(name, set()).update(group)
+        self._families: Dict[str, List[VideoFormat]] = {
+            name: [self.formats[i] for i in sorted(positions)] for name, positions in members.items()
+        }
+        self._devices: Dict[Tuple, Tuple[VideoFormat, ...]] = {}
+
+    def __repr__(self) -> str:
+        return f"FormatIndex({len(self.formats)} formats, release={self.release}, path={self.path!r})"
+
+    def __len__(self) -> int:
+        return len(self.formats)
+
+    def __iter__(self) -> Iterator[VideoFormat]:
+        return iter(self.formats)
+
+    @property
+    def families(self) -> List[str]:
+        return sorted({format.family for format in self.formats}, key=str.upper)
+
+    #
+    # @brief formats a device supports, in file order; cached per device
+    # @param[in] family device family, None for all; hw_rev / fw_rev None match any revision
+    #
+    def for_device(self, family: Optional[str] = None, hw_rev: Optional[int] = None,
+                   fw_rev: Optional[int] = None) -> Tuple[VideoFormat, ...]:
+        key = (family.upper() if family else None, hw_rev, fw_rev)
+        formats = self._devices.get(key)
+        if formats is None:
+            candidates = self.formats if family is None else self._families.get(key[0], ())
+            formats = tuple(format for format in candidates if format.supports(hw_rev, fw_rev))
+            self._devices[key] = formats
+        return formats
+
+    #
+    # @brief <videoformatindex> selecting `format` in the config of a device: its position
+    # among the formats the device supports, in file order
+    # @param[in] hw_rev, fw_rev the device's revisions; by default the first ones the format
+    #            supports, the index can differ on other firmware
+    # @return the index; ValueError when the device does not support the format
+    #
+    def video_format_index(self, format: VideoFormat, hw_rev: Optional[int] = None,
+                           fw_rev: Optional[int] = None) -> int:
+        if hw_rev is None:
+            hw_rev = format.hw_revisions[0][0]
+        if fw_rev is None:
+            fw_rev = format.fw_revisions[0][0]
+        formats = self.for_device(format.family, hw_rev, fw_rev)
+        if format not in formats:
+            raise ValueError(f"{format.name!r} is not supported by HW {hw_rev} / FW {fw_rev}")
+        return formats.index(format)
+
+    #
+    # @brief format by name, e.g. "PI1M 72x56 @ 1000Hz"; names repeat across firmware
+    # revisions, give them to pick the right block, otherwise the last one listed is returned
+    #
+    def find(self, name: str, hw_rev: Optional[int] = None, fw_rev: Optional[int] = None) -> VideoFormat:
+        family = name.split(" ", 1)[0]
+        matches = [format for format in self.for_device(family, hw_rev, fw_rev) if format.name == name]
+        if not matches:
+            raise KeyError(f"no format named {name!r}" + (
+                f" for HW {hw_rev} / FW {fw_rev}" if hw_rev is not None or fw_rev is not None else ""))
+        return matches[-1]
+
+    def by_guid(self, guid: str) -> VideoFormat:
+        guid = guid.strip("{}").upper()
+        for format in self.formats:
+            if format.guid.strip("{}").upper() == guid:
+                return format
+        raise KeyError(f"no format with GUID {guid}")
+
+    #
+    # @brief formats of a device that deliver at least `rate` Hz and contain `roi`
+    # @param[in] roi (width, height) or a roi.Roi; None for any frame size
+    #
+    def matching(self, family: Optional[str] = None, hw_rev: Optional[int] = None,
+                 fw_rev: Optional[int] = None, roi=None, rate: float = 0.0) -> List[VideoFormat]:
+        return [
+            format for format in self.for_device(family, hw_rev, fw_rev)
+            if format.rate >= rate and (roi is None or format.covers(roi))
+        ]
+
+    #
+    # @brief the format to initialise a device with for a region and rate
+    # The region's throughput, its pixels times the frame rate, decides; without a region the
+    # whole frame counts. Of formats delivering the same, the one moving fewer bytes wins.
+    # @return the best matching VideoFormat; ValueError when none matches
+    #
+    def select(self, family: Optional[str] = None, hw_rev: Optional[int] = None,
+               fw_rev: Optional[int] = None, roi=None, rate: float = 0.0) -> VideoFormat:
+        formats = self.matching(family, hw_rev, fw_rev, roi, rate)
+        if not formats:
+            raise ValueError(
+                f"no {family or ''} format for HW {hw_rev} / FW {fw_rev} covers "
+                f"{'the whole frame' if roi is None else _roi_extent(roi)} at {rate} Hz or more"
+            )
+
+        def throughput(format: VideoFormat) -> Tuple[float, float]:
+            pixels = format.width * format.height if roi is None else _roi_pixels(roi)
+            return pixels * format.rate, -format.bytes_per_second
+
+        return max(formats, key=throughput)
+
+
+def _output(value: str, line: int, subframes: int = 1) -> Output:
+    fields = value.split()
+    try:
+        return Output(int(fields[0]), int(fields[1]), float(fields[2]), subframes)
+    except (IndexError, ValueError):
+        raise ValueError(f"line {line}: expected 'width height rate', got {value!r}") from None
+
+
+def _format(fields: Dict[str, object], outputs: List[Output], line: int) -> VideoFormat:
+    for key in ("Name", "HWRev", "FWRev", "In"):
+        if key not in fields:
+            raise ValueError(f"format ending on line {line} has no {key}")
+    if not outputs:
+        raise ValueError(f"format ending on line {line} has no Out")
+    name = fields["Name"].strip('"')
+    return VideoFormat(
+        name=name,
+        family=name.split(" ", 1)[0],
+        guid=fields.get("Guid", ""),
+        hw_revisions=tuple((int(lo), int(hi)) for lo, hi in _REVISIONS.findall(fields["HWRev"])),
+        fw_revisions=tuple((int(lo), int(hi)) for lo, hi in _REVISIONS.findall(fields["FWRev"])),
+        transfer=fields["In"],
+        outputs=tuple(outputs),
+        device_resolution=fields.get("DeviceRes"),
+        text=fields.get("Text"),
+    )
+
+
+#
+# @brief parses the text of a Formats.def
+# @return FormatIndex of its formats; ValueError on malformed blocks
+#
+def parse_formats(text: str, path: Optional[str] = None) -> FormatIndex:
+    formats = []
+    header: Dict[str, str] = {}
+    fields: Optional[Dict[str, object]] = None
+    outputs: List[Output] = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line == "[Format]":
+            if fields is not None:
+                raise ValueError(f"line {number}: [Format] inside a format")
+            fields, outputs = {}, []
+            continue
+        if line == "[Format end]":
+            if fields is None:
+                raise ValueError(f"line {number}: [Format end] outside of a format")
+            formats.append(_format(fields, outputs, number))
+            fields = None
+            continue
+        if line.startswith("["):
+            continue
+        key, separator, value = line.partition("=")
+        if not separator:
+            raise ValueError(f"line {number}: expected 'key = value', got {line!r}")
+        key, value = key.strip(), value.strip()
+        if fields is None:
+            header[key] = value
+        elif key == "In":
+            fields[key] = _output(value, number)
+        elif key == "Out":
+            outputs.append(_output(value, number))
+        elif key == "SFrames" and outputs:
+            outputs[-1] = outputs[-1]._replace(subframes=int(value))
+        elif key == "DeviceRes":
+            fields[key] = _output(value, number)
+        elif key != "Def":
+            fields[key] = value
+    if fields is not None:
+        raise ValueError("Formats.def ends inside a format")
+    version, release = header.get("Version"), header.get("Release")
+    return FormatIndex(formats, int(version) if version else None, int(release) if release else None, path)
+
+
+# @brief path of Formats.def: FORMATS_ENV, then DEFAULT_FORMATS_PATHS; None when not found
+def find_formats_file() -> Optional[str]:
+    override = os.environ.get(FORMATS_ENV)
+    if override:
+        return override if os.path.exists(override) else None
+    for path in DEFAULT_FORMATS_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+_cache: Dict[str, Tuple[Tuple[int, int], FormatIndex]] = {}
+_cache_lock = threading.Lock()
+
+
+#
+# @brief FormatIndex of a Formats.def, parsed once and reused until the file changes
+# @param[in] path None searches with find_formats_file()
+#
+def load_formats(path: Optional[str] = None) -> FormatIndex:
+    if path is None:
+        path = find_formats_file()
+        if path is None:
+            raise FileNotFoundError(f"Formats.def not found, set {FORMATS_ENV} to its path")
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    with open(path, encoding="utf-8", errors="replace") as file:
+        index = parse_formats(file.read(), path)
+    with _cache_lock:
+        _cache[path] = (version, index)
+    return index
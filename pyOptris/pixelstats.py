@@ -0,0 +1,309 @@
+import collections
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from .conversion import DEFAULT_DECIMALS, RAW_OFFSET
+
+#
+# Per-pixel running statistics
+# ============================
+# Mean, variance, min and max maps of any number of frames in O(pixels) memory: counts,
+# means and sums of squared deviations (M2) are kept per pixel in float64 and updated
+# batch by batch with Welford's algorithm in the pairwise form of Chan et al., which
+# also merges two accumulators exactly, e.g. the partial results of worker processes.
+# Statistics stay in raw units; temperatures() converts them.
+#
+STATISTICS_MODES = ("all", "window", "decay")
+
+# frames folded into the accumulator per vectorised step, bounds the float64 temporaries
+_BATCH_FRAMES = 32
+
+
+# count, mean, M2, min and max of a set of frames
+class _Moments:
+    def __init__(self, shape: Tuple[int, ...]):
+        self.count = 0
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.m2 = np.zeros(shape, dtype=np.float64)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+
+    def copy(self) -> "_Moments":
+        other = _Moments.__new__(_Moments)
+        other.count = self.count
+        other.mean, other.m2 = self.mean.copy(), self.m2.copy()
+        other.min, other.max = self.min.copy(), self.max.copy()
+        return other
+
+    def add(self, frames: np.ndarray):
+        for start in range(0, len(frames), _BATCH_FRAMES):
+            batch = frames[start:start + _BATCH_FRAMES]
+            n = len(batch)
+            mean = batch.mean(axis=0, dtype=np.float64)
+            deviation = batch - mean
+            np.square(deviation, out=deviation)
+            self._merge(n, mean, deviation.sum(axis=0))
+            np.minimum(self.min, batch.min(axis=0), out=self.min)
+            np.maximum(self.max, batch.max(axis=0), out=self.max)
+
+    def merge(self, other: "_Moments"):
+        if other.count:
+            self._merge(other.count, other.mean, other.m2)
+            np.minimum(self.min, other.min, out=self.min)
+            np.maximum(self.max, other.max, out=self.max)
+
+    def _merge(self, n: int, mean: np.ndarray, m2: np.ndarray):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * (n / total)
+        self.m2 += m2 + np.square(delta) * (self.count * n / total)
+        self.count = total
+
+
+#
+# Running per-pixel statistics of a frame stream.
+# @param[in] shape (height, width) of the frames
+# @param[in] mode "all" covers every frame since the start (or reset()); "window" the last
+#            `window` frames, kept as `blocks` partial accumulators, so the statistics cover
+#            between window - window / blocks and window frames and memory is O(blocks *
+#            pixels); "decay" weights frame k frames back by (1 - alpha) ** k
+# @param[in] alpha weight of the newest frame in "decay" mode, or give `halflife` in frames
+# In "decay" mode min and max are those of every frame seen.
+#
+class PixelStatistics:
+    def __init__(
+        self,
+        shape: Tuple[int, int],
+        mode: str = "all",
+        window: Optional[int] = None,
+        blocks: int = 8,
+        alpha: Optional[float] = None,
+        halflife: Optional[float] = None,
+    ):
+        if mode not in STATISTICS_MODES:
+            raise ValueError(f"mode must be one of {STATISTICS_MODES}, got {mode!r}")
+        if mode == "window" and (window is None or window < 1):
+            raise ValueError("window mode needs window >= 1 frames")
+        if mode == "decay":
+            if halflife is not None:
+                alpha = 1.0 - 0.5 ** (1.0 / halflife)
+            if alpha is None or not 0 < alpha <= 1:
+                raise ValueError("decay mode needs 0 < alpha <= 1 or a positive halflife")
+        self.shape = tuple(shape)
+        self.mode = mode
+        self.window = window
+        self.blocks = max(1, min(blocks, window or blocks))
+        self.block_frames = -(-window // self.blocks) if mode == "window" else 0
+        self.alpha = alpha
+        self.frames_seen = 0
+        self.reset()
+
+    def reset(self):
+        self.frames_seen = 0
+        self._moments = _Moments(self.shape)
+        self._blocks = collections.deque(maxlen=self.blocks)
+        self._variance = np.zeros(self.shape, dtype=np.float64)
+
+    # frames the statistics currently cover
+    @property
+    def count(self) -> int:
+        if self.mode == "window":
+            return self._window().count
+        return self._moments.count if self.mode == "all" else self.frames_seen
+
+    #
+    # @brief folds in a frame or an (n, h, w) stack of frames
+    #
+    def update(self, frames: np.ndarray) -> "PixelStatistics":
+        if frames.ndim == 2:
+            frames = frames[None]
+        if frames.shape[1:] != self.shape:
+            raise ValueError(f"frames of shape {frames.shape[1:]} do not match {self.shape}")
+        if self.mode == "all":
+            self._moments.add(frames)
+        elif self.mode == "window":
+            done = 0
+            while done < len(frames):
+                if self._moments.count == self.block_frames:
+                    self._blocks.append(self._moments)
+                    self._moments = _Moments(self.shape)
+                n = min(len(frames) - done, self.block_frames - self._moments.count)
+                self._moments.add(frames[done:done + n])
+                done += n
+        else:
+            self._decay(frames)
+        self.frames_seen += len(frames)
+        return self
+
+    #
+    # @brief adds the frames `other` has seen, as if they had been passed to update()
+    # Exact for "all" mode, which is what partial results of parallel workers use.
+    #
+    def merge(self, other: "PixelStatistics") -> "PixelStatistics":
+        if self.mode != "all" or other.mode != "all":
+            raise ValueError("only 'all' mode statistics can be merged")
+        if other.shape != self.shape:
+            raise ValueError(f"cannot merge statistics of shape {other.shape} into {self.shape}")
+        self._moments.merge(other._moments)
+        self.frames_seen += other.frames_seen
+        return self
+
+    # @brief merges a sequence of "all" mode statistics, e.g. the ordered results of RecordingAnalyzer
+    @staticmethod
+    def merge_all(statistics: Iterable["PixelStatistics"]) -> Optional["PixelStatistics"]:
+        merged = None
+        for item in statistics:
+            merged = item if merged is None else merged.merge(item)
+        return merged
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._current().mean.copy()
+
+    @property
+    def min(self) -> np.ndarray:
+        return self._current().min.copy()
+
+    @property
+    def max(self) -> np.ndarray:
+        return self._current().max.copy()
+
+    # @param[in] ddof 1 for the sample variance
+    def variance(self, ddof: int = 0) -> np.ndarray:
+        if self.mode == "decay":
+            return self._variance.copy()
+        moments = self._current()
+        return moments.m2 / max(moments.count - ddof, 1)
+
+    def std(self, ddof: int = 0) -> np.ndarray:
+        return np.sqrt(self.variance(ddof))
+
+    # @return {"count", "mean", "variance", "std", "min", "max"} maps in raw units
+    def stats(self, ddof: int = 0) -> Dict[str, np.ndarray]:
+        moments = self._current()
+        variance = self.variance(ddof)
+        return {
+            "count": self.count,
+            "mean": moments.mean.copy(),
+            "variance": variance,
+            "std": np.sqrt(variance),
+            "min": moments.min.copy(),
+            "max": moments.max.copy(),
+        }
+
+    # @brief stats() converted to temperatures, see raw_to_temperature
+    def temperatures(self, ddof: int = 0, decimals: int = DEFAULT_DECIMALS,
+                     offset: float = RAW_OFFSET) -> Dict[str, np.ndarray]:
+        scale = 10.0 ** decimals
+        stats = self.stats(ddof)
+        for name in ("mean", "min", "max"):
+            stats[name] = (stats[name] - offset) / scale
+        stats["variance"] /= scale * scale
+        stats["std"] /= scale
+        return stats
+
+    def _current(self) -> _Moments:
+        return self._window() if self.mode == "window" else self._moments
+
+    def _window(self) -> _Moments:
+        blocks = list(self._blocks)
+        # the oldest block falls out of the window once the current one has frames
+        if len(blocks) == self.blocks and self._moments.count:
+            blocks = blocks[1:]
+        merged = self._moments.copy()
+        for block in blocks:
+            merged.merge(block)
+        return merged
+
+    def _decay(self, frames: np.ndarray):
+        moments, alpha = self._moments, self.alpha
+        delta = np.empty(self.shape, dtype=np.float64)
+        for frame in frames:
+            if moments.count == 0:
+                moments.mean[...] = frame
+            else:
+                # exponentially weighted mean and variance (West, 1979)
+                np.subtract(frame, moments.mean, out=delta)
+                moments.mean += alpha * delta
+                self._variance *= 1.0 - alpha
+                self._variance += alpha * (1.0 - alpha) * np.square(delta)
+            np.minimum(moments.min, frame, out=moments.min)
+            np.maximum(moments.max, frame, out=moments.max)
+            moments.count += 1
+
+
+#
+# @brief per-chunk function for RecordingAnalyzer: "all" mode statistics of the chunk,
+# to be reduced with PixelStatistics.merge_all:
+#   analyzer.run(pixel_statistics, reduce=PixelStatistics.merge_all)
+#
+def pixel_statistics(frames: np.ndarray, timestamps: np.ndarray, first: int) -> PixelStatistics:
+    return PixelStatistics(frames.shape[1:]).update(np.asarray(frames))
+
+
+# @brief statistics of a recording read in chunks, e.g. open_recording(path)
+def recording_statistics(recording, chunk_frames: int = 256, **kwargs) -> PixelStatistics:
+    statistics = PixelStatistics((recording.height, recording.width), **kwargs)
+    for start in range(0, len(recording), chunk_frames):
+        statistics.update(np.asarray(recording.frames[start:start + chunk_frames]))
+    return statistics
+
+
+#
+# Keeps PixelStatistics of an Acquisition up to date from its own thread, woken by the
+# acquisition after every frame; snapshot() returns a consistent copy of the maps.
+# Frames the thread could not keep up with are counted in `dropped`.
+#
+class PixelStatisticsMonitor:
+    def __init__(self, acquisition, statistics: Optional[PixelStatistics] = None, **kwargs):
+        self.acquisition = acquisition
+        self.statistics = statistics or PixelStatistics(acquisition.ring.frames.shape[1:], **kwargs)
+        self._lock = threading.Lock()
+        self._new_frame = threading.Event()
+        self._reader = None
+        self._running = False
+        self._thread = None
+
+    @property
+    def dropped(self) -> int:
+        return self._reader.dropped if self._reader is not None else 0
+
+    def start(self) -> "PixelStatisticsMonitor":
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._reader = self.acquisition.reader()
+        self.acquisition.add_listener(self._new_frame.set)
+        self._thread = threading.Thread(target=self._run, name=f"pixel statistics {self.acquisition.name}",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._new_frame.set()
+        self.acquisition.remove_listener(self._new_frame.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # @brief stats() of the frames seen so far, see PixelStatistics.stats
+    def snapshot(self, ddof: int = 0, temperatures: bool = False) -> Dict[str, np.ndarray]:
+        with self._lock:
+            return self.statistics.temperatures(ddof) if temperatures else self.statistics.stats(ddof)
+
+    def reset(self):
+        with self._lock:
+            self.statistics.reset()
+
+    def _run(self):
+        capacity = self.acquisition.ring.capacity
+        while self._running:
+            self._new_frame.wait(0.1)
+            self._new_frame.clear()
+            frames, _ = self._reader.read(capacity)
+            if len(frames):
+                with self._lock:
+                    self.statistics.update(frames)
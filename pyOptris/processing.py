@@ -0,0 +1,372 @@
+import collections
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .conversion import RAW_OFFSET
+from .shared import SharedArray
+
+#
+# Rendering and analytics off the capture process. Frames are copied once into slots of
+# a shared memory block; worker processes read them in place, write their image into the
+# matching slot of a second block and send back only the slot index and a small result
+# (e.g. a dict of statistics), so no frame array is ever pickled.
+#
+
+
+@functools.lru_cache(maxsize=None)
+def jet_lut() -> np.ndarray:
+    # 256 x RGB, the usual blue - cyan - yellow - red "jet" ramp
+    ramp = np.linspace(0.0, 1.0, 256)
+    red = np.clip(1.5 - np.abs(4.0 * ramp - 3.0), 0, 1)
+    green = np.clip(1.5 - np.abs(4.0 * ramp - 2.0), 0, 1)
+    blue = np.clip(1.5 - np.abs(4.0 * ramp - 1.0), 0, 1)
+    lut = (np.stack([red, green, blue], axis=1) * 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+#
+# @brief min-max normalised colormap rendering of a raw frame, like cv2.normalize + applyColorMap
+# @param[in] frame (h, w) uint16 raw frame
+# @param[out] out (h, w, 3) uint8 RGB image
+# @return {"min", "max", "mean"} temperatures of the frame
+#
+def render_colormap(frame: np.ndarray, out: np.ndarray) -> dict:
+    low, high = int(frame.min()), int(frame.max())
+    scale = 255.0 / max(high - low, 1)
+    index = ((frame.astype(np.float32) - low) * scale).astype(np.uint8)
+    np.take(jet_lut(), index, axis=0, out=out)
+    return _statistics(frame, low, high)
+
+
+#
+# @brief min-max normalised 8-bit grayscale rendering, like cv2.normalize(..., NORM_MINMAX)
+# @param[in] frame (h, w) uint16 raw frame
+# @param[out] out (h, w) uint8 image
+# @return {"min", "max", "mean"} temperatures of the frame
+#
+def render_grayscale(frame: np.ndarray, out: np.ndarray) -> dict:
+    low, high = int(frame.min()), int(frame.max())
+    scale = 255.0 / max(high - low, 1)
+    out[...] = (frame.astype(np.float32) - low) * scale
+    return _statistics(frame, low, high)
+
+
+# @brief temperature statistics only, for pipelines without an output image
+def frame_statistics(frame: np.ndarray, out: Optional[np.ndarray] = None) -> dict:
+    return _statistics(frame, int(frame.min()), int(frame.max()))
+
+
+def _statistics(frame: np.ndarray, low: int, high: int) -> dict:
+    return {
+        "min": (low - RAW_OFFSET) / 10.0,
+        "max": (high - RAW_OFFSET) / 10.0,
+        "mean": (float(frame.mean()) - RAW_OFFSET) / 10.0,
+    }
+
+
+# worker process side
+_inputs: Optional[SharedArray] = None
+_outputs: Optional[SharedArray] = None
+
+
+def _attach_worker(inputs: tuple, outputs: Optional[tuple]):
+    global _inputs, _outputs
+    _inputs = SharedArray.attach(*inputs)
+    _outputs = SharedArray.attach(*outputs) if outputs is not None else None
+
+
+def _process(func: Callable, slot: int) -> Tuple[int, Any]:
+    out = _outputs.array[slot] if _outputs is not None else None
+    return slot, func(_inputs.array[slot], out)
+
+
+#
+# One processed frame.
+# slot: output slot holding the image, valid until ProcessingPool.release(slot)
+# value: whatever the function returned; error: the exception it raised, if any
+#
+class ProcessingResult(NamedTuple):
+    slot: int
+    index: int
+    timestamp: float
+    value: Any
+    error: Optional[BaseException]
+
+
+#
+# Process pool running func(frame, out) on frames handed over through shared memory.
+# @param[in] func module-level function (it is pickled by reference) taking the input frame
+#            and its output slot (None without result_shape); its return value is sent back
+# @param[in] shape, dtype input frame layout
+# @param[in] result_shape, result_dtype output image layout, None when func only returns values
+# @param[in] slots frames in flight, 2 per worker by default; submit() returns None when
+#            all of them are busy, which is where the caller drops or waits
+# @param[in] mp_context multiprocessing start method, "spawn" so worker start-up is the
+#            same on Windows and Linux and never forks the capture threads
+#
+class ProcessingPool:
+    def __init__(
+        self,
+        func: Callable,
+        shape: Tuple[int, ...],
+        dtype=np.uint16,
+        result_shape: Optional[Tuple[int, ...]] = None,
+        result_dtype=np.uint8,
+        workers: int = 2,
+        slots: Optional[int] = None,
+        mp_context: str = "spawn",
+    ):
+        self.func = func
+        self.slots = slots or 2 * workers
+        self.inputs = SharedArray((self.slots,) + tuple(shape), dtype)
+        self.outputs = None
+        if result_shape is not None:
+            self.outputs = SharedArray((self.slots,) + tuple(result_shape), result_dtype)
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self._free = collections.deque(range(self.slots))
+        self._done = collections.deque()
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._executor = ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context(mp_context),
+            initializer=_attach_worker,
+            initargs=(self.inputs.spec(), self.outputs.spec() if self.outputs is not None else None),
+        )
+
+    def __enter__(self) -> "ProcessingPool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    #
+    # @brief copies `frame` into a free slot and queues it for processing
+    # @param[in] timeout seconds to wait for a free slot; 0 returns at once, None waits forever
+    # @param[in] callback optional callback(ProcessingResult), called from a pool thread;
+    #            without one, results are collected by results()
+    # @return the slot, or None when no slot became free
+    #
+    def submit(self, frame: np.ndarray, index: int = -1, timestamp: float = 0.0,
+               timeout: Optional[float] = 0, callback: Optional[Callable] = None) -> Optional[int]:
+        slot = self.reserve(timeout)
+        if slot is not None:
+            np.copyto(self.inputs.array[slot], frame)
+            self.dispatch(slot, index, timestamp, callback)
+        return slot
+
+    # @brief takes a free slot to be filled in place through inputs.array[slot], then dispatch()ed
+    def reserve(self, timeout: Optional[float] = 0) -> Optional[int]:
+        with self._lock:
+            if not self._free and timeout != 0:
+                self._slot_freed.wait_for(lambda: self._free, timeout)
+            if not self._free:
+                self.rejected += 1
+                return None
+            return self._free.popleft()
+
+    def dispatch(self, slot: int, index: int = -1, timestamp: float = 0.0, callback: Optional[Callable] = None):
+        future = self._executor.submit(_process, self.func, slot)
+        future.add_done_callback(functools.partial(self._finished, slot, index, timestamp, callback))
+        self.submitted += 1
+
+    def _finished(self, slot, index, timestamp, callback, future):
+        # cancelled by close(): nothing to deliver, the slot is simply free again
+        if future.cancelled():
+            self.release(slot)
+            return
+        error = future.exception()
+        result = ProcessingResult(slot, index, timestamp, None if error else future.result()[1], error)
+        self.completed += 1
+        if callback is not None:
+            callback(result)
+        else:
+            self._done.append(result)
+
+    # @return results completed since the last call, in completion order
+    def results(self) -> List[ProcessingResult]:
+        done = []
+        while self._done:
+            done.append(self._done.popleft())
+        return done
+
+    # output image of a completed slot
+    def result_array(self, slot: int) -> np.ndarray:
+        return self.outputs.array[slot]
+
+    # hands a completed slot back for reuse
+    def release(self, slot: int):
+        with self._lock:
+            self._free.append(slot)
+            self._slot_freed.notify()
+
+    @property
+    def busy(self) -> int:
+        return self.slots - len(self._free)
+
+    def close(self):
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        self.inputs.close()
+        if self.outputs is not None:
+            self.outputs.close()
+
+
+#
+# Feeds an Acquisition into a ProcessingPool from its own thread, so the acquisition
+# thread only grabs frames and the display only picks up finished images.
+# @param[in] policy "latest" submits the newest frame whenever a slot is free and keeps
+#            only the newest result, see latest() (display, monitoring); "all" submits every
+#            frame in order, and frames the pool cannot keep up with are lost in the ring and
+#            counted in `dropped`. Every result of "all" is delivered, see on_result
+# @param[in] on_result "all" only: on_result(index, image, value) called from a pool thread
+#            for every processed frame, in completion order; `image` is the output slot
+#            (None without result_shape), only valid during the call. Without it, results
+#            are collected for results(), up to `max_results` of them: beyond that the
+#            oldest are discarded and counted in `results_dropped`
+#
+class ProcessingStage:
+    def __init__(self, acquisition, pool: ProcessingPool, policy: str = "latest",
+                 on_result: Optional[Callable[[int, Optional[np.ndarray], Any], None]] = None,
+                 max_results: int = 1024):
+        if policy not in ("latest", "all"):
+            raise ValueError(f"policy must be 'latest' or 'all', got {policy!r}")
+        if on_result is not None and policy != "all":
+            raise ValueError("on_result needs policy 'all'; use latest() with policy 'latest'")
+        self.acquisition = acquisition
+        self.pool = pool
+        self.policy = policy
+        self.on_result = on_result
+        self.errors = 0
+        self.results_dropped = 0
+        self._latest: Optional[ProcessingResult] = None
+        self._results = collections.deque(maxlen=max_results)
+        self._lock = threading.Lock()
+        self._new_frame = threading.Event()
+        self._reader = None
+        self._running = False
+        self._thread = None
+
+    @property
+    def dropped(self) -> int:
+        return self._reader.dropped if self._reader is not None else 0
+
+    def start(self) -> "ProcessingStage":
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._reader = self.acquisition.reader()
+        self.acquisition.add_listener(self._new_frame.set)
+        self._thread = threading.Thread(target=self._run, name=f"processing {self.acquisition.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._new_frame.set()
+        self.acquisition.remove_listener(self._new_frame.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    #
+    # @brief most recent processed frame
+    # @param[out] out optional destination for a copy of the output image
+    # @return (frame index, image copy or None, value); index is -1 before the first result
+    #
+    def latest(self, out: Optional[np.ndarray] = None) -> Tuple[int, Optional[np.ndarray], Any]:
+        with self._lock:
+            result = self._latest
+            if result is None:
+                return -1, None, None
+            image = None
+            if self.pool.outputs is not None:
+                source = self.pool.result_array(result.slot)
+                if out is None:
+                    image = source.copy()
+                else:
+                    np.copyto(out, source)
+                    image = out
+            return result.index, image, result.value
+
+    #
+    # @brief "all" mode results collected since the last call, without on_result
+    # @return (frame index, image copy or None, value) tuples in completion order
+    #
+    def results(self) -> List[Tuple[int, Optional[np.ndarray], Any]]:
+        with self._lock:
+            results = list(self._results)
+            self._results.clear()
+        return results
+
+    def _completed(self, result: ProcessingResult):
+        if result.error is not None:
+            self.errors += 1
+            self.pool.release(result.slot)
+            return
+        if self.policy == "all":
+            self._deliver(result)
+            return
+        with self._lock:
+            previous = self._latest
+            # results can complete out of order; keep showing the newest frame
+            if previous is not None and previous.index > result.index:
+                self.pool.release(result.slot)
+                return
+            self._latest = result
+        if previous is not None:
+            self.pool.release(previous.slot)
+
+    def _deliver(self, result: ProcessingResult):
+        try:
+            image = self.pool.result_array(result.slot) if self.pool.outputs is not None else None
+            if self.on_result is not None:
+                self.on_result(result.index, image, result.value)
+            else:
+                with self._lock:
+                    if len(self._results) == self._results.maxlen:
+                        self.results_dropped += 1
+                    self._results.append((result.index, None if image is None else image.copy(), result.value))
+        except Exception:
+            self.errors += 1
+        finally:
+            self.pool.release(result.slot)
+
+    def _run(self):
+        ring = self.acquisition.ring
+        submitted = -1
+        while self._running:
+            self._new_frame.wait(0.1)
+            self._new_frame.clear()
+            if self.policy == "latest":
+                if ring.count - 1 <= submitted:
+                    continue
+                # wait for a free slot first, then copy whatever frame is newest by then
+                slot = self.pool.reserve(timeout=0.1)
+                if slot is None:
+                    self._new_frame.set()
+                    continue
+                index, _, timestamp = ring.latest(self.pool.inputs.array[slot])
+                self.pool.dispatch(slot, index, timestamp, self._completed)
+                submitted = index
+            else:
+                while self._running and self._reader.available() > 0:
+                    # copy each frame from its ring slot straight into a free input slot
+                    slot = self.pool.reserve(timeout=0.1)
+                    if slot is None:
+                        continue
+                    read = self._reader.read_into(self.pool.inputs.array[slot])
+                    if read is None:
+                        self.pool.release(slot)
+                        break
+                    self.pool.dispatch(slot, read[0], read[1], self._completed)
@@ -0,0 +1,255 @@
+import queue
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .acquisition import RingReader
+from .compression import CompressedRecordingWriter
+from .drops import FrameCounterMonitor
+from .recording import METADATA_DTYPE, RecordingWriter
+from .roi import RoiSet
+
+FSYNC_POLICIES = ("chunk", "close", "never")
+
+
+#
+# Streams frames into a recording container (see recording.py) from a writer thread in
+# fixed-size chunks. Frames arrive either through write() or, with start(source), straight
+# from a RingReader. RAM use is bounded by `queue_chunks` preallocated chunk buffers; write()
+# blocks when the disk falls that far behind. Every chunk is committed to the header as
+# soon as it is written, so the file is complete up to the last chunk if the process dies.
+# Frames read from a RingReader keep their device timestamp, host perf_counter stamp and
+# device metadata (counters, flag state, temperatures) in the per-frame metadata, and the
+# frame loss statistics of the recorded device counters are stored in attrs["frame_counters"].
+# With `rois` only the pixels of those ROIs are stored for every frame, plus a full keyframe
+# every `keyframe_interval` seconds as context (see recording.py); at a few small ROIs
+# this shrinks recordings and disk bandwidth by one to two orders of magnitude. Frames
+# read from a RingReader then never leave the ring as full frames, except keyframes.
+# With `compression` ("zlib", "lzma", "zstd" or "blosc") frames are stored losslessly
+# compressed instead, see compression.py; chunks are compressed on `compression_workers`
+# threads while the next ones are captured.
+# @param[in] fsync "chunk" syncs every chunk before it is committed, "close" only on stop, "never" leaves it to the OS
+# @param[in] serial, videoformatindex, temperature_range, attrs stored in the recording header
+#
+class Recorder:
+    def __init__(
+        self,
+        path: str,
+        width: int,
+        height: int,
+        chunk_frames: int = 256,
+        queue_chunks: int = 4,
+        fsync: str = "chunk",
+        preallocate_frames: int = 4096,
+        serial: int = 0,
+        videoformatindex: int = -1,
+        temperature_range: Tuple[float, float] = (0.0, 0.0),
+        attrs: Optional[dict] = None,
+        rois: Optional[RoiSet] = None,
+        keyframe_interval: float = 10.0,
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
+        compression_workers: int = 4,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        if compression is not None and rois is not None:
+            raise ValueError("ROI recordings cannot be compressed")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.chunk_frames = chunk_frames
+        self.fsync = fsync
+        self.preallocate_frames = max(preallocate_frames, chunk_frames)
+        self.info = {
+            "serial": serial,
+            "videoformatindex": videoformatindex,
+            "temperature_range": temperature_range,
+            "attrs": attrs,
+        }
+        self.compression = compression
+        self.compression_level = compression_level
+        self.compression_workers = compression_workers
+        self.rois = rois
+        self.keyframe_interval = keyframe_interval
+        self.keyframes_written = 0
+        self._next_keyframe = -np.inf
+        self.frames_written = 0
+        self.chunks_written = 0
+        self.dropped = 0
+        self.counters = FrameCounterMonitor()
+
+        self._free = queue.Queue()
+        self._full = queue.Queue()
+        for _ in range(queue_chunks):
+            self._free.put((np.empty((chunk_frames, height, width), dtype=np.uint16),
+                            np.empty(chunk_frames, dtype=np.float64)))
+        self._chunk = None
+        self._fill = 0
+        self._source = None
+        # ring count at stop(): the source is drained up to this frame and no further
+        self._stop_at = None
+        self._running = False
+        self._thread = None
+        self._error = None
+        self._writer = None
+
+    # raw frame bytes over stored bytes, 1.0 for uncompressed recordings
+    @property
+    def compression_ratio(self) -> float:
+        if self.compression is None or self._writer is None:
+            return 1.0
+        return self._writer.ratio
+
+    def start(self, source: Optional[RingReader] = None) -> "Recorder":
+        if self.compression is not None:
+            self._writer = CompressedRecordingWriter(self.path, self.width, self.height, codec=self.compression,
+                                                     level=self.compression_level, chunk_frames=self.chunk_frames,
+                                                     workers=self.compression_workers, **self.info)
+        else:
+            self._writer = RecordingWriter(self.path, self.width, self.height, capacity=self.preallocate_frames,
+                                           rois=self.rois, **self.info)
+        self._source = source
+        self._stop_at = None
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"recorder {self.path}", daemon=True)
+        self._thread.start()
+        return self
+
+    # queue one frame; blocks while all chunk buffers are waiting for the disk
+    def write(self, frame: np.ndarray, timestamp: float):
+        if self._error is not None:
+            raise self._error
+        if self._chunk is None:
+            self._chunk = self._free.get()
+            self._fill = 0
+        frames, timestamps = self._chunk
+        frames[self._fill] = frame
+        timestamps[self._fill] = timestamp
+        self._fill += 1
+        if self._fill == self.chunk_frames:
+            self._flush_chunk()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        if self._chunk is not None:
+            self._flush_chunk()
+        if self._source is not None:
+            # a camera faster than the disk would otherwise keep the drain busy forever
+            self._stop_at = self._source.ring.count
+        self._running = False
+        self._full.put(None)
+        self._thread.join()
+        self._thread = None
+        error = self._error
+        try:
+            self._finish()
+        except Exception:
+            # closing a file the writer failed on usually fails too; report the first error
+            if error is None:
+                raise
+        if error is not None:
+            raise error
+
+    def _flush_chunk(self):
+        self._full.put((self._chunk, self._fill))
+        self._chunk = None
+        self._fill = 0
+
+    def _run(self):
+        try:
+            if self._source is None:
+                self._drain_queue()
+            else:
+                self._drain_source()
+        except Exception as e:
+            self._error = e
+
+    def _drain_queue(self):
+        while True:
+            item = self._full.get()
+            if item is None:
+                return
+            (frames, timestamps), n = item
+            # after a failure chunks are only handed back, so write() never waits for a buffer
+            # and raises the error instead
+            try:
+                if self._error is None:
+                    self._write_frames(frames[:n], timestamps[:n])
+            except Exception as e:
+                self._error = e
+            finally:
+                self._free.put((frames, timestamps))
+
+    def _write_frames(self, frames: np.ndarray, timestamps: np.ndarray):
+        if self.rois is not None:
+            first = self._writer.frame_count
+            # keyframes can fall anywhere in a chunk of queued frames
+            i = int(np.searchsorted(timestamps, self._next_keyframe))
+            while i < len(frames):
+                self._write_keyframe(frames[i], first + i, timestamps[i])
+                i = int(np.searchsorted(timestamps, self._next_keyframe))
+            frames = frames.reshape(len(frames), -1)[:, self.rois.indices]
+        self._write_chunk(frames, timestamps)
+
+    def _drain_source(self):
+        source = self._source
+        dropped_before = source.dropped
+        metadata = np.zeros(self.chunk_frames, dtype=METADATA_DTYPE)
+        pixels = self.rois.indices if self.rois is not None else None
+        while True:
+            limit = self.chunk_frames
+            stop_at = self._stop_at
+            if stop_at is not None:
+                limit = min(limit, stop_at - source.position)
+                if limit <= 0:
+                    return
+            frames, timestamps, host_ns, device_times, device = source.read_stamped(limit, pixels)
+            self.dropped = source.dropped - dropped_before
+            n = len(frames)
+            if n:
+                chunk = metadata[:n]
+                chunk["timestamp"] = device_times
+                chunk["host_time"] = host_ns * 1e-9
+                chunk["counter"] = device["counter"]
+                chunk["counter_hw"] = device["counterHW"]
+                chunk["flag_state"] = device["flagState"]
+                chunk["temp_chip"] = device["tempChip"]
+                chunk["temp_flag"] = device["tempFlag"]
+                chunk["temp_box"] = device["tempBox"]
+                valid = ~np.isnan(device_times)
+                self.counters.update(device["counterHW"][valid])
+                if pixels is not None and timestamps[-1] >= self._next_keyframe:
+                    self._keyframe_from_ring(source, n, timestamps[-1])
+                self._write_chunk(frames, timestamps, chunk)
+            elif not self._running:
+                return
+            else:
+                time.sleep(0.005)
+
+    # keyframe from the newest frame of the chunk just read, if the ring has not overwritten it yet
+    def _keyframe_from_ring(self, source: RingReader, n: int, timestamp: float):
+        ring = source.ring
+        index = source.position - 1
+        frame = ring.frames[index % ring.capacity].copy()
+        if ring.oldest() <= index:
+            self._write_keyframe(frame, self._writer.frame_count + n - 1, timestamp)
+
+    def _write_keyframe(self, frame: np.ndarray, index: int, timestamp: float):
+        self._writer.append_keyframe(frame, index)
+        self.keyframes_written += 1
+        self._next_keyframe = timestamp + self.keyframe_interval
+
+    def _write_chunk(self, frames: np.ndarray, timestamps: np.ndarray, metadata: Optional[np.ndarray] = None):
+        self._writer.append(frames, timestamps, metadata)
+        self._writer.commit(sync=self.fsync == "chunk")
+        self.frames_written = self._writer.frame_count
+        self.chunks_written += 1
+
+    def _finish(self):
+        if self.counters.received:
+            self._writer.update_attrs(frame_counters=self.counters.stats(), recorder_dropped=self.dropped)
+        self._writer.close(sync=self.fsync != "never")
@@ -0,0 +1,534 @@
+import json
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .drops import counter_stats
+from .roi import Roi, RoiSet
+
+#
+# Native recording container
+# ==========================
+# One file, little endian, laid out so that every block can be opened with np.memmap:
+#
+#   offset 0                 fixed header (HEADER_DTYPE), followed by a UTF-8 JSON
+#                            attribute object, zero padded up to header_size (4096)
+#   frames_offset            capacity * height * width uint16 frames, contiguous
+#   timestamps_offset        capacity float64 host timestamps, parallel to the frames
+#   metadata_offset          capacity records of the per-frame device metadata; the record
+#                            layout is stored in attrs["metadata_dtype"]
+#
+# ROI recordings (version 2) store only the pixels of a RoiSet for every frame, plus a full
+# keyframe every few seconds as context. Their frame block holds (roi_pixels,) uint16
+# samples instead of frames, followed by the blocks above and
+#
+#   roi_indices_offset       roi_pixels int32 flat pixel indices of the samples, in RoiSet
+#                            order; ROI names and sizes are stored in attrs["rois"]
+#   keyframe_index_offset    keyframe_capacity int64 frame index each keyframe was taken at
+#   keyframes_offset         keyframe_capacity full height * width uint16 frames
+#
+# Full frame recordings are still written as version 1, so older readers keep opening them.
+#
+# Only the first frame_count (keyframe_count) entries of each block are valid. The counts
+# are advanced after the data they cover has been written, so a file left behind by a
+# killed writer is still complete up to the last commit.
+# When a recording outgrows its capacity the blocks behind the frames are copied past the
+# end of the file and the header is switched to them in a single write; the frame block
+# then grows in place over the old copies.
+#
+RECORDING_MAGIC = b"OPTRSREC"
+RECORDING_VERSION = 2
+HEADER_SIZE = 4096
+
+HEADER_DTYPE_V1 = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("header_size", "<u4"),
+    ("width", "<u4"),
+    ("height", "<u4"),
+    ("videoformatindex", "<i4"),
+    ("attrs_size", "<u4"),
+    ("serial", "<u8"),
+    ("temperature_min", "<f8"),
+    ("temperature_max", "<f8"),
+    ("frame_count", "<u8"),
+    ("capacity", "<u8"),
+    ("frames_offset", "<u8"),
+    ("timestamps_offset", "<u8"),
+    ("metadata_offset", "<u8"),
+])
+
+HEADER_DTYPE = np.dtype(HEADER_DTYPE_V1.descr + [
+    ("roi_pixels", "<u8"),
+    ("roi_indices_offset", "<u8"),
+    ("keyframe_count", "<u8"),
+    ("keyframe_capacity", "<u8"),
+    ("keyframe_index_offset", "<u8"),
+    ("keyframes_offset", "<u8"),
+])
+
+# device metadata stored next to every frame: the device timestamp in seconds (NaN when
+# unknown), the host perf_counter time taken after the grab and the EvoIRFrameMetadata
+# counters, flag state and internal temperatures
+METADATA_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("host_time", "<f8"),
+    ("counter", "<u4"),
+    ("counter_hw", "<u4"),
+    ("flag_state", "<i4"),
+    ("temp_chip", "<f4"),
+    ("temp_flag", "<f4"),
+    ("temp_box", "<f4"),
+])
+
+# blocks behind the frame block, moved when the recording grows or is compacted
+_TRAILING_BLOCKS = ("timestamps_offset", "metadata_offset", "roi_indices_offset",
+                    "keyframe_index_offset", "keyframes_offset")
+_COPY_SIZE = 16 * 1024 * 1024
+
+
+def _header_dtype(version: int) -> np.dtype:
+    return HEADER_DTYPE_V1 if version < 2 else HEADER_DTYPE
+
+
+def _dtype_to_json(dtype: np.dtype) -> dict:
+    return {
+        "names": list(dtype.names),
+        "formats": [dtype.fields[name][0].str for name in dtype.names],
+        "offsets": [dtype.fields[name][1] for name in dtype.names],
+        "itemsize": dtype.itemsize,
+    }
+
+
+def _align(offset: int, alignment: int = 64) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+# True for native and compressed recordings, see open_recording
+def is_recording(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(RECORDING_MAGIC)) in (RECORDING_MAGIC, b"OPTRSCMP")
+
+
+#
+# Append-only writer for the recording container.
+# append() writes frames, timestamps and metadata; commit() publishes them in the header.
+# @param[in] capacity frames to preallocate; the file grows by doubling past that
+# @param[in] rois write an ROI recording: append() then takes (n, roi_pixels) samples in
+#            the order of rois.indices and append_keyframe() stores full frames
+#
+class RecordingWriter:
+    def __init__(
+        self,
+        path: str,
+        width: int,
+        height: int,
+        serial: int = 0,
+        videoformatindex: int = -1,
+        temperature_range: Tuple[float, float] = (0.0, 0.0),
+        capacity: int = 4096,
+        metadata_dtype: np.dtype = METADATA_DTYPE,
+        attrs: Optional[dict] = None,
+        rois: Optional[RoiSet] = None,
+        keyframe_capacity: int = 64,
+    ):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.version = 1 if rois is None else 2
+        self.header_dtype = _header_dtype(self.version)
+        self.roi_pixels = 0 if rois is None else len(rois.indices)
+        self.keyframe_bytes = width * height * 2
+        self.frame_bytes = self.roi_pixels * 2 if rois is not None else self.keyframe_bytes
+        self.metadata_dtype = np.dtype(metadata_dtype)
+        self.frame_count = 0
+        self.keyframe_count = 0
+        self.committed = 0
+
+        self.attrs = dict(attrs or {})
+        self.attrs["metadata_dtype"] = _dtype_to_json(self.metadata_dtype)
+        if rois is not None:
+            if rois.shape != (height, width):
+                raise ValueError(f"ROIs were made for frames of shape {rois.shape}, not {(height, width)}")
+            self.attrs["rois"] = {"names": rois.names, "sizes": rois.sizes.tolist(),
+                                  "percentiles": list(rois.percentiles)}
+        attrs_json = self._encode_attrs()
+
+        self.header = np.zeros((), dtype=self.header_dtype)
+        self.header["magic"] = RECORDING_MAGIC
+        self.header["version"] = self.version
+        self.header["header_size"] = HEADER_SIZE
+        self.header["width"] = width
+        self.header["height"] = height
+        self.header["videoformatindex"] = videoformatindex
+        self.header["attrs_size"] = len(attrs_json)
+        self.header["serial"] = serial
+        self.header["temperature_min"], self.header["temperature_max"] = temperature_range
+        if rois is not None:
+            self.header["roi_pixels"] = self.roi_pixels
+        self._set_layout(self._layout(max(capacity, 1), max(keyframe_capacity, 1)))
+
+        self.file = open(path, "wb+")
+        self.file.write(self.header.tobytes() + attrs_json)
+        self._allocate()
+        if rois is not None:
+            self._write_at(int(self.header["roi_indices_offset"]), rois.indices.astype("<i4"))
+        self.file.flush()
+
+    def __enter__(self) -> "RecordingWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def capacity(self) -> int:
+        return int(self.header["capacity"])
+
+    @property
+    def keyframe_capacity(self) -> int:
+        return int(self.header["keyframe_capacity"]) if self.version >= 2 else 0
+
+    #
+    # @brief writes frames behind the last ones; they become visible to readers on commit()
+    # @param[in] frames (n, h, w) uint16, or (n, roi_pixels) samples for ROI recordings
+    # @param[in] timestamps (n,) float64
+    # @param[in] metadata optional (n,) records of metadata_dtype
+    #
+    def append(self, frames: np.ndarray, timestamps: np.ndarray, metadata: Optional[np.ndarray] = None):
+        n = len(frames)
+        if n == 0:
+            return
+        if frames[0].nbytes != self.frame_bytes:
+            raise ValueError(f"expected {self.frame_bytes} bytes per frame, got {frames[0].nbytes}")
+        if self.frame_count + n > self.capacity:
+            self._relocate(self._layout(max(2 * self.capacity, self.frame_count + n), self.keyframe_capacity,
+                                        base=self._end()))
+        header = self.header
+        self._write_at(int(header["frames_offset"]) + self.frame_count * self.frame_bytes,
+                       np.ascontiguousarray(frames, dtype=np.uint16))
+        self._write_at(int(header["timestamps_offset"]) + self.frame_count * 8,
+                       np.ascontiguousarray(timestamps, dtype=np.float64))
+        if metadata is not None:
+            self._write_at(int(header["metadata_offset"]) + self.frame_count * self.metadata_dtype.itemsize,
+                           np.ascontiguousarray(metadata, dtype=self.metadata_dtype))
+        self.frame_count += n
+
+    #
+    # @brief stores the full frame of ROI recording frame `index` as context for the ROI samples
+    # of the frames from `index` on; published by commit() like the samples
+    #
+    def append_keyframe(self, frame: np.ndarray, index: int):
+        if self.version < 2:
+            raise ValueError("keyframes are only stored in ROI recordings")
+        if self.keyframe_count == self.keyframe_capacity:
+            self._relocate(self._layout(self.capacity, 2 * self.keyframe_capacity, base=self._end()))
+        header = self.header
+        self._write_at(int(header["keyframes_offset"]) + self.keyframe_count * self.keyframe_bytes,
+                       np.ascontiguousarray(frame, dtype=np.uint16))
+        self._write_at(int(header["keyframe_index_offset"]) + self.keyframe_count * 8,
+                       np.array([index], dtype="<i8"))
+        self.keyframe_count += 1
+
+    # @param[in] sync fsync the data before and the header after publishing the frame count
+    def commit(self, sync: bool = False):
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+        if self.version >= 2:
+            self.header["keyframe_count"] = self.keyframe_count
+            self._write_header_field("keyframe_count")
+        self.header["frame_count"] = self.frame_count
+        self._write_header_field("frame_count")
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+        self.committed = self.frame_count
+
+    # shrinks the preallocated blocks to the frames actually written and closes the file
+    def close(self, sync: bool = True):
+        if self.file.closed:
+            return
+        self.commit(sync)
+        # compact only when the shrunk blocks land in unused frame slots, never over live data
+        compact = self._layout(self.frame_count, self.keyframe_count)
+        if (self.frame_count < self.capacity or self.keyframe_count < self.keyframe_capacity) \
+                and self._end(compact) <= int(self.header["timestamps_offset"]):
+            self._relocate(compact)
+            self.file.truncate(self._end())
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+        self.file.close()
+
+    # @brief merges `attrs` into the attribute object in the header, e.g. statistics known only at the end
+    def update_attrs(self, **attrs):
+        previous = int(self.header["attrs_size"])
+        self.attrs.update(attrs)
+        attrs_json = self._encode_attrs()
+        self._write_at(self.header_dtype.itemsize, attrs_json + b"\0" * max(0, previous - len(attrs_json)))
+        self.header["attrs_size"] = len(attrs_json)
+        self._write_header_field("attrs_size")
+        self.file.flush()
+
+    def _encode_attrs(self) -> bytes:
+        attrs_json = json.dumps(self.attrs).encode()
+        if self.header_dtype.itemsize + len(attrs_json) > HEADER_SIZE:
+            raise ValueError(f"recording attributes exceed the {HEADER_SIZE} byte header")
+        return attrs_json
+
+    #
+    # block offsets for `capacity` frames and `keyframe_capacity` keyframes; the blocks behind
+    # the frame block start at `base` or later, so they can be written past the live ones
+    #
+    def _layout(self, capacity: int, keyframe_capacity: int = 0, base: int = 0) -> dict:
+        layout = {"capacity": capacity, "frames_offset": HEADER_SIZE}
+        layout["timestamps_offset"] = max(_align(HEADER_SIZE + capacity * self.frame_bytes), _align(base))
+        layout["metadata_offset"] = _align(layout["timestamps_offset"] + capacity * 8)
+        if self.version >= 2:
+            layout["keyframe_capacity"] = keyframe_capacity
+            layout["roi_indices_offset"] = _align(layout["metadata_offset"] + capacity * self.metadata_dtype.itemsize)
+            layout["keyframe_index_offset"] = _align(layout["roi_indices_offset"] + self.roi_pixels * 4)
+            layout["keyframes_offset"] = _align(layout["keyframe_index_offset"] + keyframe_capacity * 8)
+        return layout
+
+    def _set_layout(self, layout: dict):
+        for name, value in layout.items():
+            self.header[name] = value
+
+    def _end(self, layout: Optional[dict] = None) -> int:
+        layout = layout or self.header
+        if self.version >= 2:
+            return int(layout["keyframes_offset"]) + int(layout["keyframe_capacity"]) * self.keyframe_bytes
+        return int(layout["metadata_offset"]) + int(layout["capacity"]) * self.metadata_dtype.itemsize
+
+    # bytes in use in each block behind the frame block
+    def _trailing_sizes(self) -> dict:
+        sizes = {
+            "timestamps_offset": self.frame_count * 8,
+            "metadata_offset": self.frame_count * self.metadata_dtype.itemsize,
+        }
+        if self.version >= 2:
+            sizes["roi_indices_offset"] = self.roi_pixels * 4
+            sizes["keyframe_index_offset"] = self.keyframe_count * 8
+            sizes["keyframes_offset"] = self.keyframe_count * self.keyframe_bytes
+        return sizes
+
+    def _allocate(self):
+        size = self._end()
+        fd = self.file.fileno()
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+        elif os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+
+    # copies the blocks behind the frame block to `layout`, which must not overlap them
+    def _relocate(self, layout: dict):
+        header = self.header
+        old = {name: int(header[name]) for name in _TRAILING_BLOCKS if name in layout}
+        self.file.flush()
+        self._set_layout(layout)
+        if self._end() > os.fstat(self.file.fileno()).st_size:
+            self._allocate()
+        for name, size in self._trailing_sizes().items():
+            self._copy(old[name], int(header[name]), size)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        # switch readers over to the new blocks in one write
+        start = self.header_dtype.fields["capacity"][1]
+        self._write_at(start, self.header.tobytes()[start:])
+        self.file.flush()
+
+    def _copy(self, source: int, destination: int, size: int):
+        for done in range(0, size, _COPY_SIZE):
+            self.file.seek(source + done)
+            data = self.file.read(min(_COPY_SIZE, size - done))
+            self._write_at(destination + done, data)
+
+    def _write_header_field(self, name: str):
+        offset = self.header_dtype.fields[name][1]
+        self._write_at(offset, self.header[name].tobytes())
+
+    def _write_at(self, offset: int, data):
+        self.file.seek(offset)
+        self.file.write(data)
+
+
+#
+# Zero-copy reader for the recording container. frames, timestamps and metadata are
+# np.memmap views, so frame i of an hours-long recording is read in O(1) and only the
+# pages actually touched are loaded. refresh() picks up frames committed by a writer
+# that is still recording.
+# For ROI recordings `samples` maps the stored ROI pixels and `frames` reconstructs full
+# frames on access, see SparseFrames.
+#
+class RecordingReader:
+    def __init__(self, path: str):
+        self.path = path
+        self.refresh()
+
+    def __enter__(self) -> "RecordingReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def refresh(self):
+        with open(self.path, "rb") as f:
+            raw = f.read(HEADER_SIZE)
+        if raw[:len(RECORDING_MAGIC)] != RECORDING_MAGIC:
+            raise ValueError(f"{self.path} is not a pyOptris recording")
+        version = int(np.frombuffer(raw, dtype=HEADER_DTYPE_V1, count=1)[0]["version"])
+        if version > RECORDING_VERSION:
+            raise ValueError(f"{self.path} has unsupported recording version {version}")
+        header_dtype = _header_dtype(version)
+        header = np.frombuffer(raw, dtype=header_dtype, count=1)[0]
+        attrs_start = header_dtype.itemsize
+        self.header = header
+        self.attrs = json.loads(raw[attrs_start:attrs_start + int(header["attrs_size"])].decode())
+        self.metadata_dtype = np.dtype(self.attrs["metadata_dtype"])
+
+        count = int(header["frame_count"])
+        width, height = int(header["width"]), int(header["height"])
+        self.roi_pixels = int(header["roi_pixels"]) if version >= 2 else 0
+        self.timestamps = self._map(header["timestamps_offset"], np.float64, (count,))
+        self.metadata = self._map(header["metadata_offset"], self.metadata_dtype, (count,))
+        if self.roi_pixels:
+            self.samples = self._map(header["frames_offset"], np.uint16, (count, self.roi_pixels))
+            self.roi_indices = self._map(header["roi_indices_offset"], np.int32, (self.roi_pixels,))
+            keyframes = int(header["keyframe_count"])
+            self.keyframe_index = self._map(header["keyframe_index_offset"], np.int64, (keyframes,))
+            self.keyframes = self._map(header["keyframes_offset"], np.uint16, (keyframes, height, width))
+            self.frames = SparseFrames(self)
+        else:
+            self.frames = self._map(header["frames_offset"], np.uint16, (count, height, width))
+            self.samples = self.roi_indices = None
+            self.keyframe_index = np.empty(0, dtype=np.int64)
+            self.keyframes = np.empty((0, height, width), dtype=np.uint16)
+
+    def _map(self, offset, dtype, shape) -> np.ndarray:
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=int(offset), shape=shape)
+
+    def close(self):
+        self.frames = self.timestamps = self.metadata = None
+        self.samples = self.roi_indices = self.keyframe_index = self.keyframes = None
+
+    def __len__(self) -> int:
+        return int(self.header["frame_count"])
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    # @return (frame, timestamp, metadata record) of frame `index`
+    def frame(self, index: int):
+        return self.frames[index], float(self.timestamps[index]), self.metadata[index]
+
+    #
+    # @brief frame loss statistics recomputed from the per-frame device counters, see
+    # drops.FrameCounterMonitor; attrs["frame_counters"] holds the ones the recorder saw
+    #
+    def frame_drops(self, step: Optional[int] = None) -> dict:
+        return counter_stats(self.metadata["counter_hw"], step)
+
+    @property
+    def is_roi(self) -> bool:
+        return self.roi_pixels > 0
+
+    # @brief the RoiSet an ROI recording was made with, None for full frame recordings
+    def rois(self) -> Optional[RoiSet]:
+        if not self.is_roi:
+            return None
+        info = self.attrs["rois"]
+        shape = (self.height, self.width)
+        offsets = np.concatenate(([0], np.cumsum(info["sizes"])))
+        rois = [Roi(name, self.roi_indices[start:stop], shape)
+                for name, start, stop in zip(info["names"], offsets[:-1], offsets[1:])]
+        return RoiSet(shape, rois, info.get("percentiles", ()))
+
+    # @brief (height, width) mask of the pixels stored for every frame; all True for full frames
+    def roi_mask(self) -> np.ndarray:
+        mask = np.zeros(self.height * self.width, dtype=bool)
+        mask[self.roi_indices if self.is_roi else slice(None)] = True
+        return mask.reshape(self.height, self.width)
+
+    @property
+    def width(self) -> int:
+        return int(self.header["width"])
+
+    @property
+    def height(self) -> int:
+        return int(self.header["height"])
+
+    @property
+    def serial(self) -> int:
+        return int(self.header["serial"])
+
+    @property
+    def videoformatindex(self) -> int:
+        return int(self.header["videoformatindex"])
+
+    @property
+    def temperature_range(self) -> Tuple[float, float]:
+        return float(self.header["temperature_min"]), float(self.header["temperature_max"])
+
+
+#
+# Full frames of an ROI recording, rebuilt on access: the newest keyframe taken at or
+# before the frame with the frame's own ROI samples written over it. Pixels outside the
+# ROIs are therefore up to one keyframe interval old, and `fill` before the first keyframe.
+# Indexes like the frames array of a full frame recording: reader.frames[i], [a:b], [[i, j]].
+#
+class SparseFrames:
+    def __init__(self, reader: RecordingReader, fill: int = 0):
+        self.reader = reader
+        self.fill = fill
+        self.dtype = np.dtype(np.uint16)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return (len(self.reader.samples), self.reader.height, self.reader.width)
+
+    @property
+    def ndim(self) -> int:
+        return 3
+
+    def __len__(self) -> int:
+        return len(self.reader.samples)
+
+    def __getitem__(self, key) -> np.ndarray:
+        if isinstance(key, (int, np.integer)):
+            return self.reconstruct(np.array([key]))[0]
+        if isinstance(key, slice):
+            return self.reconstruct(np.arange(*key.indices(len(self))))
+        return self.reconstruct(np.asarray(key))
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        frames = self.reconstruct(np.arange(len(self)))
+        return frames if dtype is None else frames.astype(dtype)
+
+    # @brief (n, h, w) frames for the frame indices `indices`
+    def reconstruct(self, indices: np.ndarray) -> np.ndarray:
+        reader = self.reader
+        indices = np.asarray(indices, dtype=np.int64).ravel()
+        indices = np.where(indices < 0, indices + len(self), indices)
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError(f"frame index out of range for {len(self)} frames")
+        keyframe = np.searchsorted(reader.keyframe_index, indices, side="right") - 1
+        frames = np.empty((len(indices), reader.height, reader.width), dtype=np.uint16)
+        known = keyframe >= 0
+        frames[known] = reader.keyframes[keyframe[known]]
+        frames[~known] = self.fill
+        frames.reshape(len(indices), -1)[:, reader.roi_indices] = reader.samples[indices]
+        return frames
+
+
+# @brief RecordingReader, or CompressedRecordingReader for compressed recordings
+def open_recording(path: str) -> RecordingReader:
+    from .compression import CompressedRecordingReader, is_compressed_recording
+
+    if is_compressed_recording(path):
+        return CompressedRecordingReader(path)
+    return RecordingReader(path)
@@ -0,0 +1,365 @@
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .conversion import DEFAULT_DECIMALS, RAW_OFFSET
+
+#
+# Regions of interest
+# ===================
+# Every ROI is reduced once to the flat indices of its pixels in a (height, width) frame.
+# A RoiSet concatenates the indices of all its ROIs, so the statistics of every ROI in a
+# batch of frames come from a single gather over the batch followed by segmented
+# reductions (ufunc.reduceat), instead of one crop and copy per ROI and frame.
+# Statistics are computed on the raw uint16 values and converted to temperatures
+# afterwards, which is exact because the raw to temperature mapping is linear.
+#
+
+
+#
+# One region of a frame with a fixed shape.
+# @param[in] indices flat pixel indices into a (height, width) frame, sorted and unique
+#
+class Roi:
+    def __init__(self, name: str, indices: np.ndarray, shape: Tuple[int, int]):
+        indices = np.unique(np.asarray(indices, dtype=np.intp))
+        if indices.size == 0:
+            raise ValueError(f"ROI {name!r} contains no pixel of a {shape[1]}x{shape[0]} frame")
+        if indices[0] < 0 or indices[-1] >= shape[0] * shape[1]:
+            raise ValueError(f"ROI {name!r} lies outside of a {shape[1]}x{shape[0]} frame")
+        indices.flags.writeable = False
+        self.name = name
+        self.indices = indices
+        self.shape = tuple(shape)
+        rows, columns = np.divmod(indices, shape[1])
+        # (x0, y0, x1, y1), end exclusive
+        self.bbox = (int(columns.min()), int(rows.min()), int(columns.max()) + 1, int(rows.max()) + 1)
+
+    def __repr__(self) -> str:
+        return f"Roi({self.name!r}, {self.size} pixels, bbox={self.bbox})"
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def size(self) -> int:
+        return int(self.indices.size)
+
+    # @brief rectangle clipped to the frame, x/y of its top left corner
+    @classmethod
+    def rectangle(cls, name: str, x: int, y: int, width: int, height: int, shape: Tuple[int, int]) -> "Roi":
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(shape[1], x + width), min(shape[0], y + height)
+        if x0 >= x1 or y0 >= y1:
+            raise ValueError(f"ROI {name!r} contains no pixel of a {shape[1]}x{shape[0]} frame")
+        rows, columns = np.mgrid[y0:y1, x0:x1]
+        return cls(name, (rows * shape[1] + columns).ravel(), shape)
+
+    # @brief size x size square centred on a pixel, like the click crop of the viewers
+    @classmethod
+    def around(cls, name: str, x: int, y: int, size: int, shape: Tuple[int, int]) -> "Roi":
+        return cls.rectangle(name, x - size // 2, y - size // 2, size, size, shape)
+
+    # @brief pixels whose centre lies inside a polygon of (x, y) vertices (even-odd rule)
+    @classmethod
+    def polygon(cls, name: str, points: Sequence[Tuple[float, float]], shape: Tuple[int, int]) -> "Roi":
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim != 2 or points.shape[0] < 3 or points.shape[1] != 2:
+            raise ValueError(f"ROI {name!r} needs at least 3 (x, y) vertices")
+        x0 = max(0, int(np.floor(points[:, 0].min())))
+        y0 = max(0, int(np.floor(points[:, 1].min())))
+        x1 = min(shape[1], int(np.ceil(points[:, 0].max())) + 1)
+        y1 = min(shape[0], int(np.ceil(points[:, 1].max())) + 1)
+        rows, columns = np.mgrid[y0:max(y0, y1), x0:max(x0, x1)]
+        inside = np.zeros(rows.shape, dtype=bool)
+        # ray casting towards +x, one vectorised pass per edge over the bounding box
+        for (ax, ay), (bx, by) in zip(points, np.roll(points, -1, axis=0)):
+            if ay == by:
+                continue
+            crosses = (ay > rows) != (by > rows)
+            at = ax + (rows - ay) * (bx - ax) / (by - ay)
+            inside ^= crosses & (columns < at)
+        return cls(name, (rows * shape[1] + columns)[inside], shape)
+
+    # @brief pixels where a boolean (height, width) mask is set
+    @classmethod
+    def mask(cls, name: str, mask: np.ndarray) -> "Roi":
+        mask = np.asarray(mask, dtype=bool)
+        if mask.ndim != 2:
+            raise ValueError(f"mask of ROI {name!r} must be 2-D, got shape {mask.shape}")
+        return cls(name, np.flatnonzero(mask), mask.shape)
+
+    # @brief the ROI's pixels of a frame, or of every frame of an (n, h, w) stack
+    def extract(self, frames: np.ndarray) -> np.ndarray:
+        return frames.reshape(frames.shape[:-2] + (-1,))[..., self.indices]
+
+    # @brief copy of the ROI's bounding box of a frame
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        x0, y0, x1, y1 = self.bbox
+        return frame[..., y0:y1, x0:x1].copy()
+
+    # @brief (height, width) boolean mask of the ROI
+    def to_mask(self) -> np.ndarray:
+        mask = np.zeros(self.shape[0] * self.shape[1], dtype=bool)
+        mask[self.indices] = True
+        return mask.reshape(self.shape)
+
+
+#
+# The ROIs of one camera and their precomputed combined index arrays.
+# @param[in] shape (height, width) of the camera's frames
+# @param[in] percentiles percentiles computed next to min, max and mean, e.g. (50, 95)
+#
+class RoiSet:
+    def __init__(self, shape: Tuple[int, int], rois: Iterable[Roi] = (), percentiles: Sequence[float] = ()):
+        self.shape = tuple(shape)
+        self.percentiles = tuple(float(q) for q in percentiles)
+        for q in self.percentiles:
+            if not 0 <= q <= 100:
+                raise ValueError(f"percentile must be within [0, 100], got {q}")
+        self._rois: Dict[str, Roi] = {}
+        self.indices = np.empty(0, dtype=np.intp)
+        self.offsets = np.empty(0, dtype=np.intp)
+        self.sizes = np.empty(0, dtype=np.intp)
+        for roi in rois:
+            self.add(roi, rebuild=False)
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._rois)
+
+    def __iter__(self) -> Iterator[Roi]:
+        return iter(self._rois.values())
+
+    def __getitem__(self, name: str) -> Roi:
+        return self._rois[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rois
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._rois)
+
+    # names of the statistics compute() returns, in order
+    @property
+    def statistics(self) -> List[str]:
+        return ["min", "max", "mean"] + [f"p{q:g}" for q in self.percentiles]
+
+    def add(self, roi: Roi, rebuild: bool = True) -> Roi:
+        if roi.shape != self.shape:
+            raise ValueError(f"ROI {roi.name!r} was made for frames of shape {roi.shape}, not {self.shape}")
+        if roi.name in self._rois:
+            raise ValueError(f"duplicate ROI name {roi.name!r}")
+        self._rois[roi.name] = roi
+        if rebuild:
+            self._rebuild()
+        return roi
+
+    def remove(self, name: str):
+        del self._rois[name]
+        self._rebuild()
+
+    def rectangle(self, name: str, x: int, y: int, width: int, height: int) -> Roi:
+        return self.add(Roi.rectangle(name, x, y, width, height, self.shape))
+
+    def around(self, name: str, x: int, y: int, size: int) -> Roi:
+        return self.add(Roi.around(name, x, y, size, self.shape))
+
+    def polygon(self, name: str, points: Sequence[Tuple[float, float]]) -> Roi:
+        return self.add(Roi.polygon(name, points, self.shape))
+
+    def mask(self, name: str, mask: np.ndarray) -> Roi:
+        return self.add(Roi.mask(name, mask))
+
+    #
+    # @brief per-ROI statistics of a frame or an (n, h, w) stack of frames
+    # @param[in] raw keep raw units instead of converting to temperatures
+    # @param[in] decimals, offset raw format, see raw_to_temperature
+    # @return {statistic: (n, len(self)) float64 array} in ROI order, see `statistics`;
+    #         a single frame gives (len(self),) arrays
+    #
+    def compute(self, frames: np.ndarray, raw: bool = False, decimals: int = DEFAULT_DECIMALS,
+                offset: float = RAW_OFFSET) -> Dict[str, np.ndarray]:
+        if frames.shape[-2:] != self.shape:
+            raise ValueError(f"frames of shape {frames.shape[-2:]} do not match ROI shape {self.shape}")
+        if not self._rois:
+            raise ValueError("no ROI defined")
+        # the only pass over the frame data: every ROI pixel of every frame, gathered once
+        values = frames.reshape(-1, self.shape[0] * self.shape[1])[:, self.indices]
+        stats = self.reduce(values, raw, decimals, offset)
+        if frames.ndim == 2:
+            stats = {name: value[0] for name, value in stats.items()}
+        return stats
+
+    #
+    # @brief per-ROI statistics of already gathered ROI pixels
+    # @param[in] values (n, len(indices)) pixels of n frames, in the order of `indices`
+    #
+    def reduce(self, values: np.ndarray, raw: bool = False, decimals: int = DEFAULT_DECIMALS,
+               offset: float = RAW_OFFSET) -> Dict[str, np.ndarray]:
+        stats = {
+            "min": np.minimum.reduceat(values, self.offsets, axis=1).astype(np.float64),
+            "max": np.maximum.reduceat(values, self.offsets, axis=1).astype(np.float64),
+            "mean": np.add.reduceat(values, self.offsets, axis=1, dtype=np.float64) / self.sizes,
+        }
+        if self.percentiles:
+            result = np.empty((len(self.percentiles), len(values), len(self._rois)))
+            for i, (start, size) in enumerate(zip(self.offsets, self.sizes)):
+                result[:, :, i] = np.percentile(values[:, start:start + size], self.percentiles, axis=1)
+            for q, name in zip(result, self.statistics[3:]):
+                stats[name] = q
+        if not raw:
+            for value in stats.values():
+                value -= offset
+                value /= 10.0 ** decimals
+        return stats
+
+    def _rebuild(self):
+        rois = list(self._rois.values())
+        self.sizes = np.array([roi.size for roi in rois], dtype=np.intp)
+        self.offsets = np.concatenate(([0], np.cumsum(self.sizes)[:-1])).astype(np.intp) if rois else self.sizes
+        self.indices = np.concatenate([roi.indices for roi in rois]) if rois else np.empty(0, dtype=np.intp)
+
+
+#
+# Growable ROI statistics time series: one row per frame, one column per ROI.
+#
+class RoiSeries:
+    def __init__(self, names: Sequence[str], statistics: Sequence[str], capacity: int = 1024):
+        self.names = list(names)
+        self.statistics = list(statistics)
+        self.length = 0
+        self._index = np.empty(capacity, dtype=np.int64)
+        self._timestamp = np.empty(capacity, dtype=np.float64)
+        self._host_ns = np.empty(capacity, dtype=np.int64)
+        self._device_time = np.empty(capacity, dtype=np.float64)
+        self._values = {name: np.empty((capacity, len(self.names)), dtype=np.float32) for name in self.statistics}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def append(self, index: np.ndarray, timestamp: np.ndarray, stats: Dict[str, np.ndarray],
+               host_ns: Optional[np.ndarray] = None, device_time: Optional[np.ndarray] = None):
+        n = len(index)
+        with self._lock:
+            if self.length + n > len(self._index):
+                self._grow(max(2 * len(self._index), self.length + n))
+            rows = slice(self.length, self.length + n)
+            self._index[rows] = index
+            self._timestamp[rows] = timestamp
+            self._host_ns[rows] = 0 if host_ns is None else host_ns
+            self._device_time[rows] = np.nan if device_time is None else device_time
+            for name in self.statistics:
+                self._values[name][rows] = stats[name]
+            self.length += n
+
+    #
+    # @brief copy of the series
+    # @return {"index", "timestamp", "host_ns", "device_time": (n,) arrays,
+    #          statistic: (n, len(names)) float32 array}
+    #
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        with self._lock:
+            n = self.length
+            series = {
+                "index": self._index[:n].copy(),
+                "timestamp": self._timestamp[:n].copy(),
+                "host_ns": self._host_ns[:n].copy(),
+                "device_time": self._device_time[:n].copy(),
+            }
+            for name in self.statistics:
+                series[name] = self._values[name][:n].copy()
+        return series
+
+    # @brief time series of one ROI: {"index", "timestamp", statistic: (n,) array}
+    def roi(self, name: str) -> Dict[str, np.ndarray]:
+        column = self.names.index(name)
+        with self._lock:
+            n = self.length
+            series = {"index": self._index[:n].copy(), "timestamp": self._timestamp[:n].copy()}
+            for statistic in self.statistics:
+                series[statistic] = self._values[statistic][:n, column].copy()
+        return series
+
+    # @brief saves the series to an .npz file, ROI names under "names"
+    def save(self, path: str):
+        np.savez(path, names=np.array(self.names), **self.to_dict())
+
+    def _grow(self, capacity: int):
+        for attr in ("_index", "_timestamp", "_host_ns", "_device_time"):
+            old = getattr(self, attr)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.length] = old[:self.length]
+            setattr(self, attr, new)
+        for name, old in self._values.items():
+            new = np.empty((capacity, old.shape[1]), dtype=old.dtype)
+            new[:self.length] = old[:self.length]
+            self._values[name] = new
+
+
+#
+# Computes ROI statistics for every frame of an Acquisition from its own thread, woken by
+# the acquisition after every frame, and appends them to a RoiSeries. Frames are taken
+# from the ring buffer in batches, so at high frame rates one vectorised pass covers many
+# frames, and only the ROI pixels are ever copied out of the ring; frames the monitor
+# could not keep up with are counted in `dropped`.
+# @param[in] decimals, offset raw format, see raw_to_temperature
+#
+class RoiMonitor:
+    def __init__(self, acquisition, rois: RoiSet, decimals: int = DEFAULT_DECIMALS, offset: float = RAW_OFFSET):
+        if acquisition.ring.frames.shape[1:] != rois.shape:
+            raise ValueError(f"ROIs were made for frames of shape {rois.shape}, "
+                             f"the camera delivers {acquisition.ring.frames.shape[1:]}")
+        self.acquisition = acquisition
+        self.rois = rois
+        self.decimals = decimals
+        self.offset = offset
+        self.series = RoiSeries(rois.names, rois.statistics)
+        self._latest: Optional[Dict[str, np.ndarray]] = None
+        self._new_frame = threading.Event()
+        self._reader = None
+        self._running = False
+        self._thread = None
+
+    @property
+    def dropped(self) -> int:
+        return self._reader.dropped if self._reader is not None else 0
+
+    def start(self) -> "RoiMonitor":
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._reader = self.acquisition.reader()
+        self.acquisition.add_listener(self._new_frame.set)
+        self._thread = threading.Thread(target=self._run, name=f"roi {self.acquisition.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._new_frame.set()
+        self.acquisition.remove_listener(self._new_frame.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # @brief statistics of the newest frame, {statistic: (len(rois),) array} or None
+    def latest(self) -> Optional[Dict[str, np.ndarray]]:
+        return self._latest
+
+    def _run(self):
+        capacity = self.acquisition.ring.capacity
+        while self._running:
+            self._new_frame.wait(0.1)
+            self._new_frame.clear()
+            values, timestamps, host_ns, device_times, _ = self._reader.read_stamped(capacity, self.rois.indices)
+            if len(values) == 0:
+                continue
+            stats = self.rois.reduce(values, decimals=self.decimals, offset=self.offset)
+            start = self._reader.position - len(values)
+            index = np.arange(start, start + len(values))
+            self.series.append(index, timestamps, stats, host_ns, device_times)
+            self._latest = {name: value[-1].copy() for name, value in stats.items()}
@@ -0,0 +1,60 @@
+import sys
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+#
+# A NumPy array in a named multiprocessing.shared_memory segment. The creating process
+# owns the segment and unlinks it; other processes attach by name with attach(), which
+# never unlinks, so a consumer exiting does not pull the segment from under the others.
+# spec() is the small picklable description other processes need to attach.
+#
+class SharedArray:
+    def __init__(self, shape: Tuple[int, ...], dtype=np.uint16, name: Optional[str] = None):
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.owner = True
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def attach(cls, name: str, shape: Tuple[int, ...], dtype=np.uint16) -> "SharedArray":
+        self = cls.__new__(cls)
+        self.shm = attach_segment(name)
+        self.owner = False
+        self.array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.shm.buf)
+        return self
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def spec(self) -> Tuple[str, Tuple[int, ...], str]:
+        return self.shm.name, self.array.shape, self.array.dtype.str
+
+    # releases this process' mapping, and the segment itself when this process created it
+    def close(self):
+        if self.shm is None:
+            return
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+
+# attaches to an existing segment without registering it with the resource tracker,
+# which would otherwise unlink it when this process exits (Python < 3.13)
+def attach_segment(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    from multiprocessing import resource_tracker
+
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
@@ -0,0 +1,433 @@
+import ctypes
+import itertools
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .direct_binding import TIMESTAMP_UNITS, EvoIRFrameMetadata
+from .formats import load_formats
+
+#
+# Pure NumPy stand-in for libirimager. SimulatedIRImager exposes the same evo_irimager_*
+# functions the ctypes library does, taking the same ctypes arguments, so every wrapper in
+# direct_binding works unchanged once it is installed with direct_binding.set_backend() or
+# direct_binding.use_simulator(). Cameras either synthesise frames at a given resolution
+# and rate or replay a recording with its original timing.
+#
+
+# names of the formats in Formats.def used by our cameras; size and rate come from the file
+SIMULATED_FORMATS = (
+    "PI1M 72x56 @ 1000Hz",
+    "PI1M 764x8 @ 1000Hz flex",
+    "PI1M 382x288 @ 80Hz",
+    "PI1M 766x480 @ 32Hz",
+    "PI640 640x120 @ 125Hz flex",
+    "PI600 640x480 @ 32Hz",
+)
+DEFAULT_FORMAT = "PI1M 72x56 @ 1000Hz"
+
+
+# @brief (width, height, frame rate) of a format in Formats.def, see formats.load_formats
+def simulated_format(name: str, formats_def: Optional[str] = None) -> Tuple[int, int, float]:
+    format = load_formats(formats_def).find(name)
+    return format.width, format.height, format.rate
+
+
+def _deref(arg):
+    # byref() objects keep the referenced ctypes instance in _obj, pointer() in contents
+    if hasattr(arg, "_obj"):
+        return arg._obj
+    if hasattr(arg, "contents"):
+        return arg.contents
+    return arg
+
+
+def _value(arg) -> int:
+    arg = _deref(arg)
+    return getattr(arg, "value", arg)
+
+
+def _address(arg) -> int:
+    if isinstance(arg, int):
+        return arg
+    if isinstance(arg, ctypes.c_void_p):
+        return arg.value
+    if isinstance(arg, ctypes._Pointer):
+        return ctypes.cast(arg, ctypes.c_void_p).value
+    return ctypes.addressof(_deref(arg))
+
+
+def _palette_lut() -> np.ndarray:
+    # iron-like ramp: black, purple, red, yellow, white
+    ramp = np.linspace(0.0, 1.0, 256)
+    red = np.clip(ramp * 2.0, 0, 1)
+    green = np.clip(ramp * 2.0 - 0.7, 0, 1)
+    blue = np.clip(np.where(ramp < 0.35, ramp * 2.0, 0.7 - ramp) + np.clip(ramp * 3 - 2, 0, 1), 0, 1)
+    return (np.stack([red, green, blue], axis=1) * 255).astype(np.uint8)
+
+
+_PALETTE = _palette_lut()
+
+
+def _read_config(xml_config: Optional[str]) -> dict:
+    config = {}
+    if not xml_config:
+        return config
+    try:
+        root = ET.parse(xml_config).getroot()
+    except (OSError, ET.ParseError):
+        return config
+    for key in ("serial", "videoformatindex", "framerate"):
+        node = root.find(key)
+        if node is not None and node.text and node.text.strip():
+            config[key] = float(node.text) if key == "framerate" else int(node.text)
+    low, high = root.find("temperature/min"), root.find("temperature/max")
+    if low is not None and high is not None:
+        config["temperature_range"] = (float(low.text), float(high.text))
+    return config
+
+
+#
+# One simulated camera. Frames are due at fixed offsets from the moment the first one is
+# requested; a caller that falls further behind than `queue_size` frames loses the oldest
+# ones, like the SDK's internal buffer queue, and the frame counter jumps accordingly.
+# @param[in] frames optional (N, h, w) uint16 frames to replay instead of synthetic ones
+# @param[in] timestamps optional (N,) seconds of the replayed frames, defines their timing
+#            unless they are all equal, then `frame_rate` does
+# @param[in] realtime deliver frames at their due time; False delivers as fast as asked
+# @param[in] clock_drift_ppm rate error of the device clock reported in the frame metadata
+#
+class SimulatedCamera:
+    def __init__(
+        self,
+        width: int = 72,
+        height: int = 56,
+        frame_rate: float = 1000.0,
+        serial: int = 0,
+        temperature_range: Tuple[float, float] = (600.0, 1800.0),
+        frames: Optional[np.ndarray] = None,
+        timestamps: Optional[np.ndarray] = None,
+        realtime: bool = True,
+        loop: bool = True,
+        queue_size: int = 5,
+        pattern_frames: int = 16,
+        seed: int = 0,
+        clock_drift_ppm: float = 0.0,
+    ):
+        self.serial = serial
+        self.clock_drift_ppm = clock_drift_ppm
+        # chip, flag and housing temperatures reported in the frame metadata
+        self.housing_temperatures = (38.0, 33.0, 35.0)
+        self.temperature_range = temperature_range
+        self.realtime = realtime
+        self.loop = loop
+        self.queue_size = queue_size
+        if frames is None:
+            frames = self._synthesise(width, height, temperature_range, pattern_frames, seed)
+            timestamps = np.arange(len(frames)) / frame_rate
+        elif timestamps is None:
+            timestamps = np.arange(len(frames)) / frame_rate
+        else:
+            timestamps = np.asarray(timestamps, dtype=np.float64)
+            if len(timestamps) > 1 and timestamps[-1] > timestamps[0]:
+                frame_rate = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+            else:
+                # constant timestamps carry no timing, replay at frame_rate
+                timestamps = np.arange(len(frames)) / frame_rate
+        self.frames = frames
+        self.height, self.width = frames.shape[1:3]
+        self.frame_rate = frame_rate
+        self.offsets = np.asarray(timestamps, dtype=np.float64) - timestamps[0]
+        self.cycle = self.offsets[-1] + 1.0 / frame_rate
+        self.frame_count = 0
+        self._start = None
+        self._index = -1
+
+    @classmethod
+    def from_recording(cls, recording, **kwargs) -> "SimulatedCamera":
+        from .recording import RecordingReader
+
+        if isinstance(recording, str):
+            recording = RecordingReader(recording)
+        kwargs.setdefault("serial", recording.serial)
+        kwargs.setdefault("temperature_range", recording.temperature_range)
+        return cls(frames=recording.frames, timestamps=recording.timestamps, **kwargs)
+
+    @staticmethod
+    def _synthesise(width, height, temperature_range, count, seed) -> np.ndarray:
+        low, high = (t * 10.0 + 1000.0 for t in temperature_range)
+        rng = np.random.default_rng(seed)
+        y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+        background = low + (high - low) * (0.1 + 0.1 * x / max(width - 1, 1))
+        sigma = max(min(width, height) / 6.0, 1.0)
+        frames = np.empty((count, height, width), dtype=np.uint16)
+        for i in range(count):
+            angle = 2 * np.pi * i / count
+            cx = width / 2 + width / 4 * np.cos(angle)
+            cy = height / 2 + height / 4 * np.sin(angle)
+            blob = (high - low) * 0.7 * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * sigma ** 2))
+            noise = rng.normal(0.0, 3.0, size=(height, width))
+            frames[i] = np.clip(background + blob + noise, 0, 65535)
+        return frames
+
+    def set_frame_rate(self, frame_rate: float):
+        # only ever scales the stream down, like <framerate> in the XML config
+        if frame_rate and frame_rate < self.frame_rate:
+            self.offsets = self.offsets * (self.frame_rate / frame_rate)
+            self.cycle = self.cycle * (self.frame_rate / frame_rate)
+            self.frame_rate = frame_rate
+
+    def _due(self, index: int) -> float:
+        cycles, position = divmod(index, len(self.offsets))
+        return cycles * self.cycle + self.offsets[position]
+
+    def _newest(self, elapsed: float) -> int:
+        cycles, within = divmod(elapsed, self.cycle)
+        return int(cycles) * len(self.offsets) + int(np.searchsorted(self.offsets, within, "right")) - 1
+
+    # @return device frame index of the next frame to deliver, -1 once a replay has ended
+    def next_index(self) -> int:
+        if self._start is None:
+            self._start = time.perf_counter()
+        index = self._index + 1
+        if not self.loop and index >= len(self.frames):
+            return -1
+        if self.realtime:
+            now = time.perf_counter()
+            due = self._start + self._due(index)
+            if due > now:
+                time.sleep(due - now)
+            else:
+                newest = self._newest(now - self._start)
+                if newest - index >= self.queue_size:
+                    index = newest - self.queue_size + 1
+        if not self.loop and index >= len(self.frames):
+            return -1
+        self._index = index
+        self.frame_count += 1
+        return index
+
+    def frame(self, index: int) -> np.ndarray:
+        return self.frames[index % len(self.frames)]
+
+    # device clock time of frame `index`, in seconds
+    def timestamp(self, index: int) -> float:
+        return self._due(index) * (1.0 + self.clock_drift_ppm * 1e-6)
+
+    def read_thermal(self, address: int) -> int:
+        index = self.next_index()
+        if index < 0:
+            return -1
+        frame = np.ascontiguousarray(self.frame(index))
+        ctypes.memmove(address, frame.ctypes.data, frame.nbytes)
+        return index
+
+    def read_palette(self, address: int, width: int, height: int) -> int:
+        index = self.next_index()
+        if index < 0:
+            return -1
+        self.render_palette(self.frame(index), address, width, height)
+        return index
+
+    @staticmethod
+    def render_palette(frame: np.ndarray, address: int, width: int, height: int):
+        low, high = frame.min(), frame.max()
+        scaled = (frame.astype(np.float32) - low) * (255.0 / max(high - low, 1))
+        rgb = _PALETTE[scaled.astype(np.uint8)][:height, :width]
+        out = np.ctypeslib.as_array(ctypes.cast(address, ctypes.POINTER(ctypes.c_ubyte)), shape=(height, width, 3))
+        out[:rgb.shape[0], :rgb.shape[1]] = rgb
+
+
+#
+# Simulated libirimager. usb_init / multi_usb_init pick the camera registered for the
+# <serial> of the XML config, or create one with `default_format`.
+# @param[in] video_formats optional {videoformatindex: format name in Formats.def}; a config
+#            selecting one of them (re)creates the camera in that format
+#
+class SimulatedIRImager:
+    def __init__(
+        self,
+        cameras: Optional[Dict[int, SimulatedCamera]] = None,
+        default_format: str = DEFAULT_FORMAT,
+        realtime: bool = True,
+        video_formats: Optional[Dict[int, str]] = None,
+    ):
+        self.cameras = dict(cameras or {})
+        self.default_format = default_format
+        self.video_formats = dict(video_formats or {})
+        self.realtime = realtime
+        self.devices: Dict[int, SimulatedCamera] = {}
+        self.palette = 6
+        self.palette_scale = 2
+        self.shutter_mode = 1
+        self.focus_position = -1.0
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def add_camera(self, camera: SimulatedCamera) -> SimulatedCamera:
+        self.cameras[camera.serial] = camera
+        return camera
+
+    def _open(self, xml_config: Optional[bytes]) -> SimulatedCamera:
+        config = _read_config(xml_config.decode() if xml_config else None)
+        serial = config.get("serial", 0)
+        camera = self.cameras.get(serial)
+        format = self.video_formats.get(config.get("videoformatindex"))
+        if format is not None and camera is not None and \
+                (camera.width, camera.height) != simulated_format(format)[:2]:
+            camera = None
+        if camera is None:
+            width, height, frame_rate = simulated_format(format or self.default_format)
+            camera = SimulatedCamera(
+                width, height, frame_rate, serial=serial, realtime=self.realtime,
+                temperature_range=config.get("temperature_range", (600.0, 1800.0)),
+            )
+            self.cameras[serial] = camera
+        camera.set_frame_rate(config.get("framerate"))
+        return camera
+
+    def _device(self, id) -> Optional[SimulatedCamera]:
+        return self.devices.get(_value(id))
+
+    def evo_irimager_usb_init(self, xml_config, formats_def, log_file) -> int:
+        with self._lock:
+            self.devices[0] = self._open(xml_config)
+        return 0
+
+    def evo_irimager_multi_usb_init(self, id_ptr, xml_config, formats_def, log_file) -> int:
+        with self._lock:
+            id = next(self._ids)
+            self.devices[id] = self._open(xml_config)
+        _deref(id_ptr).value = id
+        return 0
+
+    def evo_irimager_tcp_init(self, ip, port) -> int:
+        return -1
+
+    def evo_irimager_terminate(self, *args) -> int:
+        with self._lock:
+            self.devices.clear()
+        return 0
+
+    def _size(self, camera, w, h) -> int:
+        if camera is None:
+            return -1
+        _deref(w).value = camera.width
+        _deref(h).value = camera.height
+        return 0
+
+    def evo_irimager_get_thermal_image_size(self, w, h) -> int:
+        return self._size(self._device(0), w, h)
+
+    def evo_irimager_get_palette_image_size(self, w, h) -> int:
+        return self._size(self._device(0), w, h)
+
+    def evo_irimager_multi_get_thermal_image_size(self, id, w, h) -> int:
+        return self._size(self._device(id), w, h)
+
+    def evo_irimager_multi_get_palette_image_size(self, id, w, h) -> int:
+        return self._size(self._device(id), w, h)
+
+    def _thermal(self, camera, w, h, data) -> int:
+        if camera is None or (_value(w), _value(h)) != (camera.width, camera.height):
+            return -1
+        return 0 if camera.read_thermal(_address(data)) >= 0 else -1
+
+    def _palette(self, camera, w, h, data) -> int:
+        if camera is None:
+            return -1
+        return 0 if camera.read_palette(_address(data), _value(w), _value(h)) >= 0 else -1
+
+    def evo_irimager_get_thermal_image(self, w, h, data) -> int:
+        return self._thermal(self._device(0), w, h, data)
+
+    def evo_irimager_multi_get_thermal_image(self, id, w, h, data) -> int:
+        return self._thermal(self._device(id), w, h, data)
+
+    def evo_irimager_get_palette_image(self, w, h, data) -> int:
+        return self._palette(self._device(0), w, h, data)
+
+    def evo_irimager_multi_get_palette_image(self, id, w, h, data) -> int:
+        return self._palette(self._device(id), w, h, data)
+
+    def evo_irimager_get_thermal_palette_image(self, w_t, h_t, data_t, w_p, h_p, data_p) -> int:
+        camera = self._device(0)
+        if self._thermal(camera, w_t, h_t, data_t) != 0:
+            return -1
+        frame = camera.frame(camera._index)
+        camera.render_palette(frame, _address(data_p), _value(w_p), _value(h_p))
+        return 0
+
+    def evo_irimager_multi_get_serial(self, id, serial) -> int:
+        camera = self._device(id)
+        if camera is None:
+            return -1
+        _deref(serial).value = camera.serial
+        return 0
+
+    def _metadata(self, camera, address: int):
+        metadata = EvoIRFrameMetadata.from_address(address)
+        metadata.counter = camera.frame_count
+        metadata.counterHW = camera._index & 0xFFFFFFFF
+        metadata.timestamp = metadata.timestampMedia = int(round(camera.timestamp(camera._index) * TIMESTAMP_UNITS))
+        metadata.flagState = 0
+        metadata.tempChip, metadata.tempFlag, metadata.tempBox = camera.housing_temperatures
+
+    def evo_irimager_get_thermal_image_metadata(self, w, h, data, metadata) -> int:
+        camera = self._device(0)
+        if self._thermal(camera, w, h, data) != 0:
+            return -1
+        self._metadata(camera, _address(metadata))
+        return 0
+
+    def evo_irimager_multi_get_thermal_image_metadata(self, id, w, h, data, metadata) -> int:
+        camera = self._device(id)
+        if self._thermal(camera, w, h, data) != 0:
+            return -1
+        self._metadata(camera, _address(metadata))
+        return 0
+
+    def evo_irimager_set_palette(self, id) -> int:
+        self.palette = id
+        return 0
+
+    def evo_irimager_set_palette_scale(self, scale) -> int:
+        self.palette_scale = scale
+        return 0
+
+    def evo_irimager_set_shutter_mode(self, mode) -> int:
+        self.shutter_mode = mode
+        return 0
+
+    def evo_irimager_trigger_shutter_flag(self, *args) -> int:
+        return 0
+
+    def evo_irimager_set_temperature_range(self, t_min, t_max) -> int:
+        camera = self._device(0)
+        if camera is None:
+            return -1
+        camera.temperature_range = (float(t_min), float(t_max))
+        return 0
+
+    def evo_irimager_set_radiation_parameters(self, emissivity, transmissivity, ambient) -> int:
+        return 0
+
+    def evo_irimager_set_focusmotor_pos(self, position) -> int:
+        self.focus_position = float(_value(position))
+        return 0
+
+    def evo_irimager_get_focusmotor_pos(self, position) -> int:
+        _deref(position).value = self.focus_position
+        return 0
+
+    def evo_irimager_daemon_launch(self, *args) -> int:
+        return -1
+
+    def evo_irimager_daemon_is_running(self, *args) -> int:
+        return -1
+
+    def evo_irimager_daemon_kill(self, *args) -> int:
+        return -1
@@ -0,0 +1,166 @@
+import asyncio
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from .acquisition import Acquisition
+
+STREAM_POLICIES = ("drop_oldest", "wait")
+
+
+#
+# One frame delivered by a FrameStream.
+# index: frame index in the acquisition ring
+# timestamp: wall clock time.time() of the grab
+# host_time: time.perf_counter() of the grab, in seconds
+# device_time: device timestamp in seconds, NaN without device metadata
+# metadata: EvoIRFrameMetadata record (FRAME_METADATA_DTYPE)
+#
+class Frame(NamedTuple):
+    index: int
+    frame: np.ndarray
+    timestamp: float
+    host_time: float
+    device_time: float
+    metadata: np.void
+
+
+#
+# Asynchronous iterator over the frames of a running Acquisition:
+#
+#   async with camera.frames() as frames:
+#       async for frame in frames:
+#           ...
+#
+# The acquisition thread stays the only thread touching the device. After each frame it
+# schedules at most one pending wake-up on the event loop, which drains the ring into a
+# bounded asyncio.Queue, so any number of streams on one loop cost no extra threads.
+# @param[in] max_queue frames buffered between the ring and the consumer
+# @param[in] policy "drop_oldest" keeps the newest max_queue frames when the consumer falls
+#            behind; "wait" stops draining until the consumer catches up, leaving the frames
+#            in the ring, where they are lost only once the ring wraps (see `dropped`)
+# @param[in] from_start also deliver the frames already in the ring
+#
+class FrameStream:
+    def __init__(
+        self,
+        acquisition: Acquisition,
+        max_queue: int = 8,
+        policy: str = "drop_oldest",
+        from_start: bool = False,
+    ):
+        if policy not in STREAM_POLICIES:
+            raise ValueError(f"policy must be one of {STREAM_POLICIES}, got {policy!r}")
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1")
+        self.acquisition = acquisition
+        self.max_queue = max_queue
+        self.policy = policy
+        self.from_start = from_start
+        self.delivered = 0
+        self.queue_dropped = 0
+        self._reader = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop = None
+        self._pending = False
+        self._closed = False
+        self._ended = False
+
+    # frames lost either in the queue (drop_oldest) or in the ring (consumer too slow)
+    @property
+    def dropped(self) -> int:
+        return self.queue_dropped + (self._reader.dropped if self._reader is not None else 0)
+
+    async def __aenter__(self) -> "FrameStream":
+        self._open()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def __aiter__(self) -> "FrameStream":
+        return self
+
+    async def __anext__(self) -> Frame:
+        if self._queue is None:
+            self._open()
+        if self._closed and self._queue.empty():
+            raise StopAsyncIteration
+        frame = await self._queue.get()
+        if frame is None:
+            self.close()
+            raise StopAsyncIteration
+        self.delivered += 1
+        # the queue has room again; the end of the stream is also only queued when it fits
+        if self.policy == "wait" or self._ended_pending():
+            self._drain()
+        return frame
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.acquisition.remove_listener(self._notify)
+        if self._queue is not None and self._queue.empty():
+            self._queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "delivered": self.delivered,
+            "queue_dropped": self.queue_dropped,
+            "ring_dropped": self._reader.dropped if self._reader is not None else 0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    def _open(self):
+        if self._queue is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.max_queue)
+        self._reader = self.acquisition.reader(self.from_start)
+        self.acquisition.add_listener(self._notify)
+        self._drain()
+
+    # acquisition thread: coalesce wake-ups, at most one is ever scheduled
+    def _notify(self):
+        if not self._pending:
+            self._pending = True
+            try:
+                self._loop.call_soon_threadsafe(self._drain)
+            except RuntimeError:
+                # event loop already closed
+                pass
+
+    # event loop: move published frames from the ring into the queue
+    def _drain(self):
+        self._pending = False
+        if self._closed:
+            return
+        queue = self._queue
+        if self.policy == "wait":
+            room = self.max_queue - queue.qsize()
+            if room <= 0:
+                return
+            batch = self._reader.read_stamped(room)
+        else:
+            # only the newest max_queue frames can survive, skip the rest without copying them
+            backlog = self._reader.available() - self.max_queue
+            if backlog > 0:
+                self._reader.position += backlog
+                self.queue_dropped += backlog
+            batch = self._reader.read_stamped(self.max_queue)
+        start = self._reader.position - len(batch[0])
+        for i, (frame, timestamp, host_ns, device_time, metadata) in enumerate(zip(*batch)):
+            if queue.full():
+                queue.get_nowait()
+                self.queue_dropped += 1
+            queue.put_nowait(Frame(start + i, frame, float(timestamp), host_ns * 1e-9, float(device_time), metadata))
+        if self._ended_pending() and not queue.full():
+            self._ended = True
+            self.acquisition.remove_listener(self._notify)
+            queue.put_nowait(None)
+
+    # the acquisition has stopped and every frame it published has been queued; `finished`
+    # is set before the acquisition's last listener call, unlike is_running()
+    def _ended_pending(self) -> bool:
+        return not self._ended and self.acquisition.finished and not self._reader.available()
@@ -0,0 +1,244 @@
+import time
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+
+#
+# Maps device timestamps to the host perf_counter clock for one camera.
+# Host stamps are taken after the blocking grab returns, so they are the true capture time
+# plus a positive, jittery delay (USB transfer, GIL, Tk updates). The device clock is
+# steady but runs at its own rate and from its own origin. The model is
+#   host = host_ref + (1 + drift) * (device - device_ref)
+# where drift is a least squares fit over every frame seen so far and the offset follows
+# the lower envelope of the residuals, i.e. the least delayed frames. The fit is kept as
+# running centred sums, so each update() only folds in frames newer than the last one it
+# saw: a window of a second gives a jitter-dominated slope on its own, the accumulated
+# history does not. Older frames are forgotten with the given half-life (device seconds)
+# so the model follows slow drift changes, e.g. as the camera warms up.
+# @param[in] min_samples number of frames needed before the model is used
+# @param[in] halflife device seconds after which a frame counts half, None to never forget
+#
+class ClockModel:
+    def __init__(self, min_samples: int = 16, halflife: Optional[float] = 600.0):
+        if halflife is not None and halflife <= 0:
+            raise ValueError("halflife must be positive")
+        self.min_samples = min_samples
+        self.halflife = halflife
+        self.device_ref = 0.0
+        self.host_ref = 0.0
+        self.drift = 0.0
+        self.jitter = 0.0
+        self.samples = 0
+        self.updated_at = 0.0
+        # running fit relative to the first frame: weight, means and centred sums of x, y
+        self._origin = None
+        self._last = -np.inf
+        self._weight = 0.0
+        self._mean = np.zeros(2)
+        self._xx = 0.0
+        self._xy = 0.0
+        # lower envelope of the residuals and their variance, averaged over updates
+        self._floor = 0.0
+        self._variance = 0.0
+
+    def __repr__(self) -> str:
+        return f"ClockModel(drift={self.drift_ppm:.1f} ppm, jitter={self.jitter * 1e3:.3f} ms, samples={self.samples})"
+
+    @property
+    def fitted(self) -> bool:
+        return self.samples >= self.min_samples
+
+    @property
+    def drift_ppm(self) -> float:
+        return self.drift * 1e6
+
+    #
+    # @brief folds matching device and host timestamps, in seconds, into the fit
+    # @param[in] device device timestamps; NaN entries (frames without metadata) and frames
+    #            not newer than the last update are ignored, so overlapping windows are fine
+    # @param[in] host host perf_counter timestamps of the same frames
+    # @return True if the model is fitted
+    #
+    def update(self, device: np.ndarray, host: np.ndarray) -> bool:
+        valid = device > self._last  # also drops NaN
+        device = device[valid]
+        host = host[valid]
+        if len(device) == 0:
+            return self.fitted
+        if self._origin is None:
+            self._origin = (float(device[0]), float(host[0]))
+        x = device - self._origin[0]
+        y = host - self._origin[1]
+        if self.halflife is not None and self._weight > 0.0:
+            decay = 0.5 ** ((x[-1] - (self._last - self._origin[0])) / self.halflife)
+            self._weight *= decay
+            self._xx *= decay
+            self._xy *= decay
+        self._last = float(device[-1])
+
+        # merge the batch's centred sums into the running ones (Chan et al.)
+        n = len(x)
+        mean = np.array([x.mean(), y.mean()])
+        dx = x - mean[0]
+        delta = mean - self._mean
+        weight = self._weight + n
+        share = n / weight
+        self._xx += np.dot(dx, dx) + delta[0] * delta[0] * self._weight * share
+        self._xy += np.dot(dx, y - mean[1]) + delta[0] * delta[1] * self._weight * share
+        self._mean += delta * share
+        self._weight = weight
+        self.samples += n
+        if self.samples < self.min_samples or self._xx <= 0.0:
+            return self.fitted
+
+        slope = self._xy / self._xx
+        residuals = y - self._mean[1] - slope * (x - self._mean[0])
+        if self.updated_at:
+            self._floor += share * (residuals.min() - self._floor)
+            self._variance += share * (np.dot(residuals, residuals) / n - self._variance)
+        else:
+            self._floor = float(residuals.min())
+            self._variance = float(np.dot(residuals, residuals) / n)
+        self.device_ref = self._origin[0] + float(self._mean[0])
+        self.host_ref = self._origin[1] + float(self._mean[1] + self._floor)
+        self.drift = float(slope - 1.0)
+        self.jitter = float(np.sqrt(self._variance))
+        self.updated_at = time.perf_counter()
+        return True
+
+    # device seconds to host perf_counter seconds
+    def to_host(self, device):
+        return self.host_ref + (1.0 + self.drift) * (np.asarray(device) - self.device_ref)
+
+    # host perf_counter seconds to device seconds
+    def to_device(self, host):
+        return self.device_ref + (np.asarray(host) - self.host_ref) / (1.0 + self.drift)
+
+
+#
+# One reference frame and the nearest frame of every other camera.
+# time: aligned host time of the reference frame (perf_counter seconds)
+# indices: frame index in each camera's ring, reference first in acquisition order
+# frames: copies of those frames
+# deltas: aligned time of each frame minus `time`, in seconds
+#
+class SyncedFrames(NamedTuple):
+    time: float
+    indices: List[int]
+    frames: List[np.ndarray]
+    deltas: List[float]
+
+
+#
+# Pairs frames across cameras running at different rates, e.g. a PI 1M at 1000 Hz and a
+# PI 640i at 32 Hz. Every frame of the reference camera (normally the slowest) is matched
+# with the frame of each other camera closest to it on the common host timeline given by
+# the cameras' ClockModels. A reference frame is only emitted once every other camera has
+# delivered a frame past it, so the nearest match is final.
+# @param[in] acquisitions running Acquisitions, ideally started with metadata=True
+# @param[in] reference index of the reference camera in `acquisitions`
+# @param[in] tolerance maximum |delta| in seconds; worse matches are counted in `unmatched`
+# @param[in] refit_interval seconds between clock model refits
+#
+class FrameSynchroniser:
+    def __init__(
+        self,
+        acquisitions: Sequence,
+        reference: int = 0,
+        tolerance: Optional[float] = None,
+        refit_interval: float = 1.0,
+    ):
+        if len(acquisitions) < 2:
+            raise ValueError("synchronisation needs at least two cameras")
+        self.acquisitions = list(acquisitions)
+        self.reference = reference
+        self.tolerance = tolerance
+        self.refit_interval = refit_interval
+        self.position = self.acquisitions[reference].ring.count
+        self.emitted = 0
+        self.unmatched = 0
+        self.dropped = 0
+        self._refit_at = 0.0
+
+    def refit(self):
+        for acquisition in self.acquisitions:
+            acquisition.update_clock()
+        self._refit_at = time.perf_counter() + self.refit_interval
+
+    #
+    # @brief matches every reference frame published since the last call
+    # @param[in] copy copy the frames out of the rings; False returns no frames, only indices
+    # @return list of SyncedFrames in capture order
+    #
+    def poll(self, copy: bool = True) -> List[SyncedFrames]:
+        if time.perf_counter() >= self._refit_at:
+            self.refit()
+        reference = self.acquisitions[self.reference]
+        ring = reference.ring
+        count = ring.count
+        oldest = ring.oldest(count)
+        if self.position < oldest:
+            self.dropped += oldest - self.position
+            self.position = oldest
+        if self.position >= count:
+            return []
+        times = reference.aligned_times(self.position, count)
+
+        # aligned times of the frames each other camera still holds
+        windows = []
+        ready = len(times)
+        for i, acquisition in enumerate(self.acquisitions):
+            if i == self.reference:
+                windows.append(None)
+                continue
+            other = acquisition.ring.count
+            start = acquisition.ring.oldest(other)
+            if other <= start:
+                return []
+            other_times = acquisition.aligned_times(start, other)
+            windows.append((start, other_times))
+            # only reference frames strictly older than this camera's newest frame are final
+            ready = min(ready, int(np.searchsorted(times, other_times[-1])))
+
+        results = []
+        for k in range(ready):
+            t = float(times[k])
+            indices, deltas = [], []
+            for i, window in enumerate(windows):
+                if window is None:
+                    indices.append(self.position + k)
+                    deltas.append(0.0)
+                    continue
+                start, other_times = window
+                j = int(np.searchsorted(other_times, t))
+                if j == len(other_times) or (j > 0 and t - other_times[j - 1] <= other_times[j] - t):
+                    j -= 1
+                indices.append(start + j)
+                deltas.append(float(other_times[j] - t))
+            if self.tolerance is not None and max(abs(d) for d in deltas) > self.tolerance:
+                self.unmatched += 1
+                continue
+            frames = []
+            if copy:
+                frames = [a.ring.frames[index % a.ring.capacity].copy()
+                          for a, index in zip(self.acquisitions, indices)]
+                # a frame overwritten while it was copied is no longer the matched one
+                if any(index < a.ring.oldest() for a, index in zip(self.acquisitions, indices)):
+                    self.dropped += 1
+                    continue
+            results.append(SyncedFrames(t, indices, frames, deltas))
+        self.position += ready
+        self.emitted += len(results)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "emitted": self.emitted,
+            "unmatched": self.unmatched,
+            "dropped": self.dropped,
+            "clocks": [
+                {"name": a.name, "drift_ppm": a.clock.drift_ppm, "jitter_ms": a.clock.jitter * 1e3}
+                for a in self.acquisitions
+            ],
+        }
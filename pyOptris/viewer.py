@@ -0,0 +1,159 @@
+import collections
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+
+#
+# Latest-value hand-off between a producer thread and the GUI: holds at most one item,
+# put() replaces whatever the consumer has not taken yet. A slow or blocked consumer
+# therefore never queues work up or slows the producer down; the frames it had no time
+# for are counted in `overwritten`.
+# The item changes hands, the producer must not modify it after put().
+#
+class Mailbox:
+    def __init__(self):
+        self.posted = 0
+        self.taken = 0
+        self.overwritten = 0
+        self._item = None
+        self._full = False
+        self._lock = threading.Lock()
+
+    # @return True when an item nobody had taken yet was replaced
+    def put(self, item: Any) -> bool:
+        with self._lock:
+            replaced = self._full
+            self._item = item
+            self._full = True
+            self.posted += 1
+            if replaced:
+                self.overwritten += 1
+            return replaced
+
+    # @return the pending item, or None when nothing new was put since the last take()
+    def take(self) -> Optional[Any]:
+        with self._lock:
+            if not self._full:
+                return None
+            item, self._item = self._item, None
+            self._full = False
+            self.taken += 1
+            return item
+
+    @property
+    def pending(self) -> bool:
+        return self._full
+
+
+#
+# @brief Tk photo image of an RGB (h, w, 3) or grayscale (h, w) uint8 array
+# Uses PIL when it is installed and falls back to a PPM/PGM image Tk decodes itself.
+#
+def photo_image(image: np.ndarray, master=None):
+    try:
+        from PIL import Image, ImageTk
+    except ImportError:
+        import tkinter as tk
+
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        kind = b"P6" if image.ndim == 3 else b"P5"
+        header = b"%s %d %d 255 " % (kind, image.shape[1], image.shape[0])
+        return tk.PhotoImage(master=master, data=header + image.tobytes(), format="PPM")
+    return ImageTk.PhotoImage(image=Image.fromarray(image), master=master)
+
+
+#
+# Shows the frames posted to its mailbox in a Tk widget (a Label or anything else taking
+# `image=`). Capture and processing threads only call post(); the viewer pulls the newest
+# item on the Tk main loop with after() at the display rate, so no Tk call is ever made
+# from another thread and a busy GUI can neither stall nor crash acquisition.
+# @param[in] widget widget showing the image, also used for after()
+# @param[in] rate display refresh rate in Hz
+# @param[in] render optional render(item) -> uint8 image run on the main loop, so
+#            colormaps, overlays and conversion are only paid for frames actually shown;
+#            returning None skips the refresh. Without it items are images already.
+#
+class TkViewer:
+    def __init__(self, widget, rate: float = 30.0, render: Optional[Callable[[Any], Optional[np.ndarray]]] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.widget = widget
+        self.period = 1.0 / rate
+        self.render = render
+        self.mailbox = Mailbox()
+        self.shown = 0
+        self.errors = 0
+        self.error: Optional[BaseException] = None
+        self.photo = None
+        self._shown_times = collections.deque(maxlen=64)
+        self._due = 0.0
+        self._after_id = None
+
+    @property
+    def rate(self) -> float:
+        return 1.0 / self.period
+
+    # @brief hands an item to the viewer; safe to call from any thread
+    def post(self, item: Any) -> bool:
+        return self.mailbox.put(item)
+
+    # @brief starts refreshing; must be called from the Tk main thread
+    def start(self) -> "TkViewer":
+        if self._after_id is None:
+            self._due = time.perf_counter()
+            self._after_id = self.widget.after(0, self._tick)
+        return self
+
+    def stop(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    # @brief shows the pending item now, returns False when there was none
+    def refresh(self) -> bool:
+        item = self.mailbox.take()
+        if item is None:
+            return False
+        image = self.render(item) if self.render is not None else item
+        if image is None:
+            return False
+        photo = photo_image(image, master=self.widget)
+        self.widget.configure(image=photo)
+        # Tk does not hold a reference, the image would be collected while on screen
+        self.photo = photo
+        self.shown += 1
+        self._shown_times.append(time.perf_counter())
+        return True
+
+    # refresh rate actually achieved over the last refreshes
+    def display_fps(self) -> float:
+        times = self._shown_times
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stats(self) -> dict:
+        return {
+            "target_fps": self.rate,
+            "display_fps": self.display_fps(),
+            "shown": self.shown,
+            "posted": self.mailbox.posted,
+            "overwritten": self.mailbox.overwritten,
+            "errors": self.errors,
+        }
+
+    def _tick(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # a bad frame must not end the refresh loop
+            self.errors += 1
+            self.error = e
+        now = time.perf_counter()
+        self._due += self.period
+        if self._due < now:
+            self._due = now + self.period
+        self._after_id = self.widget.after(max(1, int((self._due - now) * 1000)), self._tick)
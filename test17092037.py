@@ -39,7 +39,7 @@ def close_camera():
 # Process the PI 1M camera feed
 def process_pi_1m():
     global frame_counter_1m
-    w, h = 72, 56  # Reduced frame size for PI 1M
+    w, h = optris.load_formats().find("PI1M 72x56 @ 1000Hz").size  # Reduced frame size for PI 1M
     while running:
         if frame_counter_1m % skip_frames_1m == 0:  # Display every 37th frame
             frame = optris.get_palette_image(w, h)
@@ -53,7 +53,7 @@ def process_pi_1m():
 # Process the PI 640i camera feed
 def process_pi_640i():
     global frame_counter_640i 
-    w, h = 642, 480  # Full frame size for PI 640i
+    w, h = optris.load_formats().find("PI600 640x480 @ 32Hz").size  # Full frame size for PI 640i
     while running:
         if frame_counter_640i % skip_frames_640i == 0:  # Display based on 32Hz matching target refresh
             frame = optris.get_palette_image(w, h)
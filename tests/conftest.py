@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+import pytest
+
+from pyOptris import direct_binding
+from pyOptris.camera import CameraManager
+from pyOptris.direct_binding import TIMESTAMP_UNITS
+from pyOptris.simulator import SimulatedIRImager
+
+SERIAL = 17092037
+
+
+@pytest.fixture
+def simulator():
+    simulator = SimulatedIRImager()
+    previous = direct_binding.set_backend(simulator)
+    yield simulator
+    direct_binding.set_backend(previous)
+
+
+# a started camera on the simulator, 72x56 at 1000 Hz
+@pytest.fixture
+def camera(simulator, tmp_path):
+    config = tmp_path / "imager.xml"
+    config.write_text(f"<imager><serial>{SERIAL}</serial><videoformatindex>3</videoformatindex>"
+                      "<temperature><min>600</min><max>1800</max></temperature></imager>")
+    manager = CameraManager()
+    camera = manager.add(str(config))
+    manager.start()
+    assert manager.wait_ready()
+    yield camera
+    manager.close()
+
+
+# record(camera, path, duration=0.3, **kwargs): records `duration` seconds of the camera in
+# chunks of 64 frames and returns the stopped Recorder
+@pytest.fixture
+def record():
+    def record(camera, path, duration=0.3, **kwargs):
+        recorder = camera.record(str(path), chunk_frames=64, **kwargs)
+        time.sleep(duration)
+        recorder.stop()
+        return recorder
+    return record
+
+
+# check_round_trip(recording, recorder): every recorded frame and stamp is the one the
+# simulator delivered for its device frame index
+@pytest.fixture
+def check_round_trip(simulator):
+    def check_round_trip(recording, recorder):
+        device = simulator.cameras[SERIAL]
+        assert len(recording) == recorder.frames_written > 64
+        index = recording.metadata["counter_hw"].astype(np.int64)
+        assert np.all(np.diff(index) > 0)
+        np.testing.assert_array_equal(recording.frames[:], device.frames[index % len(device.frames)])
+        expected = np.array([device.timestamp(i) for i in index])
+        np.testing.assert_allclose(recording.metadata["timestamp"], expected, atol=1.0 / TIMESTAMP_UNITS)
+        assert np.all(np.diff(recording.timestamps) > 0)
+        assert np.all(np.diff(recording.metadata["host_time"]) > 0)
+        assert recording.width == device.width and recording.height == device.height
+        assert recording.serial == SERIAL
+    return check_round_trip
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from pyOptris import acquisition as acquisition_module
+from pyOptris.acquisition import Acquisition, RingBuffer
+from pyOptris.errors import FatalError
+
+
+def filled_ring(frames, capacity=4):
+    ring = RingBuffer(capacity, 3, 2)
+    for i in range(frames):
+        ring.push(np.full((2, 3), i, dtype=np.uint16), float(i), host_ns=i)
+    return ring
+
+
+def test_readers_are_independent():
+    ring = filled_ring(2)
+    first, second = ring.reader(), ring.reader(from_start=True)
+    ring.push(np.full((2, 3), 2, dtype=np.uint16), 2.0)
+    frames, timestamps = first.read()
+    assert timestamps.tolist() == [2.0] and np.all(frames[0] == 2)
+    frames, timestamps = second.read(max_frames=2)
+    assert timestamps.tolist() == [0.0, 1.0] and second.available() == 1
+    assert second.read()[1].tolist() == [2.0]
+    assert first.dropped == second.dropped == 0
+
+
+def test_overrun_skips_overwritten_frames():
+    ring = filled_ring(1)
+    reader = ring.reader(from_start=True)
+    for i in range(1, 10):
+        ring.push(np.full((2, 3), i, dtype=np.uint16), float(i))
+    # capacity - 1 frames stay readable while the producer fills the next slot
+    frames, timestamps = reader.read()
+    assert timestamps.tolist() == [7.0, 8.0, 9.0]
+    assert np.array_equal(frames[:, 0, 0], [7, 8, 9])
+    assert reader.dropped == 7 and reader.overruns == 1 and reader.read_count == 3
+    assert ring.latest()[0] == 9 and ring.latest()[2] == 9.0
+
+
+def test_empty_ring():
+    ring = RingBuffer(2, 3, 2)
+    assert ring.latest() == (-1, None, 0.0)
+    assert len(ring.reader().read()[0]) == 0
+    with pytest.raises(ValueError):
+        RingBuffer(1, 3, 2)
+
+
+# -1 is "no new frame yet", -3 a failed grab, -2 the end of the camera
+def test_errors_and_timeouts(simulator, monkeypatch):
+    monkeypatch.setattr(acquisition_module, "DEFAULT_TIMEOUT", 0.02)
+    codes = iter([0, -1, -1, -1, -1, -1, -1, -1, -1, -3, 0, -1, 0, -2])
+    acquisition = Acquisition(3, 2, capacity=4)
+    monkeypatch.setattr(acquisition, "_grabber", lambda: lambda slot: (slot, next(codes)))
+    acquisition.start()
+    acquisition._thread.join(5)
+    assert acquisition.finished and acquisition.ring.count == 3
+    assert acquisition.errors == 1 and acquisition.timeouts >= 1
+    assert isinstance(acquisition.error, FatalError)
+    stats = acquisition.stats()
+    assert stats["errors"] == 1 and stats["timeouts"] == acquisition.timeouts
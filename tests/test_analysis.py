@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+import pytest
+
+from pyOptris.analysis import RecordingAnalyzer, hotspots, threshold_crossings
+from pyOptris.compression import CompressedRecordingWriter
+from pyOptris.conversion import RAW_OFFSET
+from pyOptris.recording import RecordingWriter
+
+FRAMES = 100
+THRESHOLD = 50.0
+
+
+def make_frames():
+    rng = np.random.default_rng(3)
+    frames = rng.integers(RAW_OFFSET, RAW_OFFSET + 400, size=(FRAMES, 4, 3), dtype=np.uint16)
+    # hot spells, some of them starting or ending on a task boundary
+    for start, stop in ((5, 10), (10, 12), (29, 30), (40, 61), (99, 100)):
+        frames[start:stop, 1, 2] = RAW_OFFSET + 600
+    return frames
+
+
+@pytest.fixture(params=["raw", "compressed"])
+def recording(request, tmp_path):
+    frames = make_frames()
+    timestamps = np.arange(FRAMES) * 0.001
+    path = str(tmp_path / f"{request.param}.rec")
+    if request.param == "raw":
+        with RecordingWriter(path, 3, 4) as writer:
+            writer.append(frames, timestamps)
+    else:
+        with CompressedRecordingWriter(path, 3, 4, chunk_frames=10, workers=1) as writer:
+            writer.append(frames, timestamps)
+    return path, frames
+
+
+# early tasks finish last
+def first_index_late(frames, timestamps, first):
+    time.sleep(0.02 * (FRAMES - first) / 10)
+    return [first]
+
+
+def test_results_come_back_in_frame_order(recording):
+    path, frames = recording
+    with RecordingAnalyzer(path, workers=2, chunk_frames=10) as analyzer:
+        assert analyzer.ranges()[:2] == [(0, 10), (10, 20)] and len(analyzer) == FRAMES
+        firsts = list(range(0, FRAMES, 10))
+        assert analyzer.run(first_index_late) == firsts
+        assert analyzer.run(first_index_late, reduce=lambda done, result: done + result, initial=[]) == firsts
+        ranges = analyzer.ranges(35, 70)
+        assert ranges[0][0] == 35 and ranges[-1][1] == 70
+        assert analyzer.run(first_index_late, start=35, stop=70) == [lo for lo, _ in ranges]
+        spots = analyzer.run(hotspots)
+        maxima = analyzer.run(np.max, per="frame")
+    np.testing.assert_array_equal(spots["index"], np.arange(FRAMES))
+    flat = frames.reshape(FRAMES, -1)
+    np.testing.assert_array_equal(spots["y"] * 3 + spots["x"], flat.argmax(axis=1))
+    np.testing.assert_array_equal(maxima, flat.max(axis=1))
+
+
+def test_crossings_across_task_boundaries(recording):
+    path, frames = recording
+    with RecordingAnalyzer(path, workers=2, chunk_frames=10) as analyzer:
+        indices, rising = threshold_crossings(analyzer, THRESHOLD)
+    above = frames.reshape(FRAMES, -1).max(axis=1) >= THRESHOLD * 10 + RAW_OFFSET
+    expected = np.flatnonzero(np.diff(above)) + 1
+    np.testing.assert_array_equal(indices, expected)
+    np.testing.assert_array_equal(indices, [5, 12, 29, 30, 40, 61, 99])
+    np.testing.assert_array_equal(rising, above[expected])
@@ -0,0 +1,92 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from pyOptris.acquisition import Acquisition
+from pyOptris.bus import BusReader, FramePublisher
+
+NAME = f"pyoptris_test_{os.getpid()}"
+
+
+def publish(acquisition, n):
+    ring = acquisition.ring
+    for _ in range(n):
+        ring.push(np.full(ring.frames.shape[1:], ring.count, dtype=np.uint16), float(ring.count))
+        for listener in acquisition._listeners:
+            listener()
+
+
+def wait_published(publisher, count):
+    deadline = time.monotonic() + 5
+    while publisher.published < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert publisher.published == count
+
+
+@pytest.fixture
+def publisher(simulator):
+    acquisition = Acquisition(3, 2, capacity=8)
+    publisher = FramePublisher(acquisition, NAME, capacity=4, serial=7).start()
+    yield publisher
+    publisher.stop()
+
+
+def test_read_latest_and_overrun(publisher):
+    with BusReader(NAME) as bus:
+        assert (bus.width, bus.height, bus.serial) == (3, 2, 7)
+        assert bus.latest() == (-1, None, 0.0)
+        publish(publisher.acquisition, 2)
+        wait_published(publisher, 2)
+        frames, timestamps = bus.read()
+        assert timestamps.tolist() == [0.0, 1.0] and np.all(frames[1] == 1)
+        index, frame, timestamp = bus.latest()
+        assert index == 1 and timestamp == 1.0 and np.all(frame == 1)
+        # a reader too slow for the segment capacity loses the overwritten frames
+        publish(publisher.acquisition, 6)
+        wait_published(publisher, 8)
+        assert bus.read()[1].tolist() == [5.0, 6.0, 7.0] and bus.dropped == 3
+
+
+def test_slot_being_written_is_not_returned(publisher):
+    publish(publisher.acquisition, 3)
+    wait_published(publisher, 3)
+    with BusReader(NAME, from_start=True) as bus:
+        # the publisher is half way through rewriting frame 1's slot
+        publisher._views["sequences"][1] = 2 * 5 + 1
+        assert not bus.valid(1)
+        frames, timestamps = bus.read()
+        assert timestamps.tolist() == [0.0, 2.0] and bus.dropped == 1
+
+
+# the publisher overwrites the slots while they are being copied
+class _Overwriting:
+    def __init__(self, bus):
+        self.bus = bus
+        self.frames = bus.frames
+
+    def __getitem__(self, key):
+        frames = self.frames[key]
+        self.bus.sequences[:] += 2 * self.bus.capacity
+        return frames
+
+
+def test_slot_overwritten_while_copied_is_not_returned(publisher):
+    publish(publisher.acquisition, 3)
+    wait_published(publisher, 3)
+    with BusReader(NAME, from_start=True) as bus:
+        bus.frames = _Overwriting(bus)
+        frames, timestamps = bus.read()
+        assert len(frames) == 0 and bus.dropped == 3
+
+
+def test_closed_bus(publisher):
+    bus = BusReader(NAME)
+    publisher.stop()
+    assert bus.closed
+    with pytest.raises(EOFError):
+        bus.wait(timeout=1.0)
+    bus.close()
+    with pytest.raises(FileNotFoundError):
+        BusReader(NAME)
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from pyOptris import direct_binding
+from pyOptris.camera import CameraManager
+from pyOptris.errors import IRImagerError
+from pyOptris.simulator import SimulatedIRImager
+
+FAST, SLOW = "PI1M 72x56 @ 1000Hz", "PI640 640x120 @ 125Hz flex"
+
+
+# a simulator serving camera 1 in FAST and camera 2 in SLOW, and their configs
+@pytest.fixture
+def configs(tmp_path):
+    simulator = SimulatedIRImager(video_formats={0: FAST, 1: SLOW})
+    previous = direct_binding.set_backend(simulator)
+    paths = []
+    for serial, index in ((1, 0), (2, 1)):
+        path = tmp_path / f"camera{serial}.xml"
+        path.write_text(f"<imager><serial>{serial}</serial><videoformatindex>{index}</videoformatindex></imager>")
+        paths.append(str(path))
+    yield paths
+    direct_binding.set_backend(previous)
+
+
+def test_cameras_are_queried_not_hardcoded(configs):
+    with CameraManager() as manager:
+        fast = manager.add(configs[0], "fast")
+        slow = manager.add(configs[1], "slow")
+        assert (fast.width, fast.height, fast.serial) == (72, 56, 1)
+        assert (slow.width, slow.height, slow.serial) == (640, 120, 2)
+        assert manager.by_serial(2) is slow and manager.by_id(fast.id) is fast
+        assert [camera.name for camera in manager] == ["fast", "slow"] and len(manager) == 2
+        with pytest.raises(ValueError):
+            manager.add(configs[0], "fast")
+        with pytest.raises(KeyError):
+            manager.by_serial(3)
+    assert fast.id is None and len(manager) == 0
+
+
+def test_each_camera_streams_on_its_own(configs):
+    with CameraManager() as manager:
+        fast = manager.add(configs[0], "fast")
+        slow = manager.add(configs[1], "slow")
+        manager.start()
+        assert manager.wait_ready()
+        assert fast.acquisition is not slow.acquisition
+        time.sleep(0.5)
+        stats = manager.stats()
+    # each runs at its own rate instead of being serialised with the other
+    assert stats["fast"]["fps"] > 500 and 60 < stats["slow"]["fps"] < 200
+    assert stats["fast"]["serial"] == 1 and stats["slow"]["errors"] == 0
+    assert fast.acquisition.ring.frames.shape[1:] == (56, 72)
+    assert not fast.acquisition.is_running() and not slow.acquisition.is_running()
+
+
+def test_switch_keeps_a_ring_per_frame_size(configs):
+    with CameraManager() as manager:
+        camera = manager.add(configs[0], "camera")
+        manager.start()
+        assert manager.wait_ready()
+        fast = camera.acquisition
+        switch = manager.switch("camera", videoformatindex=1)
+        assert (camera.width, camera.height) == (640, 120) and not switch.reused
+        assert camera.acquisition is not fast and camera.acquisition.ring.count > 0
+        assert switch.downtime >= switch.first_frame >= 0 and camera.config.videoformatindex == 1
+        count = fast.ring.count
+        back = manager.switch("camera", videoformatindex=0)
+        assert back.reused and camera.acquisition is fast and fast.ring.count > count
+        assert camera.switches == [switch, back]
+
+
+def test_failed_switch_rolls_back(configs, monkeypatch):
+    simulator = direct_binding.get_backend()
+    multi_usb_init = simulator.evo_irimager_multi_usb_init
+
+    # camera 1 cannot be opened in the slow format
+    def refuse_slow_format(id_ptr, xml_config, *args):
+        with open(xml_config.decode()) as f:
+            config = f.read()
+        if "<serial>1<" in config and "<videoformatindex>1<" in config:
+            return -1
+        return multi_usb_init(id_ptr, xml_config, *args)
+    monkeypatch.setattr(simulator, "evo_irimager_multi_usb_init", refuse_slow_format)
+    with CameraManager() as manager:
+        camera = manager.add(configs[0], "camera")
+        other = manager.add(configs[1], "other")
+        manager.start()
+        assert manager.wait_ready()
+        acquisition, xml_config = camera.acquisition, camera.xml_config
+        with pytest.raises(IRImagerError):
+            manager.switch("camera", videoformatindex=1)
+        # the previous config is back and both cameras stream again
+        assert camera.xml_config == xml_config and camera.acquisition is acquisition
+        assert (camera.width, camera.height) == (72, 56) and camera.switches == []
+        counts = [camera.acquisition.ring.count, other.acquisition.ring.count]
+        time.sleep(0.2)
+        assert camera.acquisition.ring.count > counts[0] and other.acquisition.ring.count > counts[1]
+        assert camera.acquisition.is_running() and other.acquisition.is_running()
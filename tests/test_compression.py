@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from pyOptris.compression import (
+    CHUNK_HEADER_DTYPE, COMPRESSED_HEADER_DTYPE, CompressedRecordingReader, CompressedRecordingWriter,
+    available_codecs, is_compressed_recording,
+)
+from pyOptris.recording import open_recording
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def frames_and_stamps(n=20, height=4, width=3):
+    rng = np.random.default_rng(1)
+    frames = rng.integers(0, 65536, size=(n, height, width), dtype=np.uint16)
+    return frames, np.arange(n, dtype=np.float64) * 0.001
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_round_trip(camera, record, check_round_trip, tmp_path, codec):
+    path = tmp_path / f"{codec}.rec"
+    recorder = record(camera, path, compression=codec)
+    assert is_compressed_recording(str(path))
+    with open_recording(str(path)) as recording:
+        assert isinstance(recording, CompressedRecordingReader)
+        check_round_trip(recording, recorder)
+        assert recording.attrs["camera"] == camera.name
+        assert recording.videoformatindex == 3 and recording.temperature_range == (600.0, 1800.0)
+        assert recording.ratio > 1.0
+        np.testing.assert_array_equal(recording.read(), recording.frames[:])
+
+
+# uint16 wrap-around in the frame differences and chunk boundaries inside append()
+@pytest.mark.parametrize("delta", [True, False])
+def test_exact(tmp_path, delta):
+    frames, timestamps = frames_and_stamps()
+    path = str(tmp_path / "exact.rec")
+    with CompressedRecordingWriter(path, 3, 4, chunk_frames=6, delta=delta, workers=2) as writer:
+        writer.append(frames[:9], timestamps[:9])
+        writer.commit()
+        writer.append(frames[9:], timestamps[9:])
+    with CompressedRecordingReader(path) as recording:
+        assert len(recording) == 20 and len(recording.index) == 4
+        np.testing.assert_array_equal(recording.frames[:], frames)
+        np.testing.assert_array_equal(recording.frames[[19, 0, 7]], frames[[19, 0, 7]])
+        np.testing.assert_array_equal(recording[13], frames[13])
+        np.testing.assert_array_equal(recording.timestamps, timestamps)
+
+
+# without the index written at close, the reader walks the chunk headers up to the last commit
+def test_killed_before_index(tmp_path):
+    path = tmp_path / "killed.rec"
+    script = f"""
+import os
+import time
+import numpy as np
+from pyOptris.compression import CompressedRecordingWriter
+rng = np.random.default_rng(1)
+frames = rng.integers(0, 65536, size=(20, 4, 3), dtype=np.uint16)
+writer = CompressedRecordingWriter({str(path)!r}, 3, 4, chunk_frames=6, workers=1)
+writer.append(frames[:12], np.arange(12) * 0.001)
+while writer.committed < 12:
+    time.sleep(0.01)
+    writer.commit(sync=True)
+writer.append(frames[12:], np.arange(12, 20) * 0.001)
+os._exit(0)
+"""
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True)
+    frames, timestamps = frames_and_stamps()
+    with open_recording(str(path)) as recording:
+        assert recording.header["index_offset"] == 0
+        assert len(recording) == 12
+        np.testing.assert_array_equal(recording.frames[:], frames[:12])
+        np.testing.assert_array_equal(recording.timestamps, timestamps[:12])
+
+
+def test_corrupt_chunk(tmp_path):
+    frames, timestamps = frames_and_stamps()
+    path = str(tmp_path / "corrupt.rec")
+    with CompressedRecordingWriter(path, 3, 4, chunk_frames=6, workers=1) as writer:
+        writer.append(frames, timestamps)
+    with CompressedRecordingReader(path) as recording:
+        offset = int(recording.index["offset"][1]) + CHUNK_HEADER_DTYPE.itemsize
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)[0]
+        f.seek(offset)
+        f.write(bytes([byte ^ 0xFF]))
+    with CompressedRecordingReader(path) as recording:
+        np.testing.assert_array_equal(recording.frames[:6], frames[:6])
+        with pytest.raises(ValueError, match="chunk 1 .* CRC32"):
+            recording.frames[6:]
+    # without an index the reader finds it while walking the chunks
+    with open(path, "r+b") as f:
+        f.seek(COMPRESSED_HEADER_DTYPE.fields["index_offset"][1])
+        f.write(bytes(8))
+    with pytest.raises(ValueError, match="chunk 1 .* CRC32"):
+        CompressedRecordingReader(path)
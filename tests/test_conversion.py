@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from pyOptris.conversion import TemperatureConverter, raw_to_temperature, temperature_lut, temperature_to_raw
+
+RAW = np.array([[0, 1000, 1234], [25000, 65535, 1001]], dtype=np.uint16)
+
+
+# the SDK's documented formula, t = (raw - 1000) / 10
+def reference(raw, decimals=1):
+    return (raw.astype(np.float64) - 1000.0) / 10.0 ** decimals
+
+
+@pytest.mark.parametrize("method", ["scale", "lut"])
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_matches_formula(method, dtype):
+    result = raw_to_temperature(RAW, dtype=dtype, method=method)
+    assert result.dtype == dtype
+    np.testing.assert_allclose(result, reference(RAW), rtol=1e-6)
+
+
+def test_float16_goes_through_the_table():
+    result = raw_to_temperature(RAW, dtype=np.float16)
+    np.testing.assert_array_equal(result, reference(RAW).astype(np.float16))
+
+
+def test_high_precision():
+    converter = TemperatureConverter(high_precision=True)
+    np.testing.assert_allclose(converter(RAW), reference(RAW, decimals=2), rtol=1e-6)
+
+
+def test_out_is_filled_in_place():
+    stack = np.stack([RAW, RAW + 1])
+    out = np.empty(stack.shape, dtype=np.float64)
+    assert raw_to_temperature(stack, out) is out
+    np.testing.assert_allclose(out, reference(stack))
+    with pytest.raises(ValueError):
+        raw_to_temperature(stack, np.empty(RAW.shape, dtype=np.float32))
+    with pytest.raises(ValueError):
+        raw_to_temperature(RAW, method="cubic")
+
+
+def test_lut_is_shared_and_read_only():
+    lut = temperature_lut()
+    assert lut is temperature_lut(np.float32)
+    assert lut.shape == (65536,) and not lut.flags.writeable
+
+
+def test_convert_reuse():
+    converter = TemperatureConverter()
+    first = converter.convert_reuse(RAW)
+    assert converter.convert_reuse(RAW + 10) is first
+    np.testing.assert_allclose(first, reference(RAW + 10))
+
+
+def test_temperature_to_raw_inverts():
+    converter = TemperatureConverter()
+    np.testing.assert_array_equal(converter.to_raw(converter(RAW)), RAW)
+    np.testing.assert_array_equal(temperature_to_raw([-1000.0, 1e6]), [0, 65535])
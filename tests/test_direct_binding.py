@@ -0,0 +1,22 @@
+import ctypes
+
+import pytest
+
+from pyOptris import direct_binding
+from pyOptris.direct_binding import FramePool
+
+
+def test_multi_usb_init_returns_the_id(simulator, tmp_path):
+    config = tmp_path / "imager.xml"
+    config.write_text("<imager><serial>1</serial></imager>")
+    err, id = direct_binding.multi_usb_init(str(config))
+    assert err == 0 and isinstance(id, ctypes.c_uint)
+    direct_binding.terminate()
+
+
+def test_palette_pool_has_no_metadata(simulator):
+    pool = FramePool(72, 56, palette=True)
+    with pytest.raises(ValueError, match="thermal images"):
+        pool.grab_metadata()
+    with pytest.raises(ValueError, match="thermal images"):
+        pool.grab_multi_metadata(0)
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from pyOptris.acquisition import Acquisition
+from pyOptris.display import DisplayScheduler
+
+
+@pytest.fixture
+def acquisition(simulator):
+    return Acquisition(3, 2, capacity=8)
+
+
+def push(acquisition, *values):
+    for value in values:
+        acquisition.ring.push(np.full((2, 3), value, dtype=np.uint16), 0.0)
+
+
+@pytest.mark.parametrize("mode, shown", [("latest", 4), ("max", 9), ("mean", 5)])
+def test_reduces_the_window(acquisition, mode, shown):
+    scheduler = DisplayScheduler(acquisition, 30.0, mode)
+    assert scheduler.poll(force=True) is None
+    push(acquisition, 2, 9, 4)
+    index, frame = scheduler.poll(force=True)
+    assert index == 2 and np.all(frame == shown)
+    if mode != "latest":
+        assert scheduler.window == 3
+    # nothing new since the last refresh
+    assert scheduler.poll(force=True) is None
+    push(acquisition, 7)
+    out = np.empty((2, 3), dtype=np.uint16)
+    index, frame = scheduler.poll(out, force=True)
+    assert index == 3 and frame is out and np.all(out == 7) and scheduler.window == 1
+    assert scheduler.shown == 2
+
+
+def test_refreshes_follow_the_rate(acquisition):
+    scheduler = DisplayScheduler(acquisition, 20.0)
+    push(acquisition, 1)
+    assert scheduler.poll() is not None
+    push(acquisition, 2)
+    # not due for another 50 ms
+    assert scheduler.poll() is None and 0 < scheduler.time_to_next() <= 0.05
+    assert scheduler.next(timeout=1.0)[0] == 1
+    # a refresh missed by more than a period is skipped, not caught up on
+    time.sleep(0.12)
+    push(acquisition, 3)
+    assert scheduler.poll() is not None and scheduler.late == 1
+    assert scheduler.poll() is None
+
+
+def test_decimates_a_fast_camera(camera):
+    scheduler = DisplayScheduler(camera.acquisition, 50.0, "max")
+    shown = []
+    done = threading.Event()
+
+    def show(index, frame):
+        shown.append(index)
+        if len(shown) == 10:
+            done.set()
+    scheduler.start(show)
+    assert done.wait(5)
+    scheduler.stop()
+    stats = scheduler.stats()
+    assert np.all(np.diff(shown) > 0) and stats["dropped"] == 0
+    assert 5 < stats["decimation"] < 50 and stats["window"] > 5
+
+
+def test_arguments(acquisition):
+    with pytest.raises(ValueError):
+        DisplayScheduler(acquisition, mode="min")
+    with pytest.raises(ValueError):
+        DisplayScheduler(acquisition, rate=0)
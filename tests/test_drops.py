@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from pyOptris.drops import COUNTER_MODULO, FrameCounterMonitor, counter_stats
+
+# two frames lost after 12, a duplicate of 15, a burst of three after 16, a reset to 0
+COUNTERS = [10, 11, 12, 15, 15, 16, 20, 21, 0, 1]
+
+
+def test_gaps_duplicates_and_resets():
+    stats = counter_stats(COUNTERS)
+    assert stats["received"] == len(COUNTERS)
+    assert stats["lost"] == 5 and stats["gaps"] == 2 and stats["max_gap"] == 3
+    assert stats["duplicates"] == 1 and stats["resets"] == 1
+    assert stats["gap_histogram"] == {"2": 1, "3": 1}
+    assert stats["step"] == 1
+    assert stats["loss_ratio"] == pytest.approx(5 / 15)
+
+
+def test_observe_matches_update():
+    one_by_one = FrameCounterMonitor()
+    for counter in COUNTERS:
+        one_by_one.observe(counter)
+    batched = FrameCounterMonitor()
+    batched.update(COUNTERS[:4])
+    batched.update(COUNTERS[4:])
+    assert one_by_one.stats() == batched.stats()
+
+
+def test_counter_wraps_around():
+    counters = np.array([COUNTER_MODULO - 2, COUNTER_MODULO - 1, 0, 2], dtype=np.int64)
+    stats = counter_stats(counters)
+    assert stats["resets"] == 0 and stats["lost"] == 1
+
+
+def test_step_is_learned_or_given():
+    assert counter_stats([0, 2, 4, 8])["lost"] == 1
+    assert counter_stats([0, 2, 4, 8], step=1)["lost"] == 1 + 1 + 3
+
+
+def test_empty():
+    monitor = FrameCounterMonitor()
+    monitor.update(np.empty(0, dtype=np.uint32))
+    assert monitor.received == 0 and monitor.loss_ratio == 0.0
+
+
+def test_leading_gap():
+    counters = [0, 3, 4, 5, 7]
+    one_by_one = FrameCounterMonitor()
+    for counter in counters:
+        one_by_one.observe(counter)
+    batched = FrameCounterMonitor()
+    batched.update(counters[:2])
+    batched.update(counters[2:])
+    assert one_by_one.stats() == batched.stats() == counter_stats(counters)
+    assert one_by_one.step == 1 and one_by_one.lost == 2 + 1
+    assert one_by_one.gap_histogram == {2: 1, 1: 1}
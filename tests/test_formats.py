@@ -0,0 +1,157 @@
+import os
+
+import pytest
+
+from pyOptris.config import load_config
+from pyOptris.formats import load_formats, parse_formats
+from pyOptris.roi import Roi
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORMATS_DEF = os.path.join(ROOT, "Formats.def")
+
+SAMPLE = """
+# comment
+[ImgProc format definition file]
+Version = 2
+Release = 7
+
+[Format]
+Guid = {00000000-0000-0000-0000-000000000001}
+Name = "PI1M 764x480 @ 32Hz"
+HWRev = (2100..2199)
+FWRev = (2800..2899)
+Channels = 1
+In = 766 490 32
+Out = 764 480 32
+SFrames = 1
+Def = (0 480 d:764)
+[Format end]
+[Format]
+Guid = {00000000-0000-0000-0000-000000000002}
+Name = "PI1M 72x56 @ 1000Hz flex"
+HWRev = (2100..2199)
+FWRev = (2800..2899)(2950..2960)
+Channels = 1
+In = 73 224 250
+Out = 72 56 1000
+SFrames = 4
+DeviceRes = 764 480 32
+[Format end]
+[Format]
+Guid = {00000000-0000-0000-0000-000000000003}
+Name = "PI1M 764x480 @ 32Hz"
+HWRev = (2100..2199)
+FWRev = (2900..2999)
+Channels = 1
+In = 766 492 32
+Out = 764 480 32
+[Format end]
+[Format]
+Guid = {00000000-0000-0000-0000-000000000004}
+Name = "PI640 640x480 @ 8.33Hz"
+HWRev = (1..99)
+FWRev = (1..9999)
+Channels = 1
+In = 642 482 8
+Out = 640 480 8
+[Format end]
+"""
+
+
+def test_parse():
+    index = parse_formats(SAMPLE)
+    assert len(index) == 4 and index.version == 2 and index.release == 7
+    assert index.families == ["PI1M", "PI640"]
+    flex = index.by_guid("00000000-0000-0000-0000-000000000002")
+    assert flex.size == (72, 56) and flex.shape == (56, 72) and flex.rate == 1000.0
+    assert flex.flex and flex.device_resolution.width == 764
+    assert flex.outputs[0].subframes == 4 and flex.fw_revisions == ((2800, 2899), (2950, 2960))
+    assert flex.frame_bytes == 72 * 56 * 2
+    assert flex.usb_bytes_per_second == 73 * 224 * 250 * 2
+    # Out rounds 8.33 Hz down, the name keeps it
+    assert index.find("PI640 640x480 @ 8.33Hz").rate == 8.33
+
+
+def test_find_by_revision():
+    index = parse_formats(SAMPLE)
+    name = "PI1M 764x480 @ 32Hz"
+    assert index.find(name, fw_rev=2850).transfer.height == 490
+    assert index.find(name, fw_rev=2950).transfer.height == 492
+    assert index.find(name).transfer.height == 492
+    assert [format.name for format in index.for_device("pi1m", 2150, 2955)] == \
+        ["PI1M 72x56 @ 1000Hz flex", name]
+    with pytest.raises(KeyError):
+        index.find(name, hw_rev=1)
+    with pytest.raises(KeyError):
+        index.by_guid("{00000000-0000-0000-0000-00000000000F}")
+
+
+def test_select():
+    index = parse_formats(SAMPLE)
+    assert index.select("PI1M", fw_rev=2850).size == (764, 480)
+    assert index.select("PI1M", fw_rev=2850, rate=100).size == (72, 56)
+    # a small region is read out fastest by the flex window
+    assert index.select("PI1M", fw_rev=2850, roi=(40, 40)).flex
+    assert index.select("PI1M", fw_rev=2850, roi=Roi.rectangle("r", 0, 0, 100, 10, (480, 764))).size == (764, 480)
+    # an ROI counts by its size, wherever it lies in the full frame
+    assert index.select("PI1M", fw_rev=2850, roi=Roi.rectangle("r", 600, 400, 40, 40, (480, 764))).flex
+    assert not index.matching("PI1M", fw_rev=2850, roi=(800, 10))
+    with pytest.raises(ValueError):
+        index.select("PI1M", fw_rev=2850, rate=2000)
+
+
+@pytest.mark.parametrize("text", [
+    "[Format]\nName = \"A\"\n",
+    "[Format end]\n",
+    "[Format]\n[Format]\n",
+    "[Format]\nName = \"PI 1x1 @ 1Hz\"\nHWRev = (1..2)\nFWRev = (1..2)\nIn = 1 1 1\n[Format end]\n",
+    "[Format]\nIn = 1 1\n",
+    "Version\n",
+])
+def test_malformed(text):
+    with pytest.raises(ValueError):
+        parse_formats(text)
+
+
+def test_load_formats_def():
+    index = load_formats(FORMATS_DEF)
+    assert load_formats(FORMATS_DEF) is index
+    assert len(index) == 35 and index.release == 23 and "PI1M" in index.families
+    # names are not authoritative, sizes come from Out
+    assert index.find("PI1M 766x480 @ 32Hz").size == (764, 480)
+    assert index.find("PI1M 72x56 @ 1000Hz").size == (72, 56)
+    assert all(format.width > 0 and format.height > 0 and format.rate > 0 for format in index)
+
+
+# the PI 640 modes are named PI600 and PI640 but belong to one device
+def test_families_follow_revisions():
+    index = load_formats(FORMATS_DEF)
+    pi640 = [format.name for format in index.for_device("PI640")]
+    assert pi640 == ["PI600 640x480 @ 32Hz", "PI640 640x120 @ 125Hz flex"]
+    assert index.for_device("pi600") == index.for_device("PI640")
+    assert index.select("PI640", roi=(640, 480)).size == (640, 480)
+    assert [format.name for format in index.for_device("Xi400")] == ["XI400 382x290 @ 27Hz", "XI400 382x288 @ 80Hz"]
+    assert all(format.family == "Xi" for format in index.for_device("Xi"))
+
+
+# the indices the checked-in configs use for their formats
+@pytest.mark.parametrize("config, name", [
+    ("17092037f.xml", "PI1M 766x480 @ 32Hz"),
+    ("17092037.xml", "PI1M 72x56 @ 1000Hz"),
+    ("6060300f.xml", "PI600 640x480 @ 32Hz"),
+    ("6060300.xml", "PI640 640x120 @ 125Hz flex"),
+])
+def test_video_format_index(config, name):
+    index = load_formats(FORMATS_DEF)
+    format = index.find(name, fw_rev=2800) if name.startswith("PI1M") else index.find(name)
+    assert index.video_format_index(format) == load_config(os.path.join(ROOT, config)).videoformatindex
+    with pytest.raises(ValueError):
+        index.video_format_index(format, hw_rev=1)
+
+
+def test_select_drives_the_config():
+    index = load_formats(FORMATS_DEF)
+    format = index.select("PI1M", fw_rev=2810, roi=(60, 50), rate=500)
+    config = load_config(os.path.join(ROOT, "17092037f.xml"))
+    reduced = config.replace(videoformatindex=index.video_format_index(format, fw_rev=2810), framerate=format.rate)
+    assert (reduced.videoformatindex, reduced.framerate) == (3, 1000)
@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+import pytest
+
+from pyOptris.pixelstats import PixelStatistics, PixelStatisticsMonitor, recording_statistics
+from pyOptris.recording import RecordingWriter, open_recording
+
+SHAPE = (5, 7)
+
+
+def frames(n=50, seed=3):
+    rng = np.random.default_rng(seed)
+    return rng.integers(1000, 40000, size=(n,) + SHAPE, dtype=np.uint16)
+
+
+def check_moments(statistics, stack, ddof=0):
+    stack = stack.astype(np.float64)
+    stats = statistics.stats(ddof)
+    assert stats["count"] == len(stack)
+    np.testing.assert_allclose(stats["mean"], stack.mean(axis=0))
+    np.testing.assert_allclose(stats["variance"], stack.var(axis=0, ddof=ddof))
+    np.testing.assert_array_equal(stats["min"], stack.min(axis=0))
+    np.testing.assert_array_equal(stats["max"], stack.max(axis=0))
+
+
+def test_all_matches_numpy():
+    stack = frames()
+    statistics = PixelStatistics(SHAPE)
+    statistics.update(stack[:7]).update(stack[7])
+    statistics.update(stack[8:])
+    check_moments(statistics, stack)
+    check_moments(statistics, stack, ddof=1)
+
+
+# partial results of workers merge to the statistics of all their frames
+def test_merge_is_exact():
+    stack = frames()
+    parts = [PixelStatistics(SHAPE).update(stack[start:start + 13]) for start in range(0, 50, 13)]
+    merged = PixelStatistics.merge_all(parts)
+    check_moments(merged, stack)
+    assert merged.frames_seen == 50
+    with pytest.raises(ValueError):
+        merged.merge(PixelStatistics((2, 2)))
+    with pytest.raises(ValueError):
+        merged.merge(PixelStatistics(SHAPE, mode="window", window=4))
+
+
+def test_window_covers_the_newest_frames():
+    stack = frames()
+    statistics = PixelStatistics(SHAPE, mode="window", window=8, blocks=4)
+    statistics.update(stack[:20])
+    check_moments(statistics, stack[12:20])
+    statistics.update(stack[20])
+    check_moments(statistics, stack[14:21])
+
+
+def test_decay_weights_recent_frames():
+    stack = frames(30)
+    statistics = PixelStatistics(SHAPE, mode="decay", halflife=4)
+    statistics.update(stack)
+    alpha = statistics.alpha
+    assert alpha == pytest.approx(1 - 0.5 ** 0.25)
+    weights = alpha * (1 - alpha) ** np.arange(29)[::-1]
+    weights = np.concatenate(([(1 - alpha) ** 29], weights))
+    expected = np.tensordot(weights, stack.astype(np.float64), axes=1)
+    np.testing.assert_allclose(statistics.mean, expected)
+    assert statistics.count == 30
+
+
+def test_temperatures_and_invalid_modes():
+    statistics = PixelStatistics(SHAPE).update(np.full(SHAPE, 1250, dtype=np.uint16))
+    temperatures = statistics.temperatures()
+    np.testing.assert_allclose(temperatures["mean"], 25.0)
+    np.testing.assert_allclose(temperatures["std"], 0.0)
+    for kwargs in (dict(mode="median"), dict(mode="window"), dict(mode="decay", alpha=1.5)):
+        with pytest.raises(ValueError):
+            PixelStatistics(SHAPE, **kwargs)
+
+
+def test_recording_statistics(tmp_path):
+    stack = frames()
+    path = str(tmp_path / "stats.rec")
+    with RecordingWriter(path, SHAPE[1], SHAPE[0]) as writer:
+        writer.append(stack, np.arange(len(stack), dtype=np.float64))
+    with open_recording(path) as recording:
+        check_moments(recording_statistics(recording, chunk_frames=16), stack)
+
+
+def test_monitor(camera):
+    monitor = PixelStatisticsMonitor(camera.acquisition).start()
+    time.sleep(0.2)
+    camera.stop()
+    monitor.stop()
+    snapshot = monitor.snapshot()
+    assert snapshot["count"] == monitor.statistics.frames_seen > 50
+    assert np.all(snapshot["min"] <= snapshot["mean"]) and np.all(snapshot["mean"] <= snapshot["max"])
+    monitor.reset()
+    assert monitor.snapshot()["count"] == 0
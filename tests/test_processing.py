@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from pyOptris.acquisition import RingBuffer
+from pyOptris.processing import ProcessingPool, ProcessingStage, frame_statistics
+
+
+def test_cancelled_future_frees_its_slot():
+    with ProcessingPool(frame_statistics, (2, 3), workers=1, slots=1) as pool:
+        slot = pool.reserve()
+        future = Future()
+        future.cancel()
+        pool._finished(slot, 0, 0.0, None, future)
+        assert pool.busy == 0 and pool.results() == []
+
+
+def test_read_into_skips_overwritten_frames():
+    ring = RingBuffer(4, 3, 2)
+    reader = ring.reader()
+    for i in range(6):
+        ring.push(np.full((2, 3), i, dtype=np.uint16), float(i))
+    out = np.empty((2, 3), dtype=np.uint16)
+    assert reader.read_into(out) == (3, 3.0) and np.all(out == 3)
+    assert reader.dropped == 3
+    assert reader.read_into(out) == (4, 4.0) and reader.read_into(out) == (5, 5.0)
+    assert reader.read_into(out) is None and reader.read_count == 3
+
+
+def test_all_mode_delivers_every_frame(camera):
+    acquisition = camera.acquisition
+    with ProcessingPool(frame_statistics, (acquisition.ring.height, acquisition.ring.width), workers=1) as pool:
+        stage = ProcessingStage(acquisition, pool, policy="all").start()
+        first = stage._reader.position
+        time.sleep(1.0)
+        stage.stop()
+        deadline = time.perf_counter() + 10
+        while pool.busy and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        results = stage.results()
+        position = stage._reader.position
+    indices = [index for index, _, _ in results]
+    assert len(results) > 0 and stage.errors == 0
+    assert len(set(indices)) == len(indices) and min(indices) >= first and max(indices) < position
+    assert len(results) + stage.dropped == position - first
+    ring = acquisition.ring
+    for index, image, value in results[-8:]:
+        if index >= ring.oldest():
+            assert value == frame_statistics(ring.frames[index % ring.capacity])
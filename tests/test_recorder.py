@@ -0,0 +1,102 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from pyOptris.recorder import Recorder
+from pyOptris.recording import open_recording
+
+SHAPE = (6, 5)
+
+
+def frames(n, seed=4):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 65536, size=(n,) + SHAPE, dtype=np.uint16)
+
+
+# runs `func` on a thread and fails instead of hanging the suite
+def within(timeout, func, *args):
+    result = {}
+
+    def run():
+        try:
+            result["value"] = func(*args)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"{func.__name__} did not return within {timeout} s"
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_write(tmp_path, compression):
+    stack = frames(300)
+    path = str(tmp_path / "write.rec")
+    recorder = Recorder(path, SHAPE[1], SHAPE[0], chunk_frames=32, queue_chunks=2,
+                        preallocate_frames=64, compression=compression).start()
+    for i, frame in enumerate(stack):
+        recorder.write(frame, i * 0.01)
+    recorder.stop()
+    assert recorder.frames_written == 300
+    with open_recording(path) as recording:
+        np.testing.assert_array_equal(recording.frames[:], stack)
+        np.testing.assert_allclose(recording.timestamps, np.arange(300) * 0.01)
+
+
+def failing_append(*args, **kwargs):
+    raise OSError(28, "No space left on device")
+
+
+# a failing writer must not leave write() waiting for a chunk buffer, and stop() reports
+# the write error rather than the one closing the file gives afterwards
+def test_writer_failure(tmp_path):
+    recorder = Recorder(str(tmp_path / "full.rec"), SHAPE[1], SHAPE[0], chunk_frames=8, queue_chunks=2).start()
+    recorder._writer.append = failing_append
+    stack = frames(8)
+
+    def write_until_error():
+        while True:
+            for frame in stack:
+                recorder.write(frame, 0.0)
+
+    with pytest.raises(OSError, match="No space"):
+        within(5.0, write_until_error)
+
+    def failing_close(sync=True):
+        raise ValueError("close failed")
+
+    close = recorder._writer.close
+    recorder._writer.close = failing_close
+    with pytest.raises(OSError, match="No space"):
+        within(5.0, recorder.stop)
+    close()
+
+
+# stop() drains the ring up to the frame it was called at, even when the camera is faster
+# than the disk, and every frame lost on the way is counted
+def test_stop_drains_a_slow_writer(camera, tmp_path):
+    path = str(tmp_path / "slow.rec")
+    recorder = camera.record(path, chunk_frames=64)
+    append = recorder._writer.append
+
+    def slow_append(*args, **kwargs):
+        time.sleep(0.15)
+        append(*args, **kwargs)
+
+    recorder._writer.append = slow_append
+    time.sleep(0.5)
+    stopped_at = camera.acquisition.ring.count
+    within(5.0, recorder.stop)
+    with open_recording(path) as recording:
+        assert len(recording) == recorder.frames_written > 0
+        index = recording.metadata["counter_hw"].astype(np.int64)
+        assert np.all(np.diff(index) > 0)
+        assert index[-1] < stopped_at + 64
+        assert recording.frame_drops()["lost"] == recorder.dropped
+        assert recording.attrs["recorder_dropped"] == recorder.dropped
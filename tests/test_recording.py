@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from pyOptris.recording import RecordingReader, RecordingWriter, is_recording, open_recording
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_round_trip(camera, record, check_round_trip, tmp_path):
+    path = tmp_path / "native.rec"
+    recorder = record(camera, path)
+    assert is_recording(str(path))
+    with open_recording(str(path)) as recording:
+        assert isinstance(recording, RecordingReader)
+        check_round_trip(recording, recorder)
+        assert recording.attrs["camera"] == camera.name
+        assert recording.videoformatindex == 3
+        assert recording.temperature_range == (600.0, 1800.0)
+        assert recording.frame_drops()["lost"] == recorder.counters.stats()["lost"]
+
+
+def test_writer_grows_past_capacity(tmp_path):
+    frames = np.arange(10 * 4 * 3, dtype=np.uint16).reshape(10, 4, 3)
+    path = str(tmp_path / "grow.rec")
+    with RecordingWriter(path, 3, 4, capacity=2, attrs={"note": "grow"}) as writer:
+        for i in range(0, 10, 3):
+            writer.append(frames[i:i + 3], np.arange(i, min(i + 3, 10), dtype=np.float64))
+            writer.commit()
+    with RecordingReader(path) as recording:
+        np.testing.assert_array_equal(recording.frames, frames)
+        np.testing.assert_array_equal(recording.timestamps, np.arange(10))
+        assert recording.attrs["note"] == "grow"
+
+
+# a writer killed after its commits leaves a recording readable up to the last commit
+def test_killed_writer(tmp_path):
+    path = tmp_path / "killed.rec"
+    script = f"""
+import os
+import numpy as np
+from pyOptris.recording import RecordingWriter
+frames = np.arange(7 * 4 * 3, dtype=np.uint16).reshape(7, 4, 3)
+writer = RecordingWriter({str(path)!r}, 3, 4, capacity=2)
+writer.append(frames[:5], np.arange(5, dtype=np.float64))
+writer.commit(sync=True)
+writer.append(frames[5:], np.arange(5, 7, dtype=np.float64))
+os._exit(0)
+"""
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True)
+    with open_recording(str(path)) as recording:
+        assert len(recording) == 5
+        np.testing.assert_array_equal(recording.frames, np.arange(7 * 4 * 3, dtype=np.uint16).reshape(7, 4, 3)[:5])
+        np.testing.assert_array_equal(recording.timestamps, np.arange(5))
+
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"\0" * 64)
+    assert not is_recording(str(path))
+    with pytest.raises(ValueError):
+        RecordingReader(str(path))
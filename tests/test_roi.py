@@ -0,0 +1,96 @@
+import time
+
+import numpy as np
+import pytest
+
+from pyOptris.roi import Roi, RoiMonitor, RoiSeries, RoiSet
+
+SHAPE = (6, 8)
+
+
+def frames(n=3):
+    rng = np.random.default_rng(2)
+    return rng.integers(1000, 3000, size=(n,) + SHAPE, dtype=np.uint16)
+
+
+def test_rectangle_is_clipped():
+    roi = Roi.rectangle("corner", -2, 4, 4, 5, SHAPE)
+    assert roi.bbox == (0, 4, 2, 6) and roi.size == 4
+    np.testing.assert_array_equal(roi.to_mask()[4:, :2], True)
+    with pytest.raises(ValueError):
+        Roi.rectangle("outside", 8, 0, 2, 2, SHAPE)
+
+
+def test_polygon_and_mask():
+    triangle = Roi.polygon("triangle", [(0, 0), (4, 0), (0, 4)], SHAPE)
+    rows, columns = np.divmod(triangle.indices, SHAPE[1])
+    assert np.all(rows + columns < 4)
+    assert Roi.mask("same", triangle.to_mask()).indices.tolist() == triangle.indices.tolist()
+    with pytest.raises(ValueError):
+        Roi.polygon("line", [(0, 0), (4, 4)], SHAPE)
+
+
+# one gather and reduceat over the set gives what cropping every ROI on its own gives
+def test_compute_matches_per_roi_statistics():
+    rois = RoiSet(SHAPE, percentiles=(50, 95))
+    rois.rectangle("box", 1, 1, 3, 2)
+    rois.around("spot", 6, 4, 3)
+    rois.polygon("triangle", [(0, 0), (7, 0), (0, 5)])
+    stack = frames()
+    stats = rois.compute(stack, raw=True)
+    assert list(stats) == rois.statistics == ["min", "max", "mean", "p50", "p95"]
+    for column, roi in enumerate(rois):
+        values = roi.extract(stack).astype(np.float64)
+        np.testing.assert_array_equal(stats["min"][:, column], values.min(axis=1))
+        np.testing.assert_array_equal(stats["max"][:, column], values.max(axis=1))
+        np.testing.assert_allclose(stats["mean"][:, column], values.mean(axis=1))
+        np.testing.assert_allclose(stats["p95"][:, column], np.percentile(values, 95, axis=1))
+    temperatures = rois.compute(stack[0])
+    np.testing.assert_allclose(temperatures["mean"], (stats["mean"][0] - 1000.0) / 10.0)
+
+
+def test_set_errors():
+    rois = RoiSet(SHAPE)
+    with pytest.raises(ValueError):
+        rois.compute(frames())
+    rois.rectangle("box", 0, 0, 2, 2)
+    with pytest.raises(ValueError):
+        rois.rectangle("box", 2, 2, 2, 2)
+    with pytest.raises(ValueError):
+        rois.add(Roi.rectangle("other", 0, 0, 2, 2, (4, 4)))
+    with pytest.raises(ValueError):
+        rois.compute(np.zeros((4, 4), dtype=np.uint16))
+    rois.remove("box")
+    assert len(rois) == 0 and rois.indices.size == 0
+
+
+def test_series_grows():
+    series = RoiSeries(["a", "b"], ["mean"], capacity=2)
+    for start in range(0, 6, 3):
+        index = np.arange(start, start + 3)
+        series.append(index, index * 0.1, {"mean": np.full((3, 2), start, dtype=np.float64)})
+    data = series.to_dict()
+    assert len(series) == 6
+    np.testing.assert_array_equal(data["index"], np.arange(6))
+    np.testing.assert_array_equal(series.roi("b")["mean"], [0, 0, 0, 3, 3, 3])
+
+
+def test_monitor(camera):
+    rois = camera.rois(percentiles=(50,))
+    rois.around("centre", camera.width // 2, camera.height // 2, 9)
+    rois.rectangle("left", 0, 0, 10, camera.height)
+    monitor = RoiMonitor(camera.acquisition, rois).start()
+    time.sleep(0.2)
+    camera.stop()
+    monitor.stop()
+    series = monitor.series.to_dict()
+    assert len(series["index"]) > 50
+    assert np.all(np.diff(series["index"]) > 0)
+    ring = camera.acquisition.ring
+    newest = int(series["index"][-1])
+    expected = rois.compute(ring.frames[newest % ring.capacity])
+    for name in rois.statistics:
+        np.testing.assert_allclose(monitor.latest()[name], expected[name])
+        np.testing.assert_allclose(series[name][-1], expected[name], rtol=1e-6)
+    with pytest.raises(ValueError):
+        RoiMonitor(camera.acquisition, RoiSet((4, 4)))
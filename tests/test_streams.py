@@ -0,0 +1,73 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from pyOptris.acquisition import Acquisition
+from pyOptris.streams import FrameStream
+
+
+# an acquisition whose frames the test publishes itself, without a thread
+@pytest.fixture
+def acquisition(simulator):
+    return Acquisition(3, 2, capacity=8)
+
+
+def publish(acquisition, n):
+    ring = acquisition.ring
+    for _ in range(n):
+        ring.push(np.full((2, 3), ring.count, dtype=np.uint16), float(ring.count))
+        for listener in acquisition._listeners:
+            listener()
+
+
+def finish(acquisition):
+    acquisition.finished = True
+    for listener in acquisition._listeners:
+        listener()
+
+
+def collect(stream, acquisition, steps):
+    async def main():
+        indices = []
+        async with stream:
+            for step in steps:
+                step()
+                await asyncio.sleep(0)
+            async for frame in stream:
+                assert frame.frame[0, 0] == frame.index and frame.timestamp == frame.index
+                indices.append(frame.index)
+        return indices
+    return asyncio.run(main())
+
+
+def test_drop_oldest_keeps_the_newest_frames(acquisition):
+    stream = FrameStream(acquisition, max_queue=4)
+    indices = collect(stream, acquisition, [lambda: publish(acquisition, 6), lambda: finish(acquisition)])
+    assert indices == [2, 3, 4, 5]
+    assert stream.queue_dropped == 2 and stream.dropped == 2 and stream.delivered == 4
+
+
+def test_wait_leaves_frames_in_the_ring(acquisition):
+    stream = FrameStream(acquisition, max_queue=2, policy="wait")
+    indices = collect(stream, acquisition, [lambda: publish(acquisition, 6), lambda: finish(acquisition)])
+    assert indices == list(range(6)) and stream.dropped == 0
+
+
+def test_wait_loses_frames_once_the_ring_wraps(acquisition):
+    stream = FrameStream(acquisition, max_queue=2, policy="wait")
+    steps = [lambda: publish(acquisition, 2), lambda: publish(acquisition, 10), lambda: finish(acquisition)]
+    indices = collect(stream, acquisition, steps)
+    # 2 queued before the ring wrapped, then the capacity - 1 frames still readable
+    assert indices == [0, 1] + list(range(5, 12))
+    assert stream.queue_dropped == 0 and stream.dropped == 3
+
+
+def test_from_start_and_arguments(acquisition):
+    publish(acquisition, 3)
+    stream = FrameStream(acquisition, from_start=True)
+    assert collect(stream, acquisition, [lambda: finish(acquisition)]) == [0, 1, 2]
+    with pytest.raises(ValueError):
+        FrameStream(acquisition, policy="newest")
+    with pytest.raises(ValueError):
+        FrameStream(acquisition, max_queue=0)
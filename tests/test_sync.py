@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from pyOptris.sync import ClockModel
+
+DRIFT = 40e-6  # device clock 40 ppm slow against the host
+RATE = 1000.0
+
+
+def timestamps(seconds, seed=0):
+    device = np.arange(int(seconds * RATE)) / RATE + 12.5
+    delay = np.random.default_rng(seed).exponential(0.5e-3, len(device)) + 0.2e-3
+    host = 1000.0 + (1.0 + DRIFT) * (device - 12.5) + delay
+    return device, host
+
+
+def test_drift_accumulates_across_updates():
+    device, host = timestamps(60)
+    clock = ClockModel()
+    windowed = []
+    for start in range(0, len(device), 1000):
+        # a second of fresh frames on top of the previous second, like a ring window
+        window = slice(max(start - 1000, 0), start + 1000)
+        clock.update(device[window], host[window])
+        single = ClockModel()
+        single.update(device[window], host[window])
+        windowed.append(abs(single.drift - DRIFT))
+    assert clock.samples == len(device)
+    assert abs(clock.drift - DRIFT) < 1e-6
+    assert abs(clock.drift - DRIFT) < np.median(windowed) / 10
+    # the offset follows the least delayed frames
+    least_delayed = 1000.0 + (1.0 + DRIFT) * (device[-1] - 12.5) + 0.2e-3
+    assert clock.to_host(device[-1]) == pytest.approx(least_delayed, abs=0.05e-3)
+    assert clock.to_device(clock.to_host(30.0)) == pytest.approx(30.0)
+    assert clock.jitter == pytest.approx(0.5e-3, rel=0.2)
+
+
+def test_nan_and_stale_frames_are_ignored():
+    device, host = timestamps(2)
+    device[::7] = np.nan
+    clock = ClockModel(min_samples=100)
+    assert not clock.update(device[:50], host[:50])
+    assert clock.update(device, host)
+    samples = clock.samples
+    assert samples == np.count_nonzero(~np.isnan(device))
+    clock.update(device[-500:], host[-500:])
+    assert clock.samples == samples
+
+
+def test_halflife_follows_a_drift_change():
+    device, host = timestamps(40)
+    host[20000:] += 100e-6 * (device[20000:] - device[20000])
+    clock = ClockModel(halflife=2.0)
+    for start in range(0, len(device), 500):
+        clock.update(device[start:start + 500], host[start:start + 500])
+    assert clock.drift == pytest.approx(DRIFT + 100e-6, abs=5e-6)
+    with pytest.raises(ValueError):
+        ClockModel(halflife=0)
@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+import pytest
+
+from pyOptris import viewer
+from pyOptris.viewer import Mailbox, TkViewer
+
+
+def test_mailbox_keeps_only_the_newest_item():
+    mailbox = Mailbox()
+    assert mailbox.take() is None and not mailbox.pending
+    assert not mailbox.put(1)
+    assert mailbox.put(2) and mailbox.pending
+    assert mailbox.take() == 2 and mailbox.take() is None
+    assert (mailbox.posted, mailbox.taken, mailbox.overwritten) == (2, 1, 1)
+
+
+def test_mailbox_never_blocks_the_producer():
+    mailbox = Mailbox()
+    taken = []
+    done = threading.Event()
+
+    def consume():
+        while not done.is_set() or mailbox.pending:
+            item = mailbox.take()
+            if item is not None:
+                taken.append(item)
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    for i in range(10000):
+        mailbox.put(i)
+    done.set()
+    consumer.join()
+    assert taken == sorted(taken) and taken[-1] == 9999
+    assert mailbox.taken + mailbox.overwritten == mailbox.posted == 10000
+
+
+# records what the viewer asks of Tk instead of drawing
+class FakeWidget:
+    def __init__(self):
+        self.images = []
+        self.scheduled = []
+        self.cancelled = []
+
+    def after(self, delay, callback):
+        self.scheduled.append((delay, callback))
+        return len(self.scheduled)
+
+    def after_cancel(self, after_id):
+        self.cancelled.append(after_id)
+
+    def configure(self, image):
+        self.images.append(image)
+
+
+@pytest.fixture
+def widget(monkeypatch):
+    monkeypatch.setattr(viewer, "photo_image", lambda image, master=None: image.copy())
+    return FakeWidget()
+
+
+def test_shows_the_newest_rendered_item(widget):
+    rendered = []
+
+    def render(item):
+        rendered.append(item)
+        return None if item < 0 else np.full((2, 2), item, dtype=np.uint8)
+    tk_viewer = TkViewer(widget, rate=10.0, render=render)
+    tk_viewer.post(1)
+    tk_viewer.post(2)
+    assert tk_viewer.refresh() and np.all(widget.images[-1] == 2) and tk_viewer.photo is widget.images[-1]
+    # only items actually shown are rendered
+    assert rendered == [2] and not tk_viewer.refresh()
+    tk_viewer.post(-1)
+    assert not tk_viewer.refresh() and tk_viewer.shown == 1
+    stats = tk_viewer.stats()
+    assert stats["posted"] == 3 and stats["overwritten"] == 1
+
+
+def test_refresh_loop_survives_errors(widget):
+    def render(item):
+        raise ValueError(item)
+    tk_viewer = TkViewer(widget, rate=10.0, render=render).start()
+    assert widget.scheduled[0][0] == 0
+    tk_viewer.post(1)
+    widget.scheduled[-1][1]()
+    assert tk_viewer.errors == 1 and isinstance(tk_viewer.error, ValueError)
+    # the next refresh is still scheduled, about one period later
+    assert len(widget.scheduled) == 2 and 50 <= widget.scheduled[-1][0] <= 100
+    tk_viewer.stop()
+    assert widget.cancelled == [2]
+    with pytest.raises(ValueError):
+        TkViewer(widget, rate=0)